@@ -13,6 +13,10 @@ from markdownify import markdownify as md
 from dateutil import parser as date_parser
 import trafilatura
 
+# Reuse the request-blocking and readiness helpers from url_spider_service
+from url_spider_service.services.resource_blocker import ResourceBlocker, resolve_block_rules
+from url_spider_service.services.readiness import ReadinessTracker, resolve_max_wait_ms
+
 # Configuration
 SETTINGS_PATH = "obsidian-web-clipper-settings.json"
 OUTPUT_DIR = "inbox"
@@ -270,6 +274,14 @@ class Clipper:
                 timezone_id="Asia/Shanghai"
             )
             page = await context.new_page()
+
+            # Block images/fonts/media/trackers - extraction only needs the DOM
+            blocker = ResourceBlocker(resolve_block_rules(template))
+            await blocker.attach(page)
+
+            # Readiness detection hooks must be installed before navigation
+            tracker = ReadinessTracker(page)
+            await tracker.install()
             
             # Stealth script
             await page.add_init_script("""
@@ -300,13 +312,13 @@ class Clipper:
                 
                 if wait_selector:
                     print(f"Waiting for selector: {wait_selector}")
-                    try:
-                        await page.wait_for_selector(wait_selector, timeout=10000)
-                    except Exception as e:
-                        print(f"Warning: Timeout waiting for {wait_selector}, proceeding anyway...")
 
-                # Give a little extra time for dynamic content to settle
-                await page.wait_for_timeout(3000) 
+                # Return as soon as selector, DOM, network and text length have all settled
+                readiness = await tracker.wait(
+                    wait_selector=wait_selector,
+                    max_wait_ms=resolve_max_wait_ms(template),
+                )
+                print(f"Page ready after {readiness['elapsed_ms']}ms: {readiness['signals']}")
                 
                 title = await page.title()
                 print(f"Page Title: {title}")
@@ -387,6 +399,7 @@ class Clipper:
                     f.write(file_output)
                 
                 print(f"Saved to {out_path}")
+                print(f"Requests allowed: {blocker.stats['allowed']}, blocked: {blocker.stats['blocked']} {blocker.stats['blocked_by_type']}")
                 return out_path
 
             except Exception as e:
@@ -10,8 +10,17 @@ from contextlib import asynccontextmanager
 from database import engine, get_mysql_db, get_mongo_db, articles_collection
 
 # Import services from url_spider_service
+from services.clip_cache import ClipCache
+from services.clip_metrics import GROUP_BY, StageHistograms
 from services.clipper_service import ClipperService
+from services.content_dedup import ContentDedup
+from services.html_archive import create_html_archive
+from services.http_client import SharedHttpClient
+from services.llm_cache import create_llm_cache
 from services.llm_service import LLMService
+from services.retry_policy import RetryPolicy
+from services.seen_urls import SeenUrls
+from services.url_canon import canonicalize_url, url_query
 
 # Import tasks for manual triggering
 from tasks.task1_fetch import task_fetch_and_evaluate
@@ -22,22 +31,43 @@ from tasks.task5_feishu import task_sync_to_feishu
 
 # Global services
 clipper_service: Optional[ClipperService] = None
+http_client: Optional[SharedHttpClient] = None
 llm_service: Optional[LLMService] = None
+seen_urls: Optional[SeenUrls] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global clipper_service, llm_service
+    global clipper_service, llm_service, http_client, seen_urls
     try:
-        clipper_service = ClipperService()
-        llm_service = LLMService()
+        # 共享 HTTP 连接池：长连接、HTTP/2、DNS 缓存，剪藏静态抓取复用
+        http_client = SharedHttpClient()
+        # 剪藏结果缓存：进程内 LRU + Mongo clip_cache 集合
+        clipper_service = ClipperService(
+            clip_cache=ClipCache(collection=get_mongo_db()["clip_cache"]),
+            html_archive=create_html_archive(get_mongo_db()),
+            http_client=http_client,
+        )
+        # LLM 响应缓存：相同提示词重复调用直接返回
+        llm_service = LLMService(cache=create_llm_cache(get_mongo_db()))
+        # 任务 1 的 URL 过滤器：加载持久化文件并补齐新增文章
+        seen_urls = SeenUrls(articles_collection)
+        await asyncio.to_thread(seen_urls.warm)
         print("服务初始化完成。")
     except Exception as e:
         print(f"服务初始化失败: {e}")
 
     yield
 
+    # Shutdown
+    if clipper_service:
+        await clipper_service.close()
+    if http_client:
+        await http_client.aclose()
+    if seen_urls:
+        seen_urls.save()
+
 
 app = FastAPI(title="微信公众号数据监控系统", lifespan=lifespan)
 
@@ -419,7 +449,7 @@ def check_url(url: str = Query(..., description="要检查的URL")):
     """检查URL是否存在于MongoDB数据库中"""
     try:
         # 检查URL是否存在
-        existing_article = articles_collection.find_one({"url": url})
+        existing_article = articles_collection.find_one(url_query(url))
 
         if existing_article:
             # 检查llm_summary_processed字段
@@ -869,7 +899,7 @@ async def process_url_async(
         # 2. 如果URL已存在
         if check_result["exists"]:
             # 获取完整的文章数据
-            existing_article = articles_collection.find_one({"url": url})
+            existing_article = articles_collection.find_one(url_query(url))
 
             # 检查是否需要生成摘要
             if use_llm_summary and not check_result.get("llm_summary_processed", False):
@@ -1083,6 +1113,7 @@ async def process_url_async(
 
         article_data = {
             "url": url,
+            "canonical_url": canonicalize_url(url),
             "title": clip_result["metadata"].get("title", ""),
             "source": clip_result["metadata"].get("source", ""),
             "created_at": clip_result["metadata"].get("created", datetime.now()),
@@ -1113,6 +1144,9 @@ async def process_url_async(
 
         inserted_result = articles_collection.insert_one(article_data)
         article_data["_id"] = str(inserted_result.inserted_id)
+        # 新文章同步进 URL 过滤器，任务 1 据此跳过而无需查 Mongo
+        if seen_urls:
+            seen_urls.add(article_data["canonical_url"])
 
         # 更新任务状态：完成
         task_collection.update_one(
@@ -1254,7 +1288,7 @@ async def process_url_sync(request: ProcessUrlRequest):
         # 2. 如果URL已存在
         if check_result["exists"]:
             # 获取完整的文章数据
-            existing_article = articles_collection.find_one({"url": url})
+            existing_article = articles_collection.find_one(url_query(url))
 
             # 检查是否需要生成摘要
             if use_llm_summary and not check_result.get("llm_summary_processed", False):
@@ -1298,7 +1332,9 @@ async def process_url_sync(request: ProcessUrlRequest):
             }
 
         # 3. 如果URL不存在，调用clip接口抓取文章（直接使用内部服务）
-        clip_result = await clipper_service.process_url(url)
+        clip_result = await RetryPolicy().run(
+            url, lambda: clipper_service.process_url(url)
+        )
 
         # 4. 如果需要，调用摘要接口（直接使用内部服务）
         summary_result = None
@@ -1312,6 +1348,7 @@ async def process_url_sync(request: ProcessUrlRequest):
         # 5. 构建文章数据
         article_data = {
             "url": url,
+            "canonical_url": canonicalize_url(url),
             "title": clip_result["metadata"].get("title", ""),
             "source": clip_result["metadata"].get("source", ""),
             "created_at": clip_result["metadata"].get("created", datetime.now()),
@@ -1330,6 +1367,9 @@ async def process_url_sync(request: ProcessUrlRequest):
         # 6. 保存到MongoDB
         inserted_result = articles_collection.insert_one(article_data)
         article_data["_id"] = str(inserted_result.inserted_id)
+        # 新文章同步进 URL 过滤器，任务 1 据此跳过而无需查 Mongo
+        if seen_urls:
+            seen_urls.add(article_data["canonical_url"])
 
         return {
             "status": "success",
@@ -1436,7 +1476,10 @@ async def clip_url(request: ClipRequest):
     if not clipper_service:
         raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
 
-    result = await clipper_service.process_url(request.url)
+    # 暂时性错误（超时、网络、5xx、反爬页）退避后重试
+    result = await RetryPolicy().run(
+        request.url, lambda: clipper_service.process_url(request.url)
+    )
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
 
@@ -1468,13 +1511,54 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/clipper/status")
+def clipper_status():
+    """剪藏服务运行状态：浏览器池、提取进程池队列深度与 CPU 耗时、HTTP 连接池复用与饱和度"""
+    if not clipper_service:
+        raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
+    return clipper_service.status()
+
+
+@app.get("/api/clipper/timings")
+def clipper_timings(
+    group_by: str = "host", source: str = "memory", hours: int = 24, limit: int = 5000
+):
+    """剪藏各阶段耗时直方图，source=articles 时从文章的 clip_stats 聚合（包含定时任务的剪藏）"""
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by 可选: {GROUP_BY}")
+    if source == "articles":
+        since = datetime.now() - timedelta(hours=hours)
+        docs = articles_collection.find(
+            {"clipper_metadata.clip_stats.clipped_at": {"$gte": since}},
+            {"clipper_metadata.clip_stats": 1},
+        ).limit(limit)
+        return StageHistograms.from_documents(docs).snapshot(group_by)
+    if not clipper_service:
+        raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
+    return clipper_service.metrics.snapshot(group_by)
+
+
+@app.get("/api/llm/status")
+def llm_status():
+    """LLM 服务状态：模型、配置版本、自适应并发上限、响应缓存命中率和节省的 token"""
+    if not llm_service:
+        raise HTTPException(status_code=503, detail="LLM 服务未初始化")
+    return llm_service.status()
+
+
+@app.get("/api/dedup/report")
+def dedup_report(hours: int = 24 * 7):
+    """正文去重统计：重复剪藏数量、复用总结节省的 LLM 调用和 token"""
+    return ContentDedup(articles_collection).report(hours=hours)
+
+
 # --- Trigger Endpoints for QingLong ---
 
 
 @app.post("/api/trigger/task1")
 async def trigger_task1(background_tasks: BackgroundTasks):
     """手动触发任务 1：获取并评估文章"""
-    background_tasks.add_task(task_fetch_and_evaluate)
+    background_tasks.add_task(task_fetch_and_evaluate, seen_urls)
     return {
         "status": "triggered",
         "task": "fetch_and_evaluate",
@@ -0,0 +1,370 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+try:
+    import psutil
+except ImportError:
+    pass
+
+
+# 浏览器池配置
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))  # 常驻浏览器数量
+MAX_PAGES_PER_BROWSER = int(
+    os.getenv("MAX_PAGES_PER_BROWSER", 200)
+)  # 每个浏览器处理多少页后回收
+MAX_BROWSER_MEMORY_MB = int(
+    os.getenv("MAX_BROWSER_MEMORY_MB", 1024)
+)  # 超过该内存即回收
+MEMORY_CHECK_INTERVAL = 20  # 每处理多少页检查一次内存
+
+# 看门狗：定期采样每个浏览器的 RSS，清理卡死的页面，浏览器无响应时强制结束进程
+WATCHDOG_INTERVAL = int(os.getenv("BROWSER_WATCHDOG_INTERVAL", 15))  # 秒
+HANG_TIMEOUT = int(os.getenv("BROWSER_HANG_TIMEOUT", 180))  # 单个页面最长占用秒数
+PROBE_TIMEOUT = 10  # CDP 探测超时，连续超时视为浏览器卡死
+MAX_FAILED_PROBES = 2
+
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+
+class _BrowserSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.browser: Optional[Browser] = None
+        self.pages_served = 0
+        self.active = 0
+        self.retiring = False
+        self.launched_at = 0.0
+        self.pids: List[int] = []
+        self.rss_mb: Optional[float] = None
+        self.peak_rss_mb = 0.0
+        self.failed_probes = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class _Lease:
+    def __init__(self, slot: _BrowserSlot, browser: Browser, context: BrowserContext):
+        self.slot = slot
+        self.browser = browser
+        self.context = context
+        self.started_at = time.monotonic()
+        self.crashed = False
+        self.killed = False
+
+
+class BrowserPool:
+    """常驻 Chromium 浏览器池：按 URL 分配独立 context，按页数/内存回收，崩溃后自动重启"""
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_pages_per_browser: int = MAX_PAGES_PER_BROWSER,
+        max_memory_mb: int = MAX_BROWSER_MEMORY_MB,
+        launch_args: Optional[List[str]] = None,
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_memory_mb = max_memory_mb
+        self.launch_args = launch_args or LAUNCH_ARGS
+
+        self._playwright = None
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._leases: List[_Lease] = []
+        self._watchdog_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "launches": 0,
+            "recycles": 0,
+            "crash_restarts": 0,
+            "page_crashes": 0,
+            "hung_pages": 0,
+            "browser_kills": 0,
+        }
+
+    async def start(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+                self._closed = False
+            if self._watchdog_task is None or self._watchdog_task.done():
+                self._watchdog_task = asyncio.create_task(self._watchdog())
+
+    async def close(self):
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            try:
+                await self._watchdog_task
+            except asyncio.CancelledError:
+                pass
+            self._watchdog_task = None
+        async with self._lock:
+            self._closed = True
+            for slot in self._slots:
+                await self._close_slot(slot)
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _launch(self, slot: _BrowserSlot):
+        slot.browser = await self._playwright.chromium.launch(
+            headless=True, args=self.launch_args
+        )
+        slot.pages_served = 0
+        slot.retiring = False
+        slot.launched_at = time.time()
+        slot.failed_probes = 0
+        slot.rss_mb = None
+        slot.pids = await self._process_ids(slot.browser)
+        self.stats["launches"] += 1
+        print(f"浏览器池: 已启动浏览器 #{slot.index}")
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        # 关闭后槽位回到可用状态，下次分配到时重新启动浏览器
+        browser, slot.browser = slot.browser, None
+        slot.retiring = False
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"浏览器池: 关闭浏览器 #{slot.index} 失败: {e}")
+
+    async def _pick_slot(self) -> _BrowserSlot:
+        if self._playwright is None:
+            await self.start()
+
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("浏览器池已关闭")
+
+            # 崩溃的浏览器直接重启；空闲且待回收的浏览器立即回收
+            for slot in self._slots:
+                if slot.browser is not None and not slot.alive:
+                    print(f"浏览器池: 浏览器 #{slot.index} 已断开，正在重启...")
+                    self.stats["crash_restarts"] += 1
+                    slot.browser = None
+                    slot.active = 0
+                    slot.retiring = False
+                if slot.retiring and slot.active == 0 and slot.browser is not None:
+                    await self._close_slot(slot)
+                    self.stats["recycles"] += 1
+
+            candidates = [s for s in self._slots if not s.retiring] or self._slots
+            slot = min(candidates, key=lambda s: s.active)
+            if slot.browser is None:
+                await self._launch(slot)
+
+            slot.active += 1
+            slot.pages_served += 1
+            return slot
+
+    async def _release_slot(self, slot: _BrowserSlot, browser: Browser):
+        if slot.browser is not browser:
+            # 浏览器在借出期间已被重启，旧租约不再计数
+            return
+        slot.active = max(0, slot.active - 1)
+
+        if slot.pages_served >= self.max_pages_per_browser:
+            slot.retiring = True
+        elif slot.pages_served % MEMORY_CHECK_INTERVAL == 0:
+            rss_mb = await self.browser_memory_mb(slot)
+            if rss_mb is not None and rss_mb > self.max_memory_mb:
+                print(
+                    f"浏览器池: 浏览器 #{slot.index} 内存 {rss_mb:.0f}MB 超过阈值 {self.max_memory_mb}MB，标记回收"
+                )
+                slot.retiring = True
+
+        if slot.retiring and slot.active == 0:
+            async with self._lock:
+                if slot.retiring and slot.active == 0:
+                    await self._close_slot(slot)
+                    self.stats["recycles"] += 1
+
+    @staticmethod
+    async def _process_info(browser: Browser) -> List[Dict[str, Any]]:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send("SystemInfo.getProcessInfo")
+        finally:
+            await session.detach()
+        return info.get("processInfo", [])
+
+    async def _process_ids(self, browser: Browser) -> List[int]:
+        try:
+            return [proc["id"] for proc in await self._process_info(browser)]
+        except Exception:
+            return []
+
+    async def browser_memory_mb(self, slot: _BrowserSlot) -> Optional[float]:
+        """通过 CDP 获取浏览器的进程列表，并用 psutil 统计 RSS 总和"""
+        if "psutil" not in globals() or not slot.alive:
+            return None
+        try:
+            processes = await self._process_info(slot.browser)
+            total = 0
+            for proc in processes:
+                try:
+                    total += psutil.Process(proc["id"]).memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied, KeyError):
+                    continue
+            # 渲染进程会随页面增减，顺便更新进程列表供强制结束时使用
+            slot.pids = sorted(set(slot.pids) | {p["id"] for p in processes})
+            rss_mb = total / 1024 / 1024
+            slot.rss_mb = rss_mb
+            slot.peak_rss_mb = max(slot.peak_rss_mb, rss_mb)
+            return rss_mb
+        except Exception:
+            return None
+
+    async def _kill_slot(self, slot: _BrowserSlot, reason: str):
+        """结束卡死或崩溃的浏览器，借出中的页面会抛出 browser 类错误，由调用方重新排队"""
+        browser, slot.browser = slot.browser, None
+        slot.active = 0
+        slot.retiring = False
+        self.stats["browser_kills"] += 1
+        print(f"浏览器池: 结束浏览器 #{slot.index} ({reason})")
+        if browser is not None:
+            try:
+                await asyncio.wait_for(browser.close(), PROBE_TIMEOUT)
+                return
+            except Exception:
+                pass
+        if "psutil" in globals():
+            for pid in slot.pids:
+                try:
+                    psutil.Process(pid).kill()
+                except psutil.Error:
+                    continue
+
+    async def _watchdog(self):
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            try:
+                await self._watchdog_tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"浏览器池看门狗异常: {e}")
+
+    async def _watchdog_tick(self):
+        now = time.monotonic()
+
+        # 1. 占用过久的页面：关闭其 context，让等待中的调用立即失败并重新排队
+        for lease in list(self._leases):
+            if lease.killed or now - lease.started_at < HANG_TIMEOUT:
+                continue
+            lease.killed = True
+            self.stats["hung_pages"] += 1
+            print(
+                f"浏览器池: 浏览器 #{lease.slot.index} 上的页面已占用 {now - lease.started_at:.0f}s，强制关闭"
+            )
+            try:
+                await asyncio.wait_for(lease.context.close(), PROBE_TIMEOUT)
+            except Exception:
+                async with self._lock:
+                    if lease.slot.browser is lease.browser:
+                        await self._kill_slot(lease.slot, "关闭卡死页面失败")
+
+        # 2. 逐个浏览器探测：采样 RSS，断开的重启，无响应的强制结束
+        for slot in self._slots:
+            if slot.browser is None:
+                continue
+            if not slot.alive:
+                async with self._lock:
+                    if slot.browser is not None and not slot.alive:
+                        print(f"浏览器池: 浏览器 #{slot.index} 已崩溃，等待重启")
+                        self.stats["crash_restarts"] += 1
+                        slot.browser = None
+                        slot.active = 0
+                        slot.retiring = False
+                continue
+
+            try:
+                rss_mb = await asyncio.wait_for(
+                    self.browser_memory_mb(slot), PROBE_TIMEOUT
+                )
+                slot.failed_probes = 0
+            except asyncio.TimeoutError:
+                slot.failed_probes += 1
+                if slot.failed_probes >= MAX_FAILED_PROBES:
+                    async with self._lock:
+                        await self._kill_slot(slot, "CDP 探测无响应")
+                continue
+
+            if rss_mb is not None and rss_mb > self.max_memory_mb and not slot.retiring:
+                print(
+                    f"浏览器池: 浏览器 #{slot.index} 内存 {rss_mb:.0f}MB 超过阈值 {self.max_memory_mb}MB，标记回收"
+                )
+                slot.retiring = True
+            if slot.retiring and slot.active == 0:
+                async with self._lock:
+                    if slot.retiring and slot.active == 0 and slot.browser is not None:
+                        await self._close_slot(slot)
+                        self.stats["recycles"] += 1
+
+    @asynccontextmanager
+    async def new_context(self, **context_options: Any):
+        """从池中借出一个浏览器，并创建一次性的 context，用完即关闭"""
+        slot = await self._pick_slot()
+        browser = slot.browser
+        context: Optional[BrowserContext] = None
+        lease: Optional[_Lease] = None
+        try:
+            context = await browser.new_context(**context_options)
+            lease = _Lease(slot, browser, context)
+            self._leases.append(lease)
+            # 渲染进程崩溃时关闭 context，避免调用方一直等待
+            context.on(
+                "page", lambda page: page.on("crash", lambda _: self._on_crash(lease))
+            )
+            yield context
+        finally:
+            if lease is not None:
+                self._leases.remove(lease)
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            await self._release_slot(slot, browser)
+
+    def _on_crash(self, lease: _Lease):
+        if lease.crashed:
+            return
+        lease.crashed = True
+        self.stats["page_crashes"] += 1
+        print(f"浏览器池: 浏览器 #{lease.slot.index} 的页面渲染进程崩溃")
+        asyncio.ensure_future(self._close_context(lease.context))
+
+    @staticmethod
+    async def _close_context(context: BrowserContext):
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "browsers": [
+                {
+                    "index": s.index,
+                    "alive": s.alive,
+                    "active": s.active,
+                    "pages_served": s.pages_served,
+                    "retiring": s.retiring,
+                    "rss_mb": round(s.rss_mb, 1) if s.rss_mb is not None else None,
+                    "peak_rss_mb": round(s.peak_rss_mb, 1),
+                }
+                for s in self._slots
+            ],
+            "open_pages": len(self._leases),
+        }
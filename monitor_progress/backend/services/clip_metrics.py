@@ -0,0 +1,133 @@
+import bisect
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+# 阶段耗时直方图的桶上限（毫秒），最后一个桶收纳更慢的样本
+HISTOGRAM_BUCKETS_MS = [
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    30000,
+    60000,
+]
+GROUP_BY = ("host", "template", "fetch_mode")
+
+
+def clip_stats(url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """剪藏结果中需要随文章保存的统计信息，写入 clipper_metadata.clip_stats"""
+    stats = result.get("stats") or {}
+    return {
+        "host": (urlparse(url).hostname or "").lower(),
+        "template": result.get("template", ""),
+        "fetch_mode": result.get("fetch_mode", ""),
+        "cache": result.get("cache", ""),
+        "timings": stats.get("timings", {}),
+        "total_ms": stats.get("total_ms"),
+        "clipped_at": datetime.now(),
+    }
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        # 取样本所在桶的上限作为估计值
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return (
+                    HISTOGRAM_BUCKETS_MS[i]
+                    if i < len(HISTOGRAM_BUCKETS_MS)
+                    else round(self.max_ms, 1)
+                )
+        return round(self.max_ms, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in HISTOGRAM_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 1),
+            "mean_ms": round(self.sum_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class StageHistograms:
+    """按站点 / 模板 / 抓取方式聚合各阶段耗时，用于定位最慢的阶段"""
+
+    def __init__(self):
+        # (维度, 维度取值) -> 阶段 -> 直方图
+        self._groups: Dict[tuple, Dict[str, _Histogram]] = {}
+        self.observed = 0
+
+    def observe(self, stats: Dict[str, Any]):
+        timings = dict(stats.get("timings") or {})
+        if stats.get("total_ms") is not None:
+            timings["total"] = stats["total_ms"]
+        if not timings:
+            return
+        self.observed += 1
+        for dimension in GROUP_BY:
+            stages = self._groups.setdefault(
+                (dimension, stats.get(dimension) or ""), {}
+            )
+            for stage, ms in timings.items():
+                stages.setdefault(stage, _Histogram()).observe(ms)
+
+    def snapshot(self, group_by: str = "host") -> Dict[str, Any]:
+        groups = {}
+        for (dimension, key), stages in self._groups.items():
+            if dimension != group_by:
+                continue
+            histograms = {stage: h.to_dict() for stage, h in stages.items()}
+            # 耗时总和最大的子阶段即热点阶段（不含 total 和 markdown.* 细分）
+            top_level = {
+                stage: h["sum_ms"]
+                for stage, h in histograms.items()
+                if stage != "total" and "." not in stage
+            }
+            groups[key] = {
+                "hot_stage": max(top_level, key=top_level.get) if top_level else None,
+                "stages": histograms,
+            }
+        return {
+            "group_by": group_by,
+            "observed": self.observed,
+            "buckets_ms": HISTOGRAM_BUCKETS_MS,
+            "groups": groups,
+        }
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Dict[str, Any]]) -> "StageHistograms":
+        """从文章的 clipper_metadata.clip_stats 重新聚合（包含独立运行的剪藏任务）"""
+        histograms = cls()
+        for doc in docs:
+            stats = (doc.get("clipper_metadata") or {}).get("clip_stats")
+            if stats:
+                histograms.observe(stats)
+        return histograms
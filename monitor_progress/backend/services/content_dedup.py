@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# SimHash 配置：64 位指纹，汉明距离不超过 3 视为近似重复
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # 分成 4 段各 16 位，距离 <= 3 时至少有一段完全相同，用于索引召回
+SIMHASH_MAX_DISTANCE = 3
+SIMHASH_SHINGLE = 4  # 按字符 4-gram 切片，中文没有空格分词
+SIMHASH_MIN_LENGTH = 300  # 正文太短时近似判断不可靠，只做精确匹配
+NEAR_CANDIDATE_LIMIT = 50
+
+RE_FRONT_MATTER = re.compile(r"^---[\s\S]*?---\n")
+RE_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+RE_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+RE_URL = re.compile(r"https?://\S+")
+RE_HTML_TAG = re.compile(r"<[^>]+>")
+# 去掉 Markdown 符号、标点和空白，只保留文字
+RE_NON_WORD = re.compile(r"[\W_]+", flags=re.UNICODE)
+
+
+def normalize_content(markdown: str) -> str:
+    """去掉元数据、图片、链接地址、格式符号和空白，转载时改动的排版不影响指纹"""
+    text = RE_FRONT_MATTER.sub("", markdown or "")
+    text = RE_IMAGE.sub("", text)
+    text = RE_LINK.sub(r"\1", text)
+    text = RE_URL.sub("", text)
+    text = RE_HTML_TAG.sub("", text)
+    text = unicodedata.normalize("NFKC", text).lower()
+    return RE_NON_WORD.sub("", text)
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    shingles = Counter(
+        text[i : i + SIMHASH_SHINGLE]
+        for i in range(max(1, len(text) - SIMHASH_SHINGLE + 1))
+    )
+    weights = [0] * bits
+    for shingle, count in shingles.items():
+        h = int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=bits // 8).digest(),
+            "big",
+        )
+        for i in range(bits):
+            weights[i] += count if h >> i & 1 else -count
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def fingerprint(markdown: str) -> Dict[str, Any]:
+    """正文指纹：精确哈希 + SimHash（十六进制字符串，Mongo 不支持无符号 64 位整数）"""
+    text = normalize_content(markdown)
+    fp = {
+        "hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "length": len(text),
+    }
+    if len(text) >= SIMHASH_MIN_LENGTH:
+        value = f"{simhash(text):016x}"
+        width = len(value) // SIMHASH_BANDS
+        fp["simhash"] = value
+        fp["bands"] = [
+            f"{i}:{value[i * width:(i + 1) * width]}" for i in range(SIMHASH_BANDS)
+        ]
+    return fp
+
+
+class ContentDedup:
+    """基于 articles 集合上 content_fingerprint 字段的重复正文查找"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("content_fingerprint.hash")
+            self.collection.create_index("content_fingerprint.bands")
+        except Exception as e:
+            print(f"创建正文指纹索引失败: {e}")
+
+    def find_duplicate(
+        self,
+        fp: Dict[str, Any],
+        exclude_id=None,
+        extra_filter: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Tuple[Dict[str, Any], str, int]]:
+        """返回 (文档, exact/near, 汉明距离)，优先精确重复，其次距离最近的近似重复"""
+        if not fp.get("length"):
+            return None
+        base = dict(extra_filter or {})
+        if exclude_id is not None:
+            base["_id"] = {"$ne": exclude_id}
+        fields = {"content_fingerprint": 1, "created_at": 1, **(projection or {})}
+
+        exact = self.collection.find_one(
+            {**base, "content_fingerprint.hash": fp["hash"]},
+            fields,
+            sort=[("created_at", 1)],
+        )
+        if exact:
+            return exact, "exact", 0
+
+        if not fp.get("bands"):
+            return None
+        value = int(fp["simhash"], 16)
+        best = None
+        for doc in self.collection.find(
+            {**base, "content_fingerprint.bands": {"$in": fp["bands"]}}, fields
+        ).limit(NEAR_CANDIDATE_LIMIT):
+            other = (doc.get("content_fingerprint") or {}).get("simhash")
+            if not other:
+                continue
+            distance = hamming(value, int(other, 16))
+            if distance <= SIMHASH_MAX_DISTANCE and (
+                best is None or distance < best[2]
+            ):
+                best = (doc, "near", distance)
+        return best
+
+    async def clip_fields(self, url: str, markdown: str) -> Dict[str, Any]:
+        """剪藏完成时写入文章的指纹字段；与已有文章重复时记录 duplicate_of
+
+        指纹计算（长文约数百毫秒）和 Mongo 查询都放到线程里，不阻塞事件循环。
+        """
+        fp = await asyncio.to_thread(fingerprint, markdown)
+        if not fp["length"]:
+            return {}
+        fields: Dict[str, Any] = {"content_fingerprint": fp}
+        try:
+            found = await asyncio.to_thread(
+                self.find_duplicate, fp, extra_filter={"url": {"$ne": url}}
+            )
+        except Exception as e:
+            print(f"查找重复正文失败: {e}")
+            return fields
+        if found:
+            doc, kind, distance = found
+            fields.update(
+                {
+                    "duplicate_of": doc["_id"],
+                    "duplicate_kind": kind,
+                    "duplicate_distance": distance,
+                }
+            )
+            print(
+                f"正文与已有文章重复 ({kind}, 距离 {distance}): {url} -> {doc['_id']}"
+            )
+        return fields
+
+    def report(self, hours: int = 24 * 7) -> Dict[str, Any]:
+        """去重节省统计：剪藏时发现的重复正文，以及任务 3 复用总结省下的 LLM 调用和 token"""
+        since = datetime.now() - timedelta(hours=hours)
+        fingerprinted = self.collection.count_documents(
+            {"content_fingerprint": {"$exists": True}, "updated_at": {"$gte": since}}
+        )
+        duplicates = {
+            kind: self.collection.count_documents(
+                {"duplicate_kind": kind, "updated_at": {"$gte": since}}
+            )
+            for kind in ("exact", "near")
+        }
+        reused: List[Dict[str, Any]] = list(
+            self.collection.aggregate(
+                [
+                    {
+                        "$match": {
+                            "llm_summary_reused_from": {"$exists": True},
+                            "updated_at": {"$gte": since},
+                        }
+                    },
+                    {
+                        "$group": {
+                            "_id": None,
+                            "count": {"$sum": 1},
+                            "tokens": {"$sum": "$dedup_saved_tokens"},
+                        }
+                    },
+                ]
+            )
+        )
+        summaries_reused = reused[0]["count"] if reused else 0
+        return {
+            "hours": hours,
+            "fingerprinted_clips": fingerprinted,
+            "duplicate_clips": duplicates["exact"] + duplicates["near"],
+            "duplicates_by_kind": duplicates,
+            "duplicate_rate": (
+                round((duplicates["exact"] + duplicates["near"]) / fingerprinted, 3)
+                if fingerprinted
+                else 0.0
+            ),
+            "llm_calls_saved": summaries_reused,
+            "tokens_saved": reused[0]["tokens"] if reused else 0,
+        }
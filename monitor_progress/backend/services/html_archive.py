@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+try:
+    import zstandard
+except ImportError:
+    pass
+
+try:
+    import gridfs
+except ImportError:
+    pass
+
+# 原始 HTML 归档配置：disk（本地目录）/ gridfs（Mongo）/ off
+HTML_ARCHIVE_BACKEND = os.getenv("HTML_ARCHIVE_BACKEND", "disk")
+HTML_ARCHIVE_DIR = os.getenv("HTML_ARCHIVE_DIR", "html_archive")
+HTML_ARCHIVE_BUCKET = "html_archive"
+HTML_ARCHIVE_LEVEL = int(os.getenv("HTML_ARCHIVE_LEVEL", 10))  # zstd 压缩级别
+
+
+def archive_codec() -> str:
+    """归档使用的编码，没有安装 zstandard 时退回 gzip"""
+    return "zst" if "zstandard" in globals() else "gz"
+
+
+def compress(data: bytes, level: int = HTML_ARCHIVE_LEVEL) -> tuple:
+    """返回 (压缩后的字节, 编码)"""
+    if archive_codec() == "zst":
+        return zstandard.ZstdCompressor(level=level).compress(data), "zst"
+    return gzip.compress(data, compresslevel=6), "gz"
+
+
+def decompress(data: bytes, codec: str) -> str:
+    if codec == "zst":
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == "gz":
+        return gzip.decompress(data).decode("utf-8")
+    raise ValueError(f"未知的归档编码: {codec}")
+
+
+class DiskBlobStore:
+    """本地目录，按摘要前缀分两级子目录存放"""
+
+    def __init__(self, root: str = HTML_ARCHIVE_DIR):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    def size(self, name: str) -> Optional[int]:
+        """已存在时返回存储大小，不存在返回 None"""
+        try:
+            return os.path.getsize(self._path(name))
+        except OSError:
+            return None
+
+    def put(self, name: str, data: bytes):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，避免并发写入或中断留下半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, name: str) -> bytes:
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+
+class GridFSBlobStore:
+    """Mongo GridFS，文件 _id 即摘要文件名"""
+
+    def __init__(self, database, bucket: str = HTML_ARCHIVE_BUCKET):
+        self.fs = gridfs.GridFS(database, collection=bucket)
+
+    def size(self, name: str) -> Optional[int]:
+        """已存在时返回存储大小，不存在返回 None"""
+        existing = self.fs.find_one({"_id": name})
+        return existing.length if existing is not None else None
+
+    def put(self, name: str, data: bytes):
+        try:
+            self.fs.put(data, _id=name, filename=name)
+        except gridfs.errors.FileExists:
+            pass
+
+    def get(self, name: str) -> bytes:
+        return self.fs.get(name).read()
+
+
+class HtmlArchive:
+    """按内容寻址的原始 HTML 归档：sha256 去重 + zstd 压缩，用于离线重新提取"""
+
+    def __init__(self, store, level: int = HTML_ARCHIVE_LEVEL):
+        self.store = store
+        self.level = level
+        self.stats = {
+            "writes": 0,
+            "dedup_hits": 0,
+            "errors": 0,
+            "raw_bytes": 0,
+            "stored_bytes": 0,
+        }
+
+    def put(self, html: str) -> Optional[Dict[str, Any]]:
+        """归档一份 HTML，返回写入文章文档的引用；失败时返回 None，不影响剪藏"""
+        try:
+            raw = html.encode("utf-8")
+            digest = hashlib.sha256(raw).hexdigest()
+            codec = archive_codec()
+            name = f"{digest}.{codec}"
+            # 先按摘要查重，已归档的内容只花一次哈希，不再压缩
+            stored_size = self.store.size(name)
+            if stored_size is not None:
+                self.stats["dedup_hits"] += 1
+            else:
+                data, codec = compress(raw, self.level)
+                self.store.put(name, data)
+                stored_size = len(data)
+                self.stats["writes"] += 1
+                self.stats["raw_bytes"] += len(raw)
+                self.stats["stored_bytes"] += stored_size
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"归档原始 HTML 失败: {e}")
+            return None
+        return {
+            "sha256": digest,
+            "codec": codec,
+            "size": len(raw),
+            "stored_size": stored_size,
+        }
+
+    def get_bytes(self, ref: Dict[str, Any]) -> bytes:
+        return self.store.get(f"{ref['sha256']}.{ref['codec']}")
+
+    def get(self, ref: Dict[str, Any]) -> str:
+        return decompress(self.get_bytes(ref), ref["codec"])
+
+    def status(self) -> Dict[str, Any]:
+        ratio = (
+            round(self.stats["raw_bytes"] / self.stats["stored_bytes"], 2)
+            if self.stats["stored_bytes"]
+            else 0.0
+        )
+        return {
+            **self.stats,
+            "compression_ratio": ratio,
+            "backend": type(self.store).__name__,
+        }
+
+
+def create_html_archive(database=None) -> Optional[HtmlArchive]:
+    """按 HTML_ARCHIVE_BACKEND 创建归档，gridfs 需要传入 Mongo 数据库"""
+    if HTML_ARCHIVE_BACKEND == "off":
+        return None
+    if HTML_ARCHIVE_BACKEND == "gridfs":
+        if database is None or "gridfs" not in globals():
+            print("GridFS 不可用，原始 HTML 归档改存本地目录")
+        else:
+            return HtmlArchive(GridFSBlobStore(database))
+    return HtmlArchive(DiskBlobStore(HTML_ARCHIVE_DIR))
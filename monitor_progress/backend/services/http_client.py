@@ -0,0 +1,270 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import httpx
+except ImportError:
+    pass
+
+try:
+    import h2  # httpx 的 HTTP/2 支持依赖 h2
+except ImportError:
+    pass
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# 连接池配置：全局连接上限、空闲保活，以及单站点并发上限
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "40"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "8"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # 秒
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))  # 秒
+
+
+class _DnsCache:
+    """按 (域名, 端口) 缓存解析结果，保留所有 A/AAAA 地址；同一域名并发解析只发起一次"""
+
+    def __init__(self, ttl: float, stats: Dict[str, int]):
+        self._ttl = ttl
+        self._stats = stats
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        key = (host, port)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._stats["dns_hits"] += 1
+            return cached[1]
+        pending = self._pending.get(key)
+        if pending is None:
+            self._stats["dns_misses"] += 1
+            pending = self._pending[key] = asyncio.ensure_future(
+                self._lookup(host, port)
+            )
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self._stats["dns_hits"] += 1
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host: str, port: int) -> List[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        # 保留解析顺序去重，A/AAAA 记录都作为候选地址
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[(host, port)] = (time.monotonic() + self._ttl, addresses)
+        return addresses
+
+    def forget(self, host: str, port: int):
+        self._cache.pop((host, port), None)
+
+    def cached_hosts(self) -> int:
+        return len(self._cache)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        socket.inet_pton(socket.AF_INET6 if ":" in host else socket.AF_INET, host)
+        return True
+    except OSError:
+        return False
+
+
+if "httpx" in globals():
+
+    class _DnsCachingTransport(httpx.AsyncBaseTransport):
+        """包装 httpx 默认传输层：按缓存的解析结果把请求发到具体 IP，依次尝试每个地址
+
+        Host 头保持原域名，TLS 通过 sni_hostname 扩展仍按原域名握手和校验证书。
+        """
+
+        def __init__(
+            self,
+            transport: "httpx.AsyncHTTPTransport",
+            dns: _DnsCache,
+            stats: Dict[str, int],
+        ):
+            self._transport = transport
+            self._dns = dns
+            self._stats = stats
+
+        async def _trace(self, event: str, info: Dict[str, Any]):
+            if event == "connection.connect_tcp.complete":
+                self._stats["connections_opened"] += 1
+
+        async def handle_async_request(
+            self, request: "httpx.Request"
+        ) -> "httpx.Response":
+            host = request.url.host
+            port = request.url.port or (443 if request.url.scheme == "https" else 80)
+            extensions = {**request.extensions, "trace": self._trace}
+            if _is_ip(host):
+                request.extensions = extensions
+                return await self._transport.handle_async_request(request)
+            try:
+                addresses = await self._dns.resolve(host, port)
+            except OSError as e:
+                raise httpx.ConnectError(f"{host}: {e}", request=request) from e
+
+            error: Optional[Exception] = None
+            for address in addresses:
+                routed = httpx.Request(
+                    request.method,
+                    request.url.copy_with(host=address),
+                    headers=request.headers,
+                    stream=request.stream,
+                    extensions={**extensions, "sni_hostname": host},
+                )
+                try:
+                    return await self._transport.handle_async_request(routed)
+                except httpx.ConnectError as e:
+                    # 建连失败时请求尚未发出，可以换下一个地址
+                    self._stats["connect_failures"] += 1
+                    error = e
+            # 所有地址都连不上时丢弃缓存，下次重新解析
+            self._dns.forget(host, port)
+            raise httpx.ConnectError(str(error), request=request) from error
+
+        async def aclose(self):
+            await self._transport.aclose()
+
+
+class SharedHttpClient:
+    """服务共享的异步 HTTP 客户端：长连接复用、HTTP/2、DNS 缓存和单站点并发上限
+
+    由 FastAPI lifespan 创建并关闭，剪藏服务的静态抓取和缓存校验都通过它发请求。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+        timeout: float = HTTP_TIMEOUT,
+        http2: bool = HTTP2_ENABLED,
+        dns_ttl: float = DNS_CACHE_TTL,
+        proxy: Optional[str] = None,
+    ):
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.http2 = http2 and "h2" in globals()
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "host_waits": 0,
+            "pool_timeouts": 0,
+            "connections_opened": 0,
+            "connect_failures": 0,
+            "dns_hits": 0,
+            "dns_misses": 0,
+        }
+        self.http_versions: Dict[str, int] = {}
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_busy: Dict[str, int] = {}
+        self._dns: Optional[_DnsCache] = None
+        self.client = None
+        if "httpx" not in globals():
+            print("未安装 httpx，HTTP 抓取不可用")
+            return
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = httpx.AsyncHTTPTransport(
+            http2=self.http2, limits=limits, proxy=proxy
+        )
+        if proxy is None:
+            # 走代理时由代理解析域名，不做本地 DNS 缓存
+            self._dns = _DnsCache(dns_ttl, self.stats)
+            transport = _DnsCachingTransport(transport, self._dns, self.stats)
+        self.client = httpx.AsyncClient(
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            },
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _host_slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    async def request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        if self.client is None:
+            raise RuntimeError("HTTP 客户端未初始化或已关闭")
+        host = (urlparse(url).hostname or "").lower()
+        slot = self._host_slot(host)
+        if slot.locked():
+            self.stats["host_waits"] += 1
+        async with slot:
+            self.stats["requests"] += 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            self._host_busy[host] = self._host_busy.get(host, 0) + 1
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except Exception as e:
+                self.stats["errors"] += 1
+                if "httpx" in globals() and isinstance(e, httpx.PoolTimeout):
+                    self.stats["pool_timeouts"] += 1
+                raise
+            finally:
+                self.inflight -= 1
+                self._host_busy[host] -= 1
+                if not self._host_busy[host]:
+                    del self._host_busy[host]
+        self.http_versions[response.http_version] = (
+            self.http_versions.get(response.http_version, 0) + 1
+        )
+        return response
+
+    async def get(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", url, **kwargs)
+
+    def status(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        opened = self.stats["connections_opened"]
+        return {
+            "available": self.available,
+            "http2": self.http2,
+            **self.stats,
+            "inflight": self.inflight,
+            "peak_inflight": self.peak_inflight,
+            # 复用率：没有新建连接的请求占比
+            "reuse_ratio": (
+                round(max(0.0, 1 - opened / requests), 3) if requests else 0.0
+            ),
+            "http_versions": self.http_versions,
+            "pool": {
+                "active": self.inflight,
+                "max_connections": self.max_connections,
+                "saturation": round(self.inflight / self.max_connections, 3),
+            },
+            "per_host_limit": self.per_host_limit,
+            "busy_hosts": dict(self._host_busy),
+            "dns_cached_hosts": self._dns.cached_hosts() if self._dns else 0,
+        }
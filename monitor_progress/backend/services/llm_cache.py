@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# LLM 响应缓存配置：disk（本地目录）/ mongo / off
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "disk")
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "data/llm_cache")
+LLM_CACHE_COLLECTION = "llm_cache"
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_EVICT_EVERY = 100  # 每写入 N 条检查一次总大小
+LLM_CACHE_LOW_WATERMARK = 0.9  # 超出上限时淘汰到上限的 90%，避免每次写入都触发淘汰
+
+
+def cache_key(*parts: Any) -> str:
+    """按 (模型, 系统提示词, 提示词, 配置版本) 等内容计算缓存键"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCacheStore:
+    """本地目录，按键前缀分子目录存放 JSON；文件修改时间即最近使用时间"""
+
+    def __init__(self, root: str = LLM_CACHE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return doc
+
+    def put(self, key: str, doc: Dict[str, Any]) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(doc, ensure_ascii=False, default=str).encode("utf-8")
+        # 先写临时文件再原子替换，避免并发写入或中断留下半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(data)
+
+    def evict(self, max_bytes: int) -> int:
+        files: List[tuple] = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= max_bytes * LLM_CACHE_LOW_WATERMARK:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+class MongoCacheStore:
+    """Mongo 集合，_id 即缓存键，按 last_used_at 淘汰"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("last_used_at")
+        except Exception as e:
+            print(f"创建 LLM 缓存索引失败: {e}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one_and_update(
+            {"_id": key}, {"$set": {"last_used_at": datetime.now()}}
+        )
+
+    def put(self, key: str, doc: Dict[str, Any]) -> int:
+        size = len(json.dumps(doc, ensure_ascii=False, default=str).encode("utf-8"))
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {**doc, "size": size, "last_used_at": datetime.now()}},
+            upsert=True,
+        )
+        return size
+
+    def evict(self, max_bytes: int) -> int:
+        totals = list(
+            self.collection.aggregate(
+                [{"$group": {"_id": None, "size": {"$sum": "$size"}}}]
+            )
+        )
+        total = totals[0]["size"] if totals else 0
+        if total <= max_bytes:
+            return 0
+        ids = []
+        for doc in self.collection.find({}, {"size": 1}).sort("last_used_at", 1):
+            if total <= max_bytes * LLM_CACHE_LOW_WATERMARK:
+                break
+            ids.append(doc["_id"])
+            total -= doc.get("size", 0)
+        if ids:
+            self.collection.delete_many({"_id": {"$in": ids}})
+        return len(ids)
+
+
+class LLMResponseCache:
+    """LLM 原始响应缓存：相同提示词重复调用（任务重跑、接口重复请求、回填重试）直接返回缓存
+
+    读写失败只打印日志，不影响 LLM 调用。
+    """
+
+    def __init__(self, store, max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0,
+            "stored_bytes": 0,
+            "tokens_saved": 0,
+        }
+
+    async def get(self, key: str) -> Optional[str]:
+        start = time.perf_counter()
+        try:
+            doc = await asyncio.to_thread(self.store.get, key)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"读取 LLM 缓存失败: {e}")
+            return None
+        if not doc:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["tokens_saved"] += doc.get("tokens", 0)
+        print(
+            f"LLM 缓存命中 ({doc.get('kind', '')}, {(time.perf_counter() - start) * 1000:.1f}ms)"
+        )
+        return doc["response"]
+
+    async def set(self, key: str, response: str, **meta: Any):
+        doc = {"response": response, **meta, "created_at": datetime.now()}
+        try:
+            self.stats["stored_bytes"] += await asyncio.to_thread(
+                self.store.put, key, doc
+            )
+            self.stats["stores"] += 1
+            if self.stats["stores"] % LLM_CACHE_EVICT_EVERY == 1:
+                self.stats["evictions"] += await asyncio.to_thread(
+                    self.store.evict, self.max_bytes
+                )
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"写入 LLM 缓存失败: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "max_bytes": self.max_bytes,
+            "backend": type(self.store).__name__,
+        }
+
+
+def create_llm_cache(database=None) -> Optional[LLMResponseCache]:
+    """按 LLM_CACHE_BACKEND 创建缓存，mongo 需要传入 Mongo 数据库"""
+    if LLM_CACHE_BACKEND == "off":
+        return None
+    if LLM_CACHE_BACKEND == "mongo":
+        if database is None:
+            print("未传入 Mongo 数据库，LLM 缓存改存本地目录")
+        else:
+            return LLMResponseCache(MongoCacheStore(database[LLM_CACHE_COLLECTION]))
+    return LLMResponseCache(DiskCacheStore(LLM_CACHE_DIR))
@@ -1,7 +1,10 @@
+import hashlib
 import json
 import os
+import re
 import asyncio
-from typing import List, Dict, Any, Optional
+import random
+from typing import List, Dict, Any, Optional, Tuple
 
 try:
     from openai import AsyncOpenAI
@@ -13,19 +16,157 @@ try:
 except ImportError:
     pass
 
+from services.llm_cache import LLMResponseCache, cache_key, create_llm_cache
+from services.llm_limiter import (
+    AdaptiveLimiter,
+    is_overload,
+    is_transient,
+    retry_after_seconds,
+    shared_limiter,
+)
+
+# 限流/过载和暂时性错误的重试次数，SDK 自带的重试关闭，由并发控制器统一处理
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY = 2  # 秒，没有 retry-after 时按 base * 2^n 退避
+LLM_RETRY_MAX_DELAY = 60
+
+# 模型上下文和单次输出上限（按模型名包含的关键字匹配），可用环境变量覆盖
+MODEL_LIMITS = {
+    "claude": {"context": 200000, "max_output": 8192},
+    "gpt-4o": {"context": 128000, "max_output": 16384},
+    "deepseek": {"context": 64000, "max_output": 8192},
+}
+DEFAULT_MODEL_LIMITS = {"context": 32000, "max_output": 4096}
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "0"))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "0"))
+# 输出预算里预留给推理模型思考内容等不可控部分的 token
+LLM_OUTPUT_RESERVE = int(os.getenv("LLM_OUTPUT_RESERVE", "1024"))
+
+# 文章评估分批：按输入、输出 token 预算装箱，不再固定 50 篇一批
+EVAL_OUTPUT_TOKENS_PER_ITEM = (
+    80  # 每篇评估结果（按编号回传，不含标题）的 JSON 约占 token
+)
+EVAL_INPUT_TOKENS_PER_ITEM = 8  # 每篇输入的 JSON 缩进和分隔符
+EVAL_MAX_ITEMS = 100  # 单批上限，限制一次失败影响的范围
+
+# 长文总结（map-reduce）：超出单次预算的内容按标题、段落切块分别提炼要点，再合并为一次最终总结
+SUMMARY_CHUNK_TOKENS = int(
+    os.getenv("LLM_SUMMARY_CHUNK_TOKENS", "6000")
+)  # 单块上限，控制单次调用延迟
+SUMMARY_MAX_CHUNKS = 16  # 块数上限，更长的内容放大块大小
+SUMMARY_NOTE_CHARS = 400  # 每块要点的字数上限，保证合并时不超出上下文
+
+RE_HEADING = re.compile(r"^#{1,6}\s")
+RE_FENCE = re.compile(r"^(```|~~~)")
+RE_CJK = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日文字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = len(RE_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_markdown(content: str, max_tokens: int) -> List[str]:
+    """按 Markdown 标题和段落切块，每块不超过 max_tokens；代码块内不切，单段过长时按长度切开"""
+    blocks: List[str] = []
+    current: List[str] = []
+    in_fence = False
+    for line in content.split("\n"):
+        stripped = line.strip()
+        if not in_fence and (not stripped or RE_HEADING.match(line)):
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            if not stripped:
+                continue
+        if RE_FENCE.match(stripped):
+            in_fence = not in_fence
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+
+    pieces: List[str] = []
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if tokens <= max_tokens:
+            pieces.append(block)
+            continue
+        size = max(1, len(block) * max_tokens // tokens)
+        pieces.extend(block[i : i + size] for i in range(0, len(block), size))
+
+    chunks: List[str] = []
+    current, used = [], 0
+    for piece in pieces:
+        cost = estimate_tokens(piece) + 1
+        # 新章节开始且当前块已过半时另起一块，尽量不把章节拆开
+        new_section = RE_HEADING.match(piece) and used > max_tokens // 2
+        if current and (used + cost > max_tokens or new_section):
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(piece)
+        used += cost
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def model_limits(model_name: Optional[str]) -> Dict[str, int]:
+    name = (model_name or "").lower()
+    limits = next(
+        (v for k, v in MODEL_LIMITS.items() if k in name), DEFAULT_MODEL_LIMITS
+    )
+    return {
+        "context": LLM_CONTEXT_TOKENS or limits["context"],
+        "max_output": LLM_MAX_OUTPUT_TOKENS or limits["max_output"],
+    }
+
+
+class LLMTruncatedError(Exception):
+    """输出达到 max_tokens 被截断，content 为已生成的部分"""
+
+    def __init__(self, content: str):
+        super().__init__(f"LLM 输出被截断 ({len(content)} 字符)")
+        self.content = content
+
 
 class LLMService:
     def __init__(
         self,
         settings_path: str = "exmemo_tools_settings_2026-02-19.json",
         model_name: Optional[str] = None,
+        cache: Optional[LLMResponseCache] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
     ):
         self.settings_path = settings_path
         self._load_settings()
+        # 未传入时按 LLM_CACHE_BACKEND 创建（默认本地目录），off 时不缓存
+        self.cache = cache if cache is not None else create_llm_cache()
 
         self.client = None
         self.provider = "openai"
         self.model_name = model_name or self.settings.get("llmModelName")
+        limits = model_limits(self.model_name)
+        self.context_tokens = limits["context"]
+        self.max_output_tokens = limits["max_output"]
+        self.eval_stats = {
+            "requests": 0,
+            "items": 0,
+            "splits": 0,
+            "truncated": 0,
+            "unparsable": 0,
+            "missing_items": 0,
+            "rebatched": 0,
+            "failed_items": 0,
+        }
+        self.summary_stats = {
+            "single": 0,
+            "map_reduce": 0,
+            "chunks": 0,
+            "chunk_failures": 0,
+        }
 
         llm_base_url = self.settings.get("llmBaseUrl", "")
         llm_token = self.settings.get("llmToken")
@@ -49,27 +190,51 @@ class LLMService:
                 ):
                     llm_base_url = llm_base_url.rstrip("/") + "/anthropic"
 
-                self.client = AsyncAnthropic(api_key=llm_token, base_url=llm_base_url)
+                self.client = AsyncAnthropic(
+                    api_key=llm_token, base_url=llm_base_url, max_retries=0
+                )
             else:
                 print("检测到 Anthropic 提供商，但未安装 anthropic 包。")
 
         if not self.client and "AsyncOpenAI" in globals():
             self.provider = "openai"
-            self.client = AsyncOpenAI(api_key=llm_token, base_url=llm_base_url)
+            self.client = AsyncOpenAI(
+                api_key=llm_token, base_url=llm_base_url, max_retries=0
+            )
 
         if not self.client:
             raise ImportError("未找到或配置合适的 LLM 客户端。")
 
+        # 并发控制器：未传入时与同一进程里访问同一服务商的其它 LLMService 共享
+        self.limiter = limiter or shared_limiter(llm_base_url, self.model_name)
+
     def _load_settings(self):
         if os.path.exists(self.settings_path):
             with open(self.settings_path, "r", encoding="utf-8") as f:
                 self.settings = json.load(f)
         else:
             self.settings = {}
+        # 配置版本：提示词配置变化后旧缓存自动失效
+        self.settings_version = hashlib.sha256(
+            json.dumps(self.settings, sort_keys=True, ensure_ascii=False).encode(
+                "utf-8"
+            )
+        ).hexdigest()[:12]
 
     def construct_system_prompt(self) -> str:
         return "You are a helpful assistant capable of analyzing text and extracting structured information. You must return valid JSON only, without any markdown formatting or code blocks."
 
+    def summary_fields(self) -> List[str]:
+        """总结结果中由 LLM 生成的字段名，复用重复文章的总结时按这些字段复制"""
+        fields = [
+            self.settings.get("metaDescriptionFieldName", "description"),
+            self.settings.get("metaTagsFieldName", "tags"),
+        ]
+        for item in self.settings.get("customMetadata", []):
+            if item.get("type") == "prompt" and item.get("key"):
+                fields.append(item["key"])
+        return fields
+
     def construct_summary_prompt(self, content: str) -> str:
         instructions = []
 
@@ -101,6 +266,17 @@ Instructions:
 
 Content:
 {truncated_content}
+"""
+        return prompt
+
+    def construct_chunk_prompt(self, chunk: str, index: int, total: int) -> str:
+        prompt = f"""
+The following is part {index}/{total} of a long article.
+Extract the key points, arguments, facts and figures of this part, in the same language as the content, within {SUMMARY_NOTE_CHARS} characters.
+Return a JSON object: {{"notes": "..."}}
+
+Content:
+{chunk}
 """
         return prompt
 
@@ -121,21 +297,22 @@ Content:
 - 认知提升、心理韧性，自信
 - 金融行业资讯动态，金融政策法规
 
-任务：一次性接收几十篇文章含title, description），为每篇输出：
-- title
+任务：一次性接收几十篇文章（含id, title, description），为每篇输出：
+- id（原样返回输入中的id，不要输出title）
 - pre_value_score（1-10，基于领域相关性、实用性、新颖性， 要非常严格的评分，大胆给低分，精力聚焦）
 - article_type（从预定义列表选，只选1个）
 - pre_value_score_reason（一句话说明价值或排除原因）
 标签列表：["旅行","娱乐","灵感创意","方法论","工作思考","投资","健康","摘录","世界观","美食","金融","心理学","个人成长","科技","数据挖掘","AI","人工智能","编程","理财"]
 
-输入JSON格式：[{{"title":"...","description":"..."}}, ...]
-输出JSON格式：{{"articles":[{{"title":"...","pre_value_score":5,"article_type":人工智能","pre_value_score_reason":"..."}}, ...]}}
+输入JSON格式：[{{"id":1,"title":"...","description":"..."}}, ...]
+输出JSON格式：{{"articles":[{{"id":1,"pre_value_score":5,"article_type":"人工智能","pre_value_score_reason":"..."}}, ...]}}
 
 规则：
 1. 仅输出JSON，无额外文字。
 2. 无关文章pre_value_score=1，原因简明。
 3. 标签严格从列表选择。
 4. 确保JSON有效。
+5. 每篇输入都要输出一条，id不能遗漏或重复。
 
 输入文章列表：
 {articles_json}
@@ -143,6 +320,38 @@ Content:
         return prompt
 
     async def _call_llm(self, prompt: str) -> str:
+        """经并发控制器发出请求：过载时降低并发并按 retry-after 等待，暂时性错误退避重试"""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            async with self.limiter.slot() as slot:
+                try:
+                    result_content = await self._request(prompt)
+                    slot.success(
+                        estimate_tokens(prompt) + estimate_tokens(result_content)
+                    )
+                    return result_content
+                except LLMTruncatedError as e:
+                    # 请求本身成功，交给调用方拆分或使用部分内容
+                    slot.success(estimate_tokens(prompt) + estimate_tokens(e.content))
+                    raise
+                except Exception as e:
+                    error = e
+                    overload = is_overload(e)
+                    retry_after = retry_after_seconds(e) if overload else None
+                    if overload:
+                        slot.overload(retry_after)
+                    else:
+                        slot.error()
+                    if attempt >= LLM_MAX_RETRIES or not (overload or is_transient(e)):
+                        raise
+
+            print(f"LLM 调用失败 ({type(error).__name__})，第 {attempt + 1} 次重试")
+            # 有 retry-after 时下一次取并发槽会等待暂停结束；没有时按指数退避并加抖动
+            if retry_after is None:
+                delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2**attempt)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+        return ""
+
+    async def _request(self, prompt: str) -> str:
         result_content = ""
         if self.provider == "openai":
             response = await self.client.chat.completions.create(
@@ -154,10 +363,12 @@ Content:
                 response_format={"type": "json_object"},
             )
             result_content = response.choices[0].message.content
+            if response.choices[0].finish_reason == "length":
+                raise LLMTruncatedError(result_content or "")
         elif self.provider == "anthropic":
             response = await self.client.messages.create(
                 model=self.model_name,
-                max_tokens=4096,
+                max_tokens=self.max_output_tokens,
                 system=self.construct_system_prompt(),
                 messages=[{"role": "user", "content": prompt}],
             )
@@ -165,17 +376,223 @@ Content:
                 for block in response.content:
                     if block.type == "text":
                         result_content += block.text
+            if response.stop_reason == "max_tokens":
+                raise LLMTruncatedError(result_content)
         return result_content
 
+    async def _cached_call(
+        self, prompt: str, kind: str, strict: bool = False
+    ) -> Dict[str, Any]:
+        """相同 (模型, 系统提示词, 提示词, 配置版本) 直接返回缓存的响应；只缓存能解析的完整结果
+
+        输出被截断时 strict 抛出 LLMTruncatedError，否则按已生成的部分解析。
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(
+                self.provider,
+                self.model_name,
+                self.construct_system_prompt(),
+                prompt,
+                self.settings_version,
+            )
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return self._parse_json(cached)
+
+        try:
+            result_content = await self._call_llm(prompt)
+        except LLMTruncatedError as e:
+            if strict:
+                raise
+            print(f"{e}，按已生成的部分解析")
+            return self._parse_json(e.content)
+
+        result = self._parse_json(result_content)
+        if result and key is not None:
+            await self.cache.set(
+                key,
+                result_content,
+                kind=kind,
+                model=self.model_name,
+                tokens=estimate_tokens(prompt) + estimate_tokens(result_content),
+            )
+        return result
+
     async def process_content(self, content: str) -> Dict[str, Any]:
-        prompt = self.construct_summary_prompt(content)
-        result_content = await self._call_llm(prompt)
-        return self._parse_json(result_content)
+        """内容在单次预算内直接总结；超长时分块提炼要点再合并，覆盖全文而不是只看开头"""
+        if estimate_tokens(content) <= SUMMARY_CHUNK_TOKENS:
+            self.summary_stats["single"] += 1
+            prompt = self.construct_summary_prompt(content)
+            return await self._cached_call(prompt, "summary")
+        return await self._summarize_chunks(content)
+
+    async def _summarize_chunks(self, content: str) -> Dict[str, Any]:
+        total_tokens = estimate_tokens(content)
+        chunk_tokens = max(SUMMARY_CHUNK_TOKENS, -(-total_tokens // SUMMARY_MAX_CHUNKS))
+        chunks = split_markdown(content, chunk_tokens)
+        self.summary_stats["map_reduce"] += 1
+        self.summary_stats["chunks"] += len(chunks)
+        print(f"长文约 {total_tokens} tokens，分 {len(chunks)} 块并发总结")
+
+        # 各块并发调用，并发由自适应控制器限制；已完成的块有缓存，重试整篇时不重复调用
+        results = await asyncio.gather(
+            *[
+                self._cached_call(
+                    self.construct_chunk_prompt(chunk, i + 1, len(chunks)),
+                    "summary_chunk",
+                )
+                for i, chunk in enumerate(chunks)
+            ],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        notes = []
+        for i, result in enumerate(results):
+            note = result.get("notes") if isinstance(result, dict) else None
+            if isinstance(note, list):
+                note = "\n".join(str(n) for n in note)
+            if not note:
+                self.summary_stats["chunk_failures"] += 1
+                print(f"第 {i + 1}/{len(chunks)} 块总结无法解析，合并时跳过")
+                continue
+            notes.append(f"[Part {i + 1}/{len(chunks)}]\n{note}")
+        if not notes:
+            return {}
+
+        merged = (
+            "The content below is a set of ordered notes that together cover every part of a long article. "
+            "Treat them as the full article.\n\n" + "\n\n".join(notes)
+        )
+        return await self._cached_call(self.construct_summary_prompt(merged), "summary")
+
+    def plan_evaluation_batches(
+        self, articles: List[Dict[str, str]]
+    ) -> List[Tuple[int, int]]:
+        """按输入、输出 token 预算把文章按顺序切成若干批，返回 [start, end) 区间"""
+        output_budget = max(
+            EVAL_OUTPUT_TOKENS_PER_ITEM, self.max_output_tokens - LLM_OUTPUT_RESERVE
+        )
+        input_budget = (
+            self.context_tokens
+            - self.max_output_tokens
+            - estimate_tokens(self.construct_system_prompt())
+            - estimate_tokens(self.construct_evaluation_prompt([]))
+        )
+        batches = []
+        start, used_input, used_output = 0, 0, 0
+        for i, article in enumerate(articles):
+            input_cost = EVAL_INPUT_TOKENS_PER_ITEM + estimate_tokens(
+                json.dumps(article, ensure_ascii=False)
+            )
+            output_cost = EVAL_OUTPUT_TOKENS_PER_ITEM
+            if i > start and (
+                used_input + input_cost > input_budget
+                or used_output + output_cost > output_budget
+                or i - start >= EVAL_MAX_ITEMS
+            ):
+                batches.append((start, i))
+                start, used_input, used_output = i, 0, 0
+            used_input += input_cost
+            used_output += output_cost
+        if start < len(articles):
+            batches.append((start, len(articles)))
+        return batches
+
+    async def _evaluate_chunk(
+        self, articles: List[Dict[str, str]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """评估一批文章，按编号把结果对回输入，返回与输入一一对应的列表
+
+        截断或无法解析时二分重试；部分文章缺失时只把缺失的文章另组一批重试；单篇仍失败记为 None。
+        """
+        self.eval_stats["requests"] += 1
+        # 编号只在本批内有效，模型漏项、乱序或改写标题都不会把结果对错文章
+        prompt = self.construct_evaluation_prompt(
+            [{"id": i + 1, **article} for i, article in enumerate(articles)]
+        )
+        try:
+            result = await self._cached_call(prompt, "evaluate", strict=True)
+        except LLMTruncatedError:
+            result, reason = {}, "truncated"
+        else:
+            reason = "unparsable"
+
+        evaluated: List[Optional[Dict[str, Any]]] = [None] * len(articles)
+        items = result.get("articles") if isinstance(result, dict) else None
+        if isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    index = int(item.pop("id", 0)) - 1
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= index < len(articles) and evaluated[index] is None:
+                    # 标题以输入为准，不用模型回传的
+                    evaluated[index] = {
+                        **item,
+                        "title": articles[index].get("title", ""),
+                    }
+        missing = [i for i, item in enumerate(evaluated) if item is None]
+        if not missing:
+            return evaluated
+
+        if len(missing) < len(articles):
+            # 部分结果可用：缺失的文章另组一批重试
+            self.eval_stats["missing_items"] += len(missing)
+            self.eval_stats["rebatched"] += 1
+            print(f"文章评估缺少 {len(missing)}/{len(articles)} 篇，缺失部分重新评估")
+            retried = await self._evaluate_chunk([articles[i] for i in missing])
+            for i, item in zip(missing, retried):
+                evaluated[i] = item
+            return evaluated
+
+        self.eval_stats[reason] += 1
+        if len(articles) == 1:
+            self.eval_stats["failed_items"] += 1
+            print(f"文章评估失败 ({reason}): {articles[0].get('title', '')}")
+            return [None]
+        self.eval_stats["splits"] += 1
+        mid = len(articles) // 2
+        print(f"文章评估结果不完整 ({reason})，{len(articles)} 篇拆成两批重试")
+        left, right = await asyncio.gather(
+            self._evaluate_chunk(articles[:mid]), self._evaluate_chunk(articles[mid:])
+        )
+        return left + right
 
     async def evaluate_articles(self, articles: List[Dict[str, str]]) -> Dict[str, Any]:
-        prompt = self.construct_evaluation_prompt(articles)
-        result_content = await self._call_llm(prompt)
-        return self._parse_json(result_content)
+        """按 token 预算分批评估，articles 与输入顺序一一对应（失败的为 None），failed 为失败篇数"""
+        batches = self.plan_evaluation_batches(articles)
+        self.eval_stats["items"] += len(articles)
+        if len(batches) > 1:
+            print(f"评估 {len(articles)} 篇，按 token 预算分为 {len(batches)} 批")
+        chunks = await asyncio.gather(
+            *[self._evaluate_chunk(articles[start:end]) for start, end in batches]
+        )
+        evaluated = [item for chunk in chunks for item in chunk]
+        return {
+            "articles": evaluated,
+            "failed": sum(item is None for item in evaluated),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model_name,
+            "settings_version": self.settings_version,
+            "concurrency": self.limiter.status(),
+            "evaluation": {
+                "context_tokens": self.context_tokens,
+                "max_output_tokens": self.max_output_tokens,
+                **self.eval_stats,
+            },
+            "summary": {"chunk_tokens": SUMMARY_CHUNK_TOKENS, **self.summary_stats},
+            "cache": self.cache.status() if self.cache else None,
+        }
 
     def _parse_json(self, content: str) -> Dict[str, Any]:
         if not content:
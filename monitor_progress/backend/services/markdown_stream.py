@@ -0,0 +1,185 @@
+import io
+import re
+from typing import Optional, Set
+
+from bs4 import Comment, Doctype, NavigableString, Tag
+from markdownify import (
+    MarkdownConverter,
+    should_remove_whitespace_inside,
+    should_remove_whitespace_outside,
+)
+
+# 这些块级标签直接流式输出，不再先拼出整个子树的字符串
+STREAM_BLOCK_TAGS = {"p", "div", "section", "article"}
+# 没有转换规则的行内容器，直接展开其子节点
+STREAM_TRANSPARENT_TAGS = {"span", "font", "center", "mpchecktext", "mp-style-type"}
+SKIP_TAGS = {"script", "style"}
+
+RE_EXTRACT_NEWLINES = re.compile(r"^(\n*)((?:.*[^\n])?)(\n*)$", flags=re.DOTALL)
+RE_LINE_INDENT = re.compile(r"^ {1,3}(?=\S)")
+RE_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_markdown(text: str) -> str:
+    """去掉不影响渲染的空白差异：行尾空白、行首 1~3 个空格、连续空行的数量"""
+    lines = [RE_LINE_INDENT.sub("", line.rstrip()) for line in text.split("\n")]
+    return RE_BLANK_LINES.sub("\n\n", "\n".join(lines)).strip("\n")
+
+
+def join_newlines(left: str, right: str) -> str:
+    """拼接两个相邻片段：左侧结尾和右侧开头的换行合并为较多的一方（最多两个）"""
+    if not left.endswith("\n") or not right.startswith("\n"):
+        return left + right
+    trailing = len(left) - len(left.rstrip("\n"))
+    leading = len(right) - len(right.lstrip("\n"))
+    return left[:-trailing] + "\n" * min(2, max(trailing, leading)) + right[leading:]
+
+
+class MarkdownWriter:
+    """增量写入 Markdown：合并块之间的换行（最多两个），丢弃块边界处的空白"""
+
+    def __init__(self, out: Optional[io.TextIOBase] = None):
+        self.out = out or io.StringIO()
+        self._started = False
+        self._newlines = 0
+        self._space = ""
+        # 待写换行能否与下一段开头的换行合并；markdownify 中只有换行的片段（如空 blockquote）不参与合并
+        self._collapse = True
+        self.writes = 0
+
+    def _merge(self, newlines: int) -> int:
+        if self._collapse:
+            return min(2, max(self._newlines, newlines))
+        return min(2, self._newlines + newlines)
+
+    def block(self, newlines: int = 2):
+        if self._started:
+            # 块前面 <br> 留下的换行也计入，否则 "  \n" + 块边界会从空行变成单个换行
+            self._newlines = max(self._merge(newlines), self._space.count("\n"))
+            self._space = ""
+            self._collapse = True
+
+    def text(self, text: str):
+        if not text:
+            return
+        if self._started and self._newlines:
+            # 块边界后的空白：开头的换行与块边界合并，"  \n"（<br>）里的换行另外累加
+            leading = text[: len(text) - len(text.lstrip(" \t\r\n"))]
+            merged = len(leading) - len(leading.lstrip("\n"))
+            self._newlines = min(2, self._merge(merged) + leading[merged:].count("\n"))
+        if not self._started or self._newlines:
+            text = text.lstrip(" \t\r\n")
+        else:
+            # 与前面未写出的空白拼接，相邻片段首尾的换行按 markdownify 规则合并
+            text = join_newlines(self._space, text)
+            self._space = ""
+        content = text.rstrip(" \t\r\n")
+        if not content:
+            if self._started and not self._newlines:
+                self._space = text
+            return
+        if self._newlines:
+            self.out.write("\n" * self._newlines)
+        self.out.write(content)
+        self.writes += 1
+        self._started = True
+        self._newlines = 0
+        self._collapse = True
+        self._space = text[len(content) :]
+
+    def mark(self):
+        return self.writes, self._newlines, self._space, self._collapse
+
+    def restore(self, mark):
+        """块内没有写出任何内容时撤销块边界，与 markdownify 对空块输出空字符串一致"""
+        if mark[0] == self.writes:
+            self._newlines, self._space, self._collapse = mark[1:]
+            return True
+        return False
+
+    def chunk(self, markdown: str):
+        """写入一段已转换好的 Markdown，首尾换行按块边界处理"""
+        if not markdown:
+            return
+        leading, content, trailing = RE_EXTRACT_NEWLINES.match(markdown).groups()
+        if not content:
+            self.block(len(leading))
+            self._collapse = False
+            return
+        if leading:
+            self.block(len(leading))
+        self.text(content)
+        if trailing:
+            self.block(len(trailing))
+
+    def getvalue(self) -> str:
+        return self.out.getvalue()
+
+
+class StreamingMarkdownConverter(MarkdownConverter):
+    """单次遍历已解析的 DOM，把 Markdown 增量写入缓冲区，规则与 markdownify 默认配置一致
+
+    段落/section/div 这类大块内容直接流式写出；标题、链接、列表、表格等小片段
+    仍交给 markdownify 的转换函数，保证图片、链接、标题的输出格式不变。
+    与 md(str(node)) 的渲染结果相同，但不保证逐字节一致：经 normalize_markdown
+    去掉空白差异后相等（空行数量、行首尾空白可能不同）。
+    """
+
+    def convert_node(self, node: Tag, out: Optional[io.TextIOBase] = None) -> str:
+        writer = MarkdownWriter(out)
+        self._stream_children(node, set(), writer)
+        return writer.getvalue()
+
+    def _can_ignore(self, node: Tag, el) -> bool:
+        if isinstance(el, Tag):
+            return False
+        if isinstance(el, (Comment, Doctype)):
+            return True
+        if isinstance(el, NavigableString):
+            if el.strip() != "":
+                return False
+            if should_remove_whitespace_inside(node) and (
+                not el.previous_sibling or not el.next_sibling
+            ):
+                return True
+            return should_remove_whitespace_outside(
+                el.previous_sibling
+            ) or should_remove_whitespace_outside(el.next_sibling)
+        return True
+
+    def _stream_children(
+        self, node: Tag, parent_tags: Set[str], writer: MarkdownWriter
+    ):
+        child_tags = set(parent_tags)
+        if node.name:
+            child_tags.add(node.name)
+        for el in node.children:
+            if self._can_ignore(node, el):
+                continue
+            if isinstance(el, NavigableString):
+                writer.text(self.process_text(el, parent_tags=child_tags))
+            else:
+                self._stream_tag(el, child_tags, writer)
+
+    def _stream_tag(self, el: Tag, parent_tags: Set[str], writer: MarkdownWriter):
+        name = el.name
+        if name in SKIP_TAGS:
+            return
+        if "_inline" not in parent_tags and name in STREAM_BLOCK_TAGS:
+            mark = writer.mark()
+            writer.block(2)
+            self._stream_children(el, parent_tags, writer)
+            if not writer.restore(mark):
+                writer.block(2)
+        elif name in STREAM_TRANSPARENT_TAGS:
+            self._stream_children(el, parent_tags, writer)
+        elif name in ("img", "br"):
+            # 换行的 "  \n" 需要原样保留，不能当作块边界
+            writer.text(self.process_tag(el, parent_tags=parent_tags))
+        else:
+            # 标题、链接、强调、列表、表格、代码块等按 markdownify 原规则整体转换
+            writer.chunk(self.process_tag(el, parent_tags=parent_tags))
+
+
+def convert_node(node: Tag) -> str:
+    return StreamingMarkdownConverter().convert_node(node)
@@ -0,0 +1,241 @@
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# 代理列表，逗号分隔；未配置时回退到 HTTP_PROXY / HTTPS_PROXY 单个代理
+CLIP_PROXIES = os.getenv("CLIP_PROXIES", "")
+
+# 同一站点固定使用同一代理的秒数
+PROXY_STICKY_TTL = int(os.getenv("PROXY_STICKY_TTL", "600"))
+PROXY_WINDOW = 20  # 成功率按最近 N 次结果计算
+PROXY_EVICT_FAILURES = 3  # 连续失败次数达到后剔除
+PROXY_MIN_SUCCESS_RATE = 0.5  # 样本足够时成功率低于该值剔除
+PROXY_MIN_SAMPLES = 8
+PROXY_COOLDOWN = 120  # 剔除后暂停的秒数，再次剔除时翻倍
+PROXY_MAX_COOLDOWN = 1800
+PROXY_LATENCY_ALPHA = 0.3  # 延迟的指数移动平均系数
+# 延迟超过最快代理的倍数、或超过绝对上限时解除站点粘滞，重新选择
+PROXY_SLOW_FACTOR = 3
+PROXY_SLOW_MS = int(os.getenv("PROXY_SLOW_MS", "5000"))
+
+# 这些失败说明代理本身有问题（连不上、超时、出口 IP 被风控）；4xx、DNS 等是目标站点的问题
+PROXY_FAULT_ERRORS = {"network", "timeout", "challenge", "proxy"}
+
+
+def mask_proxy(proxy: str) -> str:
+    """状态输出里隐藏代理账号密码"""
+    parsed = urlparse(proxy)
+    if parsed.password:
+        return proxy.replace(f"{parsed.username}:{parsed.password}@", "***@")
+    return proxy
+
+
+def playwright_proxy(proxy: Optional[str]) -> Optional[Dict[str, str]]:
+    """Playwright 的代理配置需要把账号密码单独传入"""
+    if not proxy:
+        return None
+    parsed = urlparse(proxy)
+    settings = {"server": f"{parsed.scheme}://{parsed.hostname}:{parsed.port}"}
+    if parsed.username:
+        settings["username"] = parsed.username
+        settings["password"] = parsed.password or ""
+    return settings
+
+
+class _ProxyState:
+    def __init__(self, url: str):
+        self.url = url
+        self.outcomes: deque = deque(maxlen=PROXY_WINDOW)
+        self.latency_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.evictions = 0
+        self.evicted_until = 0.0
+        self.inflight = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def success_rate(self) -> float:
+        # 乐观先验：没有样本的代理按全部成功计，保证新代理和冷却结束的代理会被尝试
+        return (sum(self.outcomes) + 1) / (len(self.outcomes) + 1)
+
+    def healthy(self, now: float) -> bool:
+        return self.evicted_until <= now
+
+    def score(self) -> float:
+        # 成功率越高、延迟越低分数越高；正在使用的越多分数越低，分摊负载
+        latency = self.latency_ms or 0.0
+        return self.success_rate / (1 + latency / 1000) / (1 + self.inflight)
+
+
+class ProxyPool:
+    """剪藏代理池：按延迟和成功率打分，同一站点粘滞使用同一代理，坏代理自动剔除并冷却"""
+
+    def __init__(
+        self,
+        proxies: List[str],
+        sticky_ttl: int = PROXY_STICKY_TTL,
+        slow_ms: float = PROXY_SLOW_MS,
+    ):
+        self._proxies: Dict[str, _ProxyState] = {}
+        for proxy in proxies:
+            proxy = proxy.strip()
+            if proxy and proxy not in self._proxies:
+                self._proxies[proxy] = _ProxyState(proxy)
+        self.sticky_ttl = sticky_ttl
+        self.slow_ms = slow_ms
+        # 站点 -> (代理, 过期时间)
+        self._sticky: Dict[str, Tuple[str, float]] = {}
+        self.stats = {"assigned": 0, "sticky_hits": 0, "evictions": 0, "all_evicted": 0}
+
+    @classmethod
+    def from_env(cls) -> "ProxyPool":
+        proxies = [p for p in CLIP_PROXIES.split(",") if p.strip()]
+        if not proxies:
+            proxy = (
+                os.environ.get("HTTP_PROXY")
+                or os.environ.get("http_proxy")
+                or os.environ.get("HTTPS_PROXY")
+                or os.environ.get("https_proxy")
+            )
+            proxies = [proxy] if proxy else []
+        return cls(proxies)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._proxies)
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def acquire(self, url: str) -> Optional[str]:
+        """为一次抓取分配代理；未配置代理时返回 None（直连）"""
+        if not self._proxies:
+            return None
+        now = time.monotonic()
+        host = self.host_key(url)
+
+        sticky = self._sticky.get(host)
+        if sticky and sticky[1] > now and self._proxies[sticky[0]].healthy(now):
+            state = self._proxies[sticky[0]]
+            self.stats["sticky_hits"] += 1
+        else:
+            healthy = [s for s in self._proxies.values() if s.healthy(now)]
+            if healthy:
+                state = max(healthy, key=lambda s: s.score())
+            else:
+                # 全部被剔除时用最早结束冷却的代理，不让剪藏完全停下
+                self.stats["all_evicted"] += 1
+                state = min(self._proxies.values(), key=lambda s: s.evicted_until)
+            self._sticky[host] = (state.url, now + self.sticky_ttl)
+
+        state.inflight += 1
+        self.stats["assigned"] += 1
+        return state.url
+
+    def report(
+        self,
+        proxy: Optional[str],
+        url: str,
+        ok: bool,
+        latency_ms: Optional[float] = None,
+        error_class: Optional[str] = None,
+    ):
+        state = self._proxies.get(proxy) if proxy else None
+        if state is None:
+            return
+        state.inflight = max(0, state.inflight - 1)
+
+        if ok:
+            state.outcomes.append(1)
+            state.successes += 1
+            state.consecutive_failures = 0
+            if latency_ms is not None:
+                state.latency_ms = (
+                    latency_ms
+                    if state.latency_ms is None
+                    else PROXY_LATENCY_ALPHA * latency_ms
+                    + (1 - PROXY_LATENCY_ALPHA) * state.latency_ms
+                )
+                if (
+                    state.latency_ms > self.slow_ms
+                    or state.latency_ms > PROXY_SLOW_FACTOR * self._best_latency()
+                ):
+                    self._unstick(self.host_key(url), proxy)
+            return
+        if error_class in PROXY_FAULT_ERRORS:
+            self._record_failure(state, url, error_class)
+
+    def report_challenge(self, url: str):
+        """抓取成功但拿到的是验证页：记到该站点当前粘滞的代理上"""
+        sticky = self._sticky.get(self.host_key(url))
+        state = self._proxies.get(sticky[0]) if sticky else None
+        if state is not None:
+            self._record_failure(state, url, "challenge")
+
+    def _record_failure(self, state: _ProxyState, url: str, error_class: str):
+        state.outcomes.append(0)
+        state.failures += 1
+        state.consecutive_failures += 1
+        if error_class == "challenge":
+            # 出口 IP 被该站点风控，换一个代理
+            self._unstick(self.host_key(url), state.url)
+
+        low_rate = (
+            len(state.outcomes) >= PROXY_MIN_SAMPLES
+            and state.success_rate < PROXY_MIN_SUCCESS_RATE
+        )
+        if state.consecutive_failures >= PROXY_EVICT_FAILURES or low_rate:
+            self._evict(state)
+
+    def _unstick(self, host: str, proxy: str):
+        if self._sticky.get(host, ("",))[0] == proxy:
+            self._sticky.pop(host, None)
+
+    def _best_latency(self) -> float:
+        now = time.monotonic()
+        latencies = [
+            s.latency_ms
+            for s in self._proxies.values()
+            if s.latency_ms is not None and s.healthy(now)
+        ]
+        return min(latencies) if latencies else float("inf")
+
+    def _evict(self, state: _ProxyState):
+        cooldown = min(PROXY_MAX_COOLDOWN, PROXY_COOLDOWN * (2**state.evictions))
+        state.evictions += 1
+        state.evicted_until = time.monotonic() + cooldown
+        # 冷却结束后重新观察，不沿用旧样本
+        state.outcomes.clear()
+        state.consecutive_failures = 0
+        self.stats["evictions"] += 1
+        self._sticky = {h: v for h, v in self._sticky.items() if v[0] != state.url}
+        print(f"代理池: 剔除 {mask_proxy(state.url)}，冷却 {cooldown} 秒")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "sticky_hosts": len(self._sticky),
+            "proxies": [
+                {
+                    "proxy": mask_proxy(s.url),
+                    "healthy": s.healthy(now),
+                    "cooldown_s": max(0, round(s.evicted_until - now)),
+                    "success_rate": round(s.success_rate, 3),
+                    "latency_ms": (
+                        round(s.latency_ms, 1) if s.latency_ms is not None else None
+                    ),
+                    "score": round(s.score(), 4),
+                    "inflight": s.inflight,
+                    "successes": s.successes,
+                    "failures": s.failures,
+                    "evictions": s.evictions,
+                }
+                for s in self._proxies.values()
+            ],
+        }
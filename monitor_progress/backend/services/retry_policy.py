@@ -0,0 +1,172 @@
+import asyncio
+import random
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 失败分类：暂时性错误退避后重新排队，其余（dns/tls/http_4xx/unknown）直接放弃
+TRANSIENT_ERRORS = {"http_5xx", "timeout", "challenge", "network", "browser", "proxy"}
+
+# 4xx 里可以重试的状态码
+RETRYABLE_STATUS = {408, 425, 429}
+
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 5  # 秒，第 n 次重试的退避上限为 base * 2^n
+RETRY_MAX_DELAY = 300
+
+# 按顺序匹配异常信息（Playwright 的 net::ERR_* 以及 httpx/ssl 的报错）
+ERROR_PATTERNS = [
+    (
+        "dns",
+        [
+            "ERR_NAME_NOT_RESOLVED",
+            "ERR_NAME_RESOLUTION_FAILED",
+            "getaddrinfo",
+            "Name or service not known",
+            "nodename nor servname",
+        ],
+    ),
+    ("tls", ["ERR_CERT_", "ERR_SSL_", "CERTIFICATE_VERIFY_FAILED", "SSLError", "SSL:"]),
+    (
+        "proxy",
+        [
+            "ERR_PROXY_",
+            "ERR_TUNNEL_CONNECTION_FAILED",
+            "ProxyError",
+            "Proxy Authentication Required",
+        ],
+    ),
+    ("timeout", ["Timeout", "timed out", "ERR_TIMED_OUT"]),
+    (
+        "browser",
+        [
+            "Target page, context or browser has been closed",
+            "Browser has been closed",
+            "browser has disconnected",
+            "Target crashed",
+        ],
+    ),
+    (
+        "network",
+        [
+            "net::",
+            "ConnectError",
+            "Connection reset",
+            "Connection refused",
+            "RemoteProtocolError",
+        ],
+    ),
+]
+
+
+def classify_status(status: int) -> Optional[str]:
+    if status >= 500:
+        return "http_5xx"
+    if status >= 400:
+        return "http_4xx"
+    return None
+
+
+def classify_exception(exc: BaseException) -> str:
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    message = f"{type(exc).__name__}: {exc}"
+    for error_class, patterns in ERROR_PATTERNS:
+        if any(p in message for p in patterns):
+            return error_class
+    return "unknown"
+
+
+def is_retryable(error_class: str, status: Optional[int] = None) -> bool:
+    if status in RETRYABLE_STATUS:
+        return True
+    return error_class in TRANSIENT_ERRORS
+
+
+def error_result(
+    message: str, error_class: str, status: Optional[int] = None
+) -> Dict[str, Any]:
+    result = {
+        "error": message,
+        "error_class": error_class,
+        "retryable": is_retryable(error_class, status),
+    }
+    if status is not None:
+        result["status"] = status
+    return result
+
+
+class RetryPolicy:
+    """剪藏重试策略：按错误分类决定是否重试，带抖动的指数退避，退避期间不占用并发"""
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter，避免同一批失败的 URL 同时重试
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+    async def run(
+        self,
+        url: str,
+        call: Callable[[], Awaitable[Dict[str, Any]]],
+        scheduler=None,
+    ) -> Dict[str, Any]:
+        """执行 call 直到成功、遇到永久错误或用完次数；结果里附带 attempts 和各类失败次数"""
+        failures: Counter = Counter()
+        attempt = 0
+        while True:
+            if scheduler is not None:
+                async with scheduler.slot(url):
+                    result = await call()
+                scheduler.report(url, challenged=result.get("challenge", False))
+            else:
+                result = await call()
+            attempt += 1
+
+            if "error" in result:
+                failures[result.get("error_class", "unknown")] += 1
+
+            if (
+                "error" not in result
+                or not result.get("retryable")
+                or attempt >= self.max_attempts
+            ):
+                result["attempts"] = attempt
+                result["failures"] = dict(failures)
+                return result
+
+            delay = self.backoff(attempt - 1)
+            print(
+                f"剪藏失败 ({result.get('error_class')})，{delay:.1f} 秒后重新排队 ({attempt}/{self.max_attempts}): {url}"
+            )
+            await asyncio.sleep(delay)
+
+
+def failure_update(result: Dict[str, Any]) -> Dict[str, Any]:
+    """把本次剪藏的失败次数转换成文章文档上的 $inc / $set / $unset 更新"""
+    update: Dict[str, Any] = {}
+    failures = result.get("failures") or {}
+    if failures:
+        update["$inc"] = {
+            f"clip_failures.{error_class}": count
+            for error_class, count in failures.items()
+        }
+    if "error" in result:
+        update["$set"] = {
+            "clip_error": {
+                "error": result["error"],
+                "error_class": result.get("error_class", "unknown"),
+                "retryable": result.get("retryable", False),
+                "attempts": result.get("attempts", 1),
+            }
+        }
+    else:
+        update["$unset"] = {"clip_error": ""}
+    return update
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from bson import ObjectId
+except ImportError:
+    pass
+
+from services.url_canon import canonicalize_url
+
+# 已处理 URL 的布隆过滤器，持久化到本地文件，启动时加载并补齐新增文章
+URL_BLOOM_PATH = os.getenv("URL_BLOOM_PATH", "data/url_bloom.bin")
+URL_BLOOM_CAPACITY = int(os.getenv("URL_BLOOM_CAPACITY", "1000000"))
+URL_BLOOM_ERROR_RATE = float(os.getenv("URL_BLOOM_ERROR_RATE", "0.0001"))
+
+# 过滤器覆盖范围：所有已入库文章（含缺 source 的旧文章），文件头不符时重建
+URL_BLOOM_SCOPE = "all_articles"
+
+
+class BloomFilter:
+    """定长布隆过滤器，双重哈希生成 k 个位置"""
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        size_bits: Optional[int] = None,
+        hashes: Optional[int] = None,
+        bits: Optional[bytearray] = None,
+        count: int = 0,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size_bits = size_bits or math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = hashes or max(1, round(self.size_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, key: str) -> bool:
+        """加入 key，返回是否是新 key（按过滤器判断）"""
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key)
+        )
+
+    def header(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "size_bits": self.size_bits,
+            "hashes": self.hashes,
+            "count": self.count,
+        }
+
+
+class SeenUrls:
+    """任务 1 的 URL 存在性检查：过滤器收录所有已入库文章，未命中的一定是新文章，
+    不查 Mongo；命中的可能是误判，按页批量回查确认，误判的按新文章处理
+
+    写入文章的入口（任务 1、监控后台的单篇剪藏）入库后调用 add；其它进程写入的文章
+    由每次任务开始时的 warm 补齐。过滤器文件头记录最后一篇文章的 _id 和文章总数，
+    加载后只补齐新增文章；文章数变少（有删除）或超出容量时从 Mongo 全量重建。
+    """
+
+    def __init__(
+        self,
+        collection,
+        path: str = URL_BLOOM_PATH,
+        capacity: int = URL_BLOOM_CAPACITY,
+        error_rate: float = URL_BLOOM_ERROR_RATE,
+    ):
+        self.collection = collection
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom: Optional[BloomFilter] = None
+        self.last_id = None
+        self.doc_count = 0
+        self.stats = {
+            "checks": 0,
+            "bloom_negatives": 0,
+            "bloom_positives": 0,
+            "mongo_confirms": 0,
+            "false_positives": 0,
+            "added": 0,
+            "rebuilds": 0,
+            "loaded_from_file": 0,
+            "warm_seconds": 0.0,
+        }
+        try:
+            self.collection.create_index("canonical_url")
+        except Exception as e:
+            print(f"创建 canonical_url 索引失败: {e}")
+
+    def warm(self):
+        """加载持久化的过滤器并补齐新增文章，必要时全量重建；可重复调用"""
+        start = time.perf_counter()
+        if self.bloom is None and not self._load():
+            self._rebuild()
+        else:
+            doc_count = self.collection.estimated_document_count()
+            if doc_count < self.doc_count or doc_count > self.bloom.capacity:
+                self._rebuild()
+            else:
+                self._top_up()
+        self.stats["warm_seconds"] = round(time.perf_counter() - start, 3)
+        print(
+            f"URL 过滤器已就绪: {self.bloom.count} 条, 耗时 {self.stats['warm_seconds']}s"
+        )
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                bits = bytearray(f.read())
+            if len(bits) * 8 < header["size_bits"]:
+                raise ValueError("文件长度与头部不符")
+            if header.get("scope") != URL_BLOOM_SCOPE:
+                raise ValueError("过滤器覆盖范围已变更")
+            self.bloom = BloomFilter(
+                header["capacity"],
+                header["error_rate"],
+                header["size_bits"],
+                header["hashes"],
+                bits,
+                header["count"],
+            )
+            self.last_id = (
+                ObjectId(header["last_id"]) if header.get("last_id") else None
+            )
+            self.doc_count = header.get("doc_count", 0)
+        except Exception as e:
+            print(f"加载 URL 过滤器失败，将重建: {e}")
+            self.bloom = None
+            return False
+        self.stats["loaded_from_file"] += 1
+        return True
+
+    def _rebuild(self):
+        doc_count = self.collection.estimated_document_count()
+        # 预留一倍余量，避免很快又因超出容量重建
+        capacity = max(self.capacity, doc_count * 2)
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        self.last_id = None
+        self.doc_count = 0
+        self._top_up()
+        self.stats["rebuilds"] += 1
+
+    def _top_up(self):
+        query = {}
+        if self.last_id is not None:
+            query["_id"] = {"$gt": self.last_id}
+        for doc in self.collection.find(query, {"url": 1, "canonical_url": 1}).sort(
+            "_id", 1
+        ):
+            canonical_url = doc.get("canonical_url") or canonicalize_url(
+                doc.get("url", "")
+            )
+            if canonical_url:
+                self.bloom.add(canonical_url)
+            self.last_id = doc["_id"]
+        self.doc_count = self.collection.estimated_document_count()
+
+    def save(self):
+        if self.bloom is None:
+            return
+        header = {
+            **self.bloom.header(),
+            "scope": URL_BLOOM_SCOPE,
+            "last_id": str(self.last_id) if self.last_id is not None else None,
+            "doc_count": self.doc_count,
+            "saved_at": datetime.now().isoformat(),
+        }
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再原子替换，中断时不会留下半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(self.bloom.bits)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def seen(self, canonical_url: str) -> bool:
+        """进程内判断：False 表示一定没入库；True 只表示可能入库（误判率约为 error_rate），需要 confirm 确认"""
+        self.stats["checks"] += 1
+        if self.bloom is not None and canonical_url in self.bloom:
+            self.stats["bloom_positives"] += 1
+            return True
+        self.stats["bloom_negatives"] += 1
+        return False
+
+    def confirm(self, pairs: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """批量确认过滤器命中的 (url, canonical_url)，一次查询返回 {规范化 URL: 已入库文章}
+
+        同时按 url 匹配还没有 canonical_url 字段的旧文章；返回的文档带 _id 和 source，
+        调用方据此给缺 source 的旧文章补写。
+        """
+        if not pairs:
+            return {}
+        canonical_urls = [canonical_url for _, canonical_url in pairs]
+        urls = list(dict.fromkeys(u for pair in pairs for u in pair))
+        self.stats["mongo_confirms"] += 1
+        existing = {}
+        for doc in self.collection.find(
+            {
+                "$or": [
+                    {"canonical_url": {"$in": canonical_urls}},
+                    {"url": {"$in": urls}},
+                ]
+            },
+            {"url": 1, "canonical_url": 1, "source": 1},
+        ):
+            canonical_url = doc.get("canonical_url") or canonicalize_url(
+                doc.get("url", "")
+            )
+            existing.setdefault(canonical_url, doc)
+        false_positives = [c for c in canonical_urls if c not in existing]
+        if false_positives:
+            self.stats["false_positives"] += len(false_positives)
+            print(
+                f"URL 过滤器误判 {len(false_positives)} 条，按新文章处理，例如: {false_positives[0]}"
+            )
+        return existing
+
+    def add(self, canonical_url: str):
+        if self.bloom is None:
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+        if self.bloom.add(canonical_url):
+            self.stats["added"] += 1
+
+    def status(self) -> Dict[str, Any]:
+        checks = self.stats["checks"]
+        return {
+            "path": self.path,
+            **(self.bloom.header() if self.bloom else {}),
+            **self.stats,
+            # 不需要查 Mongo 就得出结论的比例；命中的按页合并为 mongo_confirms 次查询
+            "in_process_ratio": (
+                round(self.stats["bloom_negatives"] / checks, 3) if checks else 0.0
+            ),
+        }
@@ -0,0 +1,121 @@
+import html
+from typing import Any, Dict, Optional, Set
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+from services.wechat_extractor import WECHAT_HOST
+
+# 所有站点都去掉的跟踪参数
+TRACKING_PARAMS = {
+    "spm",
+    "from",
+    "share_token",
+    "share_source",
+    "share_medium",
+    "share_plat",
+    "share_session_id",
+    "shareuid",
+    "isappinstalled",
+    "wxshare_count",
+    "fbclid",
+    "gclid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "ref_src",
+    "_hsenc",
+    "_hsmi",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+# 站点规则：域名 -> 保留的查询参数（None 表示去掉全部查询参数）
+SITE_QUERY_RULES: Dict[str, Optional[Set[str]]] = {
+    "zhuanlan.zhihu.com": None,
+    "www.zhihu.com": None,
+    "juejin.cn": None,
+    "sspai.com": None,
+    "www.36kr.com": None,
+    "36kr.com": None,
+    "www.jianshu.com": None,
+    "blog.csdn.net": None,
+    "www.bilibili.com": {"p"},
+    "www.youtube.com": {"v", "list"},
+    "news.ycombinator.com": {"id"},
+}
+
+# 微信文章由 __biz/mid/idx/sn 唯一确定，chksm、scene、sessionid 等都是分享时附加的
+WECHAT_ARTICLE_PATHS = {"/s", "/mp/appmsg/show"}
+WECHAT_ALIASES = {"appmsgid": "mid", "itemidx": "idx", "signature": "sn"}
+
+
+def _canonical_wechat(path: str, params: Dict[str, str]) -> Optional[str]:
+    if path.startswith("/s/") and len(path) > 3:
+        # 短链接 /s/<token>，查询参数都是跟踪参数
+        return f"https://{WECHAT_HOST}{path.rstrip('/')}"
+    if path not in WECHAT_ARTICLE_PATHS:
+        return None
+    for alias, name in WECHAT_ALIASES.items():
+        if alias in params and name not in params:
+            params[name] = params[alias]
+    biz, mid, sn = params.get("__biz"), params.get("mid"), params.get("sn")
+    if not (biz and mid and sn):
+        return None
+    query = "&".join(
+        [
+            f"__biz={quote(biz, safe='')}",
+            f"mid={mid.strip()}",
+            f"idx={(params.get('idx') or '1').strip()}",
+            f"sn={sn.strip().lower()}",
+        ]
+    )
+    return f"https://{WECHAT_HOST}/s?{query}"
+
+
+def canonicalize_url(url: str) -> str:
+    """规范化 URL：统一协议和域名大小写、去掉默认端口、锚点和跟踪参数，微信文章只保留 __biz/mid/idx/sn
+
+    无法解析的 URL 原样返回。
+    """
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(html.unescape(url))
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if scheme not in ("http", "https") or not host:
+        return url
+
+    pairs = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k]
+    if host == WECHAT_HOST:
+        canonical = _canonical_wechat(parts.path, dict(pairs))
+        if canonical:
+            return canonical
+
+    if host in SITE_QUERY_RULES:
+        allowed = SITE_QUERY_RULES[host]
+        pairs = [(k, v) for k, v in pairs if allowed and k in allowed]
+    pairs = sorted(
+        (k, v)
+        for k, v in pairs
+        if k.lower() not in TRACKING_PARAMS
+        and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    netloc = host
+    if port and not (
+        (scheme == "http" and port == 80) or (scheme == "https" and port == 443)
+    ):
+        netloc = f"{host}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(pairs), ""))
+
+
+def url_query(url: str) -> Dict[str, Any]:
+    """按规范化 URL 查找文章的 Mongo 条件，同时匹配还没有 canonical_url 字段的旧文章"""
+    canonical_url = canonicalize_url(url)
+    return {
+        "$or": [
+            {"canonical_url": canonical_url},
+            {"url": {"$in": list(dict.fromkeys([url, canonical_url]))}},
+        ]
+    }
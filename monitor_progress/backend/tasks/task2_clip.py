@@ -11,6 +11,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import articles_collection
 from services.clipper_service import ClipperService
+from services.clip_metrics import clip_stats
+from services.content_dedup import ContentDedup
+from services.domain_scheduler import DomainScheduler
+from services.retry_policy import RetryPolicy, failure_update
 
 # 配置
 CONCURRENCY_CLIPPER = 4  # 剪藏并发数
@@ -23,31 +27,45 @@ def timeout_handler(signum, frame):
     sys.exit(0)
 
 
-async def process_article(article, clipper_service, clip_sem):
+async def process_article(article, clipper_service, scheduler, retry_policy, dedup):
     url = article["url"]
     title = article.get("title", "无标题")
 
     try:
         print(f"任务 2: 正在剪藏 {title} ({url})")
 
-        async with clip_sem:
-            result = await clipper_service.process_url(url)
-
-            if "error" in result:
-                print(f"任务 2 错误 {title} ({url}): {result['error']}")
-                return
-
-            update_data = {
-                "full_content": result.get("content", ""),
-                "full_markdown": result.get("full_markdown", ""),
-                "clipper_metadata": result.get("metadata", {}),
-                "updated_at": datetime.now(),
-            }
+        # 按站点限速，只在抓取期间占用并发；暂时性错误退避后重新排队
+        result = await retry_policy.run(
+            url, lambda: clipper_service.process_url(url), scheduler
+        )
+        update = failure_update(result)
 
-            articles_collection.update_one(
-                {"_id": article["_id"]}, {"$set": update_data}, upsert=True
+        if "error" in result:
+            print(
+                f"任务 2 错误 {title} ({url}): [{result.get('error_class')}] {result['error']}"
             )
-            print(f"任务 2: 已更新 {title} ({url})")
+            articles_collection.update_one({"_id": article["_id"]}, update)
+            return
+
+        update_data = {
+            "full_content": result.get("content", ""),
+            "full_markdown": result.get("full_markdown", ""),
+            # 各阶段耗时随文章保存，供 /api/clipper/timings 按站点/模板聚合
+            "clipper_metadata": {
+                **result.get("metadata", {}),
+                "clip_stats": clip_stats(url, result),
+            },
+            "updated_at": datetime.now(),
+        }
+        if result.get("html_ref"):
+            # 原始 HTML 归档引用，供 reextract_archive.py 离线重新提取
+            update_data["html_archive"] = result["html_ref"]
+        # 正文指纹，转载到不同 URL 的同一篇文章在任务 3 中复用总结
+        update_data.update(await dedup.clip_fields(url, result.get("content", "")))
+
+        update.setdefault("$set", {}).update(update_data)
+        articles_collection.update_one({"_id": article["_id"]}, update, upsert=True)
+        print(f"任务 2: 已更新 {title} ({url})")
 
     except Exception as e:
         print(f"任务 2 处理 {title} ({url}) 时出错: {e}")
@@ -60,6 +78,7 @@ async def task_clip_content():
     )
 
     start_time = time.time()
+    clipper_service = None
 
     try:
         # Initialize Clipper Service
@@ -84,16 +103,23 @@ async def task_clip_content():
 
         print(f"任务 2: 正在剪藏 {len(articles)} 篇文章...")
 
-        # 信号量控制并发
-        clip_sem = asyncio.Semaphore(CONCURRENCY_CLIPPER)
+        # 全局并发 + 每站点限速
+        scheduler = DomainScheduler(CONCURRENCY_CLIPPER)
+        retry_policy = RetryPolicy()
+        dedup = ContentDedup(articles_collection)
 
         # 创建任务列表
         tasks = []
         for article in articles:
-            tasks.append(process_article(article, clipper_service, clip_sem))
+            tasks.append(
+                process_article(
+                    article, clipper_service, scheduler, retry_policy, dedup
+                )
+            )
 
         # 并发执行
         await asyncio.gather(*tasks)
+        print(f"任务 2: 站点调度统计 {scheduler.status()}")
 
         # 检查超时
         elapsed = time.time() - start_time
@@ -105,6 +131,10 @@ async def task_clip_content():
     except Exception as e:
         print(f"任务 2 错误: {e}")
         traceback.print_exc()
+    finally:
+        # 关闭常驻浏览器池
+        if clipper_service:
+            await clipper_service.close()
     print(f"[{datetime.now()}] 任务 2 完成")
 
 
@@ -0,0 +1,82 @@
+import sys
+import os
+from datetime import datetime
+
+# Ensure we can import from current directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import articles_collection
+from services.seen_urls import SeenUrls
+from services.url_canon import canonicalize_url
+
+# 配置
+DRY_RUN = True  # 先只打印重复情况，确认后改为 False 再执行合并
+BATCH_SIZE = 1000
+
+# 合并时保留处理进度最靠后的文章
+PROGRESS_FIELDS = ["llm_summary_processed", "full_markdown", "pre_value_score"]
+
+
+def progress_key(doc):
+    return (
+        tuple(bool(doc.get(field)) for field in PROGRESS_FIELDS),
+        -(doc["_id"].generation_time.timestamp()),
+    )
+
+
+def backfill_canonical_url():
+    """为存量文章写入 canonical_url，并把同一规范化 URL 的多条记录合并为一条"""
+    print(f"=== 开始回填 canonical_url (DRY_RUN={DRY_RUN}) ===")
+    updated = 0
+    groups = {}
+    for doc in articles_collection.find({}, {"url": 1, "canonical_url": 1}).batch_size(
+        BATCH_SIZE
+    ):
+        canonical_url = canonicalize_url(doc.get("url", ""))
+        groups.setdefault(canonical_url, []).append(doc["_id"])
+        if doc.get("canonical_url") != canonical_url:
+            updated += 1
+            if not DRY_RUN:
+                articles_collection.update_one(
+                    {"_id": doc["_id"]}, {"$set": {"canonical_url": canonical_url}}
+                )
+
+    duplicates = {url: ids for url, ids in groups.items() if len(ids) > 1}
+    print(f"需要写入 canonical_url: {updated} 篇，重复链接组: {len(duplicates)} 组")
+
+    merged = 0
+    for canonical_url, ids in duplicates.items():
+        docs = list(articles_collection.find({"_id": {"$in": ids}}))
+        docs.sort(key=progress_key, reverse=True)
+        keep, others = docs[0], docs[1:]
+        print(f"[重复] {canonical_url}: 保留 {keep['url']}，合并 {len(others)} 条")
+        if DRY_RUN:
+            continue
+        # 保留文章缺少的字段从重复记录中补齐，原始链接记入 url_aliases
+        fill = {}
+        for other in others:
+            for key, value in other.items():
+                if key != "_id" and key not in keep and key not in fill:
+                    fill[key] = value
+        articles_collection.update_one(
+            {"_id": keep["_id"]},
+            {
+                "$set": {**fill, "updated_at": datetime.now()},
+                "$addToSet": {
+                    "url_aliases": {"$each": [o["url"] for o in others if o.get("url")]}
+                },
+            },
+        )
+        articles_collection.delete_many({"_id": {"$in": [o["_id"] for o in others]}})
+        merged += len(others)
+
+    if not DRY_RUN:
+        # 文章数变化后重建 URL 过滤器
+        seen_urls = SeenUrls(articles_collection)
+        seen_urls.warm()
+        seen_urls.save()
+    print(f"=== 回填完成，合并删除 {merged} 条重复记录 ===")
+
+
+if __name__ == "__main__":
+    backfill_canonical_url()
@@ -10,6 +10,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import get_mysql_db, articles_collection
 from services.clipper_service import ClipperService
+from services.clip_metrics import clip_stats
+from services.content_dedup import ContentDedup
+from services.domain_scheduler import DomainScheduler
+from services.retry_policy import RetryPolicy, failure_update
 
 # 配置
 CONCURRENCY_CLIPPER = 10  # 剪藏并发数
@@ -17,7 +21,7 @@ BATCH_SIZE = 50  # 每次从 MySQL 获取的文章数量
 TARGET_DATE = "2026-02-24"  # 处理在此日期之前的文章
 
 
-async def process_article(article, clipper_service, clip_sem):
+async def process_article(article, clipper_service, scheduler, retry_policy, dedup):
     url = article["url"]
     title = article["title"]
     description = article["description"]
@@ -48,19 +52,33 @@ async def process_article(article, clipper_service, clip_sem):
 
         # 3. 执行剪藏
         print(f"[开始剪藏] {title} ({url})...")
-        async with clip_sem:
-            result = await clipper_service.process_url(url)
-            if "error" in result:
-                print(f"[剪藏失败] {title} ({url}): {result['error']}")
-            else:
-                update_data = {
-                    "full_content": result.get("content", ""),
-                    "full_markdown": result.get("full_markdown", ""),
-                    "clipper_metadata": result.get("metadata", {}),
-                    "updated_at": datetime.now(),
-                }
-                articles_collection.update_one({"url": url}, {"$set": update_data})
-                print(f"[剪藏成功] {title} ({url})")
+        result = await retry_policy.run(
+            url, lambda: clipper_service.process_url(url), scheduler
+        )
+        update = failure_update(result)
+
+        if "error" in result:
+            print(
+                f"[剪藏失败] {title} ({url}): [{result.get('error_class')}] {result['error']}"
+            )
+            articles_collection.update_one({"url": url}, update)
+        else:
+            update_data = {
+                "full_content": result.get("content", ""),
+                "full_markdown": result.get("full_markdown", ""),
+                "clipper_metadata": {
+                    **result.get("metadata", {}),
+                    "clip_stats": clip_stats(url, result),
+                },
+                "updated_at": datetime.now(),
+            }
+            if result.get("html_ref"):
+                update_data["html_archive"] = result["html_ref"]
+            # 正文指纹，转载到不同 URL 的同一篇文章在任务 3 中复用总结
+            update_data.update(await dedup.clip_fields(url, result.get("content", "")))
+            update.setdefault("$set", {}).update(update_data)
+            articles_collection.update_one({"url": url}, update)
+            print(f"[剪藏成功] {title} ({url})")
 
     except Exception as e:
         print(f"[错误] 处理 {title} ({url}) 时出错: {e}")
@@ -72,8 +90,10 @@ async def backfill_loop():
     # 初始化服务
     clipper_service = ClipperService()
 
-    # 信号量控制并发
-    clip_sem = asyncio.Semaphore(CONCURRENCY_CLIPPER)
+    # 全局并发 + 每站点限速，触发验证页的站点自动冷却
+    scheduler = DomainScheduler(CONCURRENCY_CLIPPER)
+    retry_policy = RetryPolicy()
+    dedup = ContentDedup(articles_collection)
 
     # 数据库连接
     db_gen = get_mysql_db()
@@ -110,7 +130,11 @@ async def backfill_loop():
                     "title": row[1] or "无标题",
                     "description": (row[2] or "")[:120],
                 }
-                tasks.append(process_article(article, clipper_service, clip_sem))
+                tasks.append(
+                    process_article(
+                        article, clipper_service, scheduler, retry_policy, dedup
+                    )
+                )
 
             # 并发执行本批次
             await asyncio.gather(*tasks)
@@ -120,6 +144,8 @@ async def backfill_loop():
             offset += processed_count
 
             print(f"本批次完成 {processed_count} 条，累计处理 {total_processed} 条。")
+            # 长时间运行时观察浏览器内存与崩溃/卡死重启次数
+            print(f"浏览器池状态: {clipper_service.browser_pool.status()}")
 
             # 简单的防封策略
             await asyncio.sleep(1)
@@ -133,6 +159,8 @@ async def backfill_loop():
         traceback.print_exc()
     finally:
         mysql_db.close()
+        # 关闭常驻浏览器池
+        await clipper_service.close()
 
 
 if __name__ == "__main__":
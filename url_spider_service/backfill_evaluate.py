@@ -7,12 +7,12 @@ from sqlalchemy import text
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import get_mysql_db, articles_collection
+from database import get_mysql_db, articles_collection, mongo_db
+from services.llm_cache import create_llm_cache
 from services.llm_service import LLMService
 
 BATCH_SIZE = 50
 TARGET_DATE = "2026-02-25"
-CONCURRENCY = 5
 
 
 async def process_batch(batch_data, llm_service, batch_num):
@@ -32,10 +32,9 @@ async def process_batch(batch_data, llm_service, batch_num):
     evaluated_articles = evaluation_result.get("articles", [])
 
     for i, item in enumerate(batch_to_process):
-        if i < len(evaluated_articles):
+        if i < len(evaluated_articles) and evaluated_articles[i] is not None:
             eval_item = evaluated_articles[i]
             update_data = {
-                "title": eval_item.get("title", item["title"]),
                 "pre_value_score": eval_item.get("pre_value_score", 0),
                 "article_type": eval_item.get("article_type", ""),
                 "pre_value_score_reason": eval_item.get("pre_value_score_reason", ""),
@@ -51,9 +50,9 @@ async def process_batch(batch_data, llm_service, batch_num):
 
 async def backfill_evaluate_parallel():
     print(f"=== 开始并行批量评估存量文章 (created_at < {TARGET_DATE}) ===")
-    print(f"配置: BATCH_SIZE={BATCH_SIZE}, CONCURRENCY={CONCURRENCY}\n")
+    print(f"配置: BATCH_SIZE={BATCH_SIZE}\n")
 
-    llm_service = LLMService()
+    llm_service = LLMService(cache=create_llm_cache(mongo_db))
 
     db_gen = get_mysql_db()
     mysql_db = next(db_gen)
@@ -66,8 +65,10 @@ async def backfill_evaluate_parallel():
         while empty_batch_count < 5:
             batch_tasks = []
             batch_infos = []
+            # 每轮批次数跟随 LLM 并发控制器的当前上限
+            concurrency = llm_service.limiter.suggested_parallelism()
 
-            for i in range(CONCURRENCY):
+            for i in range(concurrency):
                 query = text(
                     f"""
                     SELECT url, title, description, created_at
@@ -116,7 +117,7 @@ async def backfill_evaluate_parallel():
 
             if not batch_tasks:
                 empty_batch_count += 1
-                offset += CONCURRENCY * BATCH_SIZE
+                offset += concurrency * BATCH_SIZE
                 print(f"[偏移 {offset}] 连续{empty_batch_count}个批次为空，继续...")
                 if empty_batch_count >= 5:
                     print("连续5个批次为空，可能没有更多数据了")
@@ -132,7 +133,7 @@ async def backfill_evaluate_parallel():
 
             batch_total = sum(results)
             total_processed += batch_total
-            offset += CONCURRENCY * BATCH_SIZE
+            offset += concurrency * BATCH_SIZE
 
             print(f"本轮完成 {batch_total} 篇，累计 {total_processed} 条\n")
             await asyncio.sleep(1)
@@ -8,13 +8,15 @@ import time
 # Ensure we can import from parent directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import articles_collection
+from database import articles_collection, mongo_db
+from services.llm_cache import create_llm_cache
+from services.llm_limiter import is_overload
 from services.llm_service import LLMService
 
 # 配置
-CONCURRENCY = 25  # 并发数（提高并发以加快处理速度）
+BATCH_SIZE = 25  # 每轮取出的文章数，实际并发由 LLMService 的自适应控制器决定
 TARGET_DATE = "2026-02-23"  # 处理在此日期之前的文章
-MAX_LENGTH = 10000  # 内容最大长度
+MAX_LENGTH = 200000  # 内容最大长度，长文由 LLMService 分块总结
 
 import re
 
@@ -49,14 +51,15 @@ def preprocess_markdown(content):
     return content
 
 
-async def process_article(article, llm_service, sem):
+async def process_article(article, llm_service):
     """处理单篇文章"""
     url = article["url"]
     title = article.get("title", "无标题")
     score = article.get("pre_value_score", 0)
 
+    # LLMService 已按 retry-after 重试过；仍然限流时再等待，而不是固定睡 1 小时
     max_retries = 10
-    retry_delay = 3600  # 1小时，单位秒
+    retry_delay = 60
 
     for attempt in range(max_retries + 1):
         try:
@@ -64,48 +67,47 @@ async def process_article(article, llm_service, sem):
                 f"[处理] 正在总结 (评分: {score}) {title} ({url}) (尝试 {attempt + 1}/{max_retries + 1})"
             )
 
-            async with sem:
-                full_markdown = article.get("full_markdown", "")
-                if not full_markdown:
-                    full_markdown = article.get("full_content", "")
+            full_markdown = article.get("full_markdown", "")
+            if not full_markdown:
+                full_markdown = article.get("full_content", "")
 
-                if not full_markdown:
-                    print(f"[跳过] {url} (无内容)")
-                    return False
+            if not full_markdown:
+                print(f"[跳过] {url} (无内容)")
+                return False
 
-                # 预处理 markdown 内容，去除图片、链接和元数据
-                processed_content = preprocess_markdown(full_markdown)
+            # 预处理 markdown 内容，去除图片、链接和元数据
+            processed_content = preprocess_markdown(full_markdown)
 
-                # 限制内容长度，进一步节约 token
-                if len(processed_content) > MAX_LENGTH:
-                    processed_content = (
-                        processed_content[:MAX_LENGTH] + "..."
-                    )  # 截断并添加省略号
-                    print(f"[截断] 内容过长，已截断至 {MAX_LENGTH} 字符")
+            # 限制异常超长内容的长度
+            if len(processed_content) > MAX_LENGTH:
+                processed_content = (
+                    processed_content[:MAX_LENGTH] + "..."
+                )  # 截断并添加省略号
+                print(f"[截断] 内容过长，已截断至 {MAX_LENGTH} 字符")
 
-                result = await llm_service.process_content(processed_content)
+            result = await llm_service.process_content(processed_content)
 
-                update_data = result
-                update_data["llm_summary_processed"] = True
-                update_data["updated_at"] = datetime.now()
+            update_data = result
+            update_data["llm_summary_processed"] = True
+            update_data["updated_at"] = datetime.now()
 
-                articles_collection.update_one(
-                    {"_id": article["_id"]}, {"$set": update_data}, upsert=True
-                )
-                print(f"[完成] 已更新 (评分: {score}) {title} ({url})")
-                return True
+            articles_collection.update_one(
+                {"_id": article["_id"]}, {"$set": update_data}, upsert=True
+            )
+            print(f"[完成] 已更新 (评分: {score}) {title} ({url})")
+            return True
 
         except Exception as e:
-            error_message = str(e)
             print(f"[错误] 处理 {url} 时出错: {e}")
 
             # 检查是否是大模型接口的429错误
-            if "429" in error_message and "rate_limit_error" in error_message:
+            if is_overload(e):
                 if attempt < max_retries:
-                    print(
-                        f"[限流] 遇到大模型限流错误，将在 {retry_delay // 3600} 小时后重试..."
+                    delay = llm_service.limiter.pause_remaining() or min(
+                        retry_delay * 2**attempt, 3600
                     )
-                    await asyncio.sleep(retry_delay)
+                    print(f"[限流] 遇到大模型限流错误，将在 {delay:.0f} 秒后重试...")
+                    await asyncio.sleep(delay)
                     continue
                 else:
                     print(f"[限流] 已达到最大重试次数，放弃处理 {url}")
@@ -115,7 +117,7 @@ async def process_article(article, llm_service, sem):
                 return False
 
 
-async def process_articles(score, articles, llm_service, sem):
+async def process_articles(score, articles, llm_service):
     """处理多篇文章"""
     if not articles:
         return 0
@@ -124,7 +126,7 @@ async def process_articles(score, articles, llm_service, sem):
 
     tasks = []
     for article in articles:
-        tasks.append(process_article(article, llm_service, sem))
+        tasks.append(process_article(article, llm_service))
 
     results = await asyncio.gather(*tasks)
 
@@ -136,16 +138,13 @@ async def process_articles(score, articles, llm_service, sem):
 async def backfill_summarize():
     """批量回刷历史数据"""
     print(f"=== 开始批量总结存量文章 (updated_at < {TARGET_DATE}) ===")
-    print(f"配置: CONCURRENCY={CONCURRENCY}\n")
+    print(f"配置: BATCH_SIZE={BATCH_SIZE}\n")
 
     start_time = time.time()
 
     try:
         # Initialize LLM Service
-        llm_service = LLMService()
-
-        # 信号量控制并发
-        sem = asyncio.Semaphore(CONCURRENCY)
+        llm_service = LLMService(cache=create_llm_cache(mongo_db))
 
         # 按评分从高到低处理 (10 到 3)
         for score in range(10, 2, -1):
@@ -179,9 +178,7 @@ async def backfill_summarize():
                         "full_content": {"$exists": True, "$ne": ""},
                         "llm_summary_processed": {"$ne": True},
                     }
-                ).limit(
-                    CONCURRENCY
-                )  # 每次查询并发数篇文章
+                ).limit(max(BATCH_SIZE, llm_service.limiter.suggested_parallelism()))
 
                 articles = list(cursor)
 
@@ -195,14 +192,13 @@ async def backfill_summarize():
                 )
 
                 # 直接处理所有文章（每篇单独处理，并发执行）
-                processed_count = await process_articles(
-                    score, articles, llm_service, sem
-                )
+                processed_count = await process_articles(score, articles, llm_service)
                 total_processed += processed_count
 
                 print(
                     f"[评分{score}] 进度: {total_processed}/{total_pending} ({(total_processed/total_pending*100):.1f}%)"
                 )
+                print(f"[并发] LLM 并发上限 {llm_service.limiter.limit:.1f}")
 
                 # 简单的防封策略
                 await asyncio.sleep(1)
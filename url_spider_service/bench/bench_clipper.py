@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 基准测试默认不写原始 HTML 归档，避免磁盘 IO 干扰计时
+os.environ.setdefault("HTML_ARCHIVE_BACKEND", "off")
+
+import psutil
+from bs4 import BeautifulSoup
+from markdownify import markdownify as md
+
+import services.clipper_service as clipper_module
+from services.clipper_service import ClipperService, render_snapshot
+from services.markdown_stream import convert_node, normalize_markdown
+from services.template_compiler import TemplateRegistry
+from services.timing import StageTimer
+from fixture_server import FixtureServer, load_manifest
+
+RESULTS_DIR = os.path.join(SERVICE_DIR, "bench", "results")
+SETTINGS_PATH = os.path.join(SERVICE_DIR, "obsidian-web-clipper-settings.json")
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 2),
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def summarize_stages(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    stages: Dict[str, List[float]] = {}
+    for timings in samples:
+        for name, ms in timings.items():
+            stages.setdefault(name, []).append(ms)
+    return {name: summarize(values) for name, values in stages.items()}
+
+
+class RssSampler:
+    """后台线程采样本进程及所有子进程（Chromium、提取进程池）的 RSS 峰值"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        process = psutil.Process()
+        while not self._stop.is_set():
+            total = 0
+            try:
+                for proc in [process] + process.children(recursive=True):
+                    try:
+                        total += proc.memory_info().rss
+                    except psutil.Error:
+                        pass
+            except psutil.Error:
+                pass
+            self.peak_mb = max(self.peak_mb, total / 1024 / 1024)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def bench_engine(manifest, fixtures_dir: str, rounds: int) -> Dict[str, Any]:
+    """只测 TemplateEngine：直接从保存的 HTML 套用模板，不经过网络和浏览器"""
+    registry = TemplateRegistry(SETTINGS_PATH)
+    report = {}
+    for entry in manifest:
+        with open(
+            os.path.join(fixtures_dir, entry["file"]), "r", encoding="utf-8"
+        ) as f:
+            html = f.read()
+        template = registry.match(entry["url"])
+        samples = []
+        for _ in range(rounds):
+            timer = StageTimer()
+            await render_snapshot(entry["url"], html, template, timer=timer)
+            samples.append({**timer.timings, "total": timer.total_ms})
+        report[entry["name"]] = {
+            "template": template.name,
+            "stages": summarize_stages(samples),
+        }
+    return report
+
+
+def bench_converters(manifest, fixtures_dir: str, scale: int) -> Dict[str, Any]:
+    """对比微信正文的 md(str(...)) 与流式转换：把样例正文重复 scale 次模拟超长文章"""
+    report = {}
+    for entry in manifest:
+        if "mp.weixin.qq.com" not in entry["url"]:
+            continue
+        with open(
+            os.path.join(fixtures_dir, entry["file"]), "r", encoding="utf-8"
+        ) as f:
+            content = BeautifulSoup(f.read(), "html.parser").find(id="js_content")
+        html = f'<div id="js_content">{content.decode_contents() * scale}</div>'
+        node = BeautifulSoup(html, "html.parser").div
+        converters = {
+            "markdownify": lambda: md(str(node)),
+            "stream": lambda: convert_node(node),
+        }
+        result, outputs = {"html_kb": round(len(html) / 1024, 1)}, {}
+        for name, convert in converters.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            outputs[name] = convert()
+            elapsed = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            result[name] = {
+                "ms": round(elapsed, 1),
+                "peak_mb": round(peak / 1024 / 1024, 1),
+                "chars": len(outputs[name]),
+            }
+        result["identical"] = outputs["markdownify"] == outputs["stream"]
+        result["equivalent"] = normalize_markdown(
+            outputs["markdownify"]
+        ) == normalize_markdown(outputs["stream"])
+        report[entry["name"]] = result
+    return report
+
+
+async def bench_service(
+    manifest, server: FixtureServer, mode: str, concurrency: int, rounds: int
+) -> Dict[str, Any]:
+    # static 模式允许先走 HTTP 抓取，wechat 模式在此基础上启用公众号专用提取，
+    # browser 模式强制使用 Playwright
+    clipper_module.STATIC_FETCH_ENABLED = mode in ("static", "wechat")
+    clipper_module.WECHAT_FETCHER_ENABLED = mode == "wechat"
+    service = ClipperService(settings_path=SETTINGS_PATH, replay_base=server.base_url)
+    urls = [entry["url"] for entry in manifest] * rounds
+    sem = asyncio.Semaphore(concurrency)
+    samples, latencies, fetch_modes, errors = [], [], {}, []
+
+    async def clip(url):
+        async with sem:
+            start = time.perf_counter()
+            result = await service.process_url(url, use_cache=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if "error" in result:
+            errors.append(f"{url}: {result['error']}")
+            return
+        fetch_modes[result["fetch_mode"]] = fetch_modes.get(result["fetch_mode"], 0) + 1
+        samples.append(result.get("stats", {}).get("timings", {}))
+
+    try:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            await asyncio.gather(*[clip(url) for url in urls])
+            elapsed = time.perf_counter() - start
+    finally:
+        await service.close()
+
+    return {
+        "pages": len(urls),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "fetch_modes": fetch_modes,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_pages_per_s": round(len(urls) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages": summarize_stages(samples),
+        "peak_rss_mb": round(sampler.peak_mb, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], prefix: str = ""):
+    """打印两次结果中 p50 / 吞吐 / RSS 的变化"""
+    for key, value in new.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            if isinstance(old.get(key), dict):
+                compare(old[key], value, path)
+        elif key in ("p50", "throughput_pages_per_s", "peak_rss_mb", "ms", "peak_mb"):
+            before = old.get(key)
+            if isinstance(before, (int, float)) and before:
+                change = (value - before) / before * 100
+                print(f"{path}: {before} -> {value} ({change:+.1f}%)")
+
+
+async def main(args):
+    manifest = load_manifest(args.fixtures)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "fixtures": [entry["name"] for entry in manifest],
+            "rounds": args.rounds,
+            "latency_ms": args.latency_ms,
+        },
+        "engine": await bench_engine(manifest, args.fixtures, args.engine_rounds),
+        "converter": bench_converters(manifest, args.fixtures, args.converter_scale),
+        "service": {},
+    }
+
+    with FixtureServer(args.fixtures, latency_ms=args.latency_ms) as server:
+        for mode in args.modes.split(","):
+            report["service"][mode] = {}
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                print(f"=== {mode} 模式，并发 {concurrency} ===")
+                result = await bench_service(
+                    manifest, server, mode, concurrency, args.rounds
+                )
+                report["service"][mode][str(concurrency)] = result
+                print(
+                    f"吞吐 {result['throughput_pages_per_s']} 页/秒，"
+                    f"p50 {result['latency_ms'].get('p50')}ms，"
+                    f"RSS 峰值 {result['peak_rss_mb']}MB，失败 {result['errors']}"
+                )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['meta']['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="剪藏基准测试（离线回放保存的页面）")
+    parser.add_argument(
+        "--modes", default="wechat,static,browser", help="wechat,static,browser"
+    )
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--rounds", type=int, default=3, help="每个页面重复次数")
+    parser.add_argument("--engine-rounds", type=int, default=20)
+    parser.add_argument(
+        "--converter-scale", type=int, default=200, help="超长文章的正文重复次数"
+    )
+    parser.add_argument("--latency-ms", type=int, default=0, help="替身服务器模拟延迟")
+    parser.add_argument(
+        "--fixtures", default=os.path.join(SERVICE_DIR, "bench", "fixtures")
+    )
+    parser.add_argument("--output", help="默认 bench/results/<commit>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    asyncio.run(main(parser.parse_args()))
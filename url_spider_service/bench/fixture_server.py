@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_manifest(fixtures_dir: str = FIXTURES_DIR) -> List[Dict[str, Any]]:
+    with open(os.path.join(fixtures_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureServer:
+    """本地替身服务器：按原始 URL 返回保存的页面，配合 ClipperService(replay_base=...) 离线回放"""
+
+    def __init__(
+        self,
+        fixtures_dir: str = FIXTURES_DIR,
+        port: int = 0,
+        latency_ms: int = 0,
+    ):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.pages: Dict[str, bytes] = {}
+        for entry in load_manifest(fixtures_dir):
+            with open(os.path.join(fixtures_dir, entry["file"]), "rb") as f:
+                self.pages[entry["url"]] = f.read()
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 保持长连接，与真实站点一致，便于观察连接复用
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency_ms:
+                    # 模拟网络延迟
+                    time.sleep(server.latency_ms / 1000)
+                body = server.pages.get(unquote(self.path.lstrip("/")))
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc: Tuple):
+        self.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8780
+    server = FixtureServer(port=port)
+    print(f"替身服务器已启动: {server.base_url} ({len(server.pages)} 个页面)")
+    print(f"使用方式: CLIP_REPLAY_BASE={server.base_url} python main.py")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
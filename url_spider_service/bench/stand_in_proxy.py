@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+# 不走环境变量里的代理，直接转发
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+class StandInProxy:
+    """本地替身 HTTP 代理，用于测试代理池：可模拟延迟、断连和代理认证失败
+
+    mode: ok 正常转发；down 直接断开连接；auth 返回 407
+    """
+
+    def __init__(self, port: int = 0, latency_ms: int = 0, mode: str = "ok"):
+        self.latency_ms = latency_ms
+        self.mode = mode
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                proxy.requests += 1
+                if proxy.mode == "down":
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                if proxy.mode == "auth":
+                    self.send_response(407)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if proxy.latency_ms:
+                    time.sleep(proxy.latency_ms / 1000)
+                # 代理收到的是完整 URL（absolute-form）
+                try:
+                    with _opener.open(self.path, timeout=10) as upstream:
+                        status, body = upstream.status, upstream.read()
+                        content_type = upstream.headers.get("Content-Type", "")
+                except urllib.error.HTTPError as e:
+                    status, body = e.code, e.read()
+                    content_type = e.headers.get("Content-Type", "")
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInProxy":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc: Tuple):
+        self.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8781
+    mode = sys.argv[2] if len(sys.argv) > 2 else "ok"
+    latency = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    proxy = StandInProxy(port=port, latency_ms=latency, mode=mode)
+    print(f"替身代理已启动: {proxy.url} (mode={mode}, latency={latency}ms)")
+    print(f"使用方式: CLIP_PROXIES={proxy.url},... python main.py")
+    try:
+        proxy._server.serve_forever()
+    except KeyboardInterrupt:
+        proxy.stop()
@@ -2,10 +2,20 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import asyncio
+from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 
+from database import mongo_db, articles_collection
+from services.clip_cache import ClipCache
+from services.clip_metrics import GROUP_BY, StageHistograms
 from services.clipper_service import ClipperService
+from services.content_dedup import ContentDedup
+from services.html_archive import create_html_archive
+from services.http_client import SharedHttpClient
+from services.llm_cache import create_llm_cache
 from services.llm_service import LLMService
+from services.retry_policy import RetryPolicy
+from services.seen_urls import SeenUrls
 
 # Import tasks for manual triggering
 from tasks.task1_fetch import task_fetch_and_evaluate
@@ -19,15 +29,28 @@ app = FastAPI(title="URL Spider Service")
 
 # Global services
 clipper_service: Optional[ClipperService] = None
+http_client: Optional[SharedHttpClient] = None
 llm_service: Optional[LLMService] = None
+seen_urls: Optional[SeenUrls] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global clipper_service, llm_service
+    global clipper_service, llm_service, http_client, seen_urls
     try:
-        clipper_service = ClipperService()
-        llm_service = LLMService()
+        # 共享 HTTP 连接池：长连接、HTTP/2、DNS 缓存，剪藏静态抓取复用
+        http_client = SharedHttpClient()
+        # 剪藏结果缓存：进程内 LRU + Mongo clip_cache 集合
+        clipper_service = ClipperService(
+            clip_cache=ClipCache(collection=mongo_db["clip_cache"]),
+            html_archive=create_html_archive(mongo_db),
+            http_client=http_client,
+        )
+        # LLM 响应缓存：相同提示词重复调用直接返回
+        llm_service = LLMService(cache=create_llm_cache(mongo_db))
+        # 任务 1 的 URL 过滤器：加载持久化文件并补齐新增文章
+        seen_urls = SeenUrls(articles_collection)
+        await asyncio.to_thread(seen_urls.warm)
         print("服务初始化完成。")
         
         # 启动调度器 (可选)
@@ -40,6 +63,12 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    if clipper_service:
+        await clipper_service.close()
+    if http_client:
+        await http_client.aclose()
+    if seen_urls:
+        seen_urls.save()
     # stop_scheduler()
     # print("调度器已停止。")
 
@@ -66,7 +95,10 @@ async def clip_url(request: ClipRequest):
     if not clipper_service:
         raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
     
-    result = await clipper_service.process_url(request.url)
+    # 暂时性错误（超时、网络、5xx、反爬页）退避后重试
+    result = await RetryPolicy().run(
+        request.url, lambda: clipper_service.process_url(request.url)
+    )
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     
@@ -94,12 +126,49 @@ async def evaluate_articles(request: EvaluateRequest):
 def health_check():
     return {"status": "ok"}
 
+@app.get("/api/clipper/status")
+def clipper_status():
+    """剪藏服务运行状态：浏览器池、提取进程池队列深度与 CPU 耗时、HTTP 连接池复用与饱和度"""
+    if not clipper_service:
+        raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
+    return clipper_service.status()
+
+@app.get("/api/clipper/timings")
+def clipper_timings(
+    group_by: str = "host", source: str = "memory", hours: int = 24, limit: int = 5000
+):
+    """剪藏各阶段耗时直方图，source=articles 时从文章的 clip_stats 聚合（包含定时任务的剪藏）"""
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by 可选: {GROUP_BY}")
+    if source == "articles":
+        since = datetime.now() - timedelta(hours=hours)
+        docs = articles_collection.find(
+            {"clipper_metadata.clip_stats.clipped_at": {"$gte": since}},
+            {"clipper_metadata.clip_stats": 1},
+        ).limit(limit)
+        return StageHistograms.from_documents(docs).snapshot(group_by)
+    if not clipper_service:
+        raise HTTPException(status_code=503, detail="Clipper 服务未初始化")
+    return clipper_service.metrics.snapshot(group_by)
+
+@app.get("/api/llm/status")
+def llm_status():
+    """LLM 服务状态：模型、配置版本、自适应并发上限、响应缓存命中率和节省的 token"""
+    if not llm_service:
+        raise HTTPException(status_code=503, detail="LLM 服务未初始化")
+    return llm_service.status()
+
+@app.get("/api/dedup/report")
+def dedup_report(hours: int = 24 * 7):
+    """正文去重统计：重复剪藏数量、复用总结节省的 LLM 调用和 token"""
+    return ContentDedup(articles_collection).report(hours=hours)
+
 # --- Trigger Endpoints for QingLong ---
 
 @app.post("/api/trigger/task1")
 async def trigger_task1(background_tasks: BackgroundTasks):
     """手动触发任务 1：获取并评估文章"""
-    background_tasks.add_task(task_fetch_and_evaluate)
+    background_tasks.add_task(task_fetch_and_evaluate, seen_urls)
     return {"status": "triggered", "task": "fetch_and_evaluate", "message": "任务已在后台启动"}
 
 @app.post("/api/trigger/task2")
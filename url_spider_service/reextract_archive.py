@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import UpdateOne
+
+from database import articles_collection, mongo_db
+from services.clipper_service import render_snapshot
+from services.html_archive import create_html_archive, decompress
+from services.template_compiler import TemplateRegistry
+
+# 配置
+WORKERS = os.cpu_count() or 2  # 重新提取的进程数
+BATCH_SIZE = 200  # 每批读取的文章数量
+SETTINGS_PATH = "obsidian-web-clipper-settings.json"
+
+_registry = None
+
+
+def _init_worker(settings_path):
+    global _registry
+    _registry = TemplateRegistry(settings_path)
+
+
+def _reextract_job(item):
+    # 在 worker 进程中执行：解压 + 套用当前模板，纯 CPU，不访问网络和浏览器
+    article_id, url, data, codec = item
+    try:
+        html = decompress(data, codec)
+        template = _registry.match(url)
+        result = asyncio.run(render_snapshot(url, html, template))
+        return article_id, result, None
+    except Exception as e:
+        return article_id, None, str(e)
+
+
+def reextract_loop(limit=0, workers=WORKERS, dry_run=False):
+    print(f"=== 开始从原始 HTML 归档重新提取 (workers={workers}) ===")
+    archive = create_html_archive(mongo_db)
+    if archive is None:
+        print("HTML_ARCHIVE_BACKEND=off，没有可用的归档")
+        return
+
+    version = TemplateRegistry(SETTINGS_PATH).version
+    query = {"html_archive": {"$exists": True}}
+    cursor = articles_collection.find(
+        query,
+        {"url": 1, "html_archive": 1, "clipper_metadata.clip_stats": 1},
+        no_cursor_timeout=True,
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+
+    start_time = time.time()
+    total, failed = 0, 0
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(SETTINGS_PATH,)
+    ) as executor:
+        try:
+            batch = []
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= BATCH_SIZE:
+                    done, errors = _process_batch(
+                        executor, archive, batch, version, dry_run
+                    )
+                    total += done
+                    failed += errors
+                    batch = []
+                    elapsed = time.time() - start_time
+                    print(
+                        f"已处理 {total} 篇，失败 {failed} 篇，{total / elapsed:.1f} 篇/秒"
+                    )
+            if batch:
+                done, errors = _process_batch(
+                    executor, archive, batch, version, dry_run
+                )
+                total += done
+                failed += errors
+        finally:
+            cursor.close()
+
+    elapsed = time.time() - start_time
+    print(f"=== 重新提取完成：{total} 篇，失败 {failed} 篇，耗时 {elapsed:.1f} 秒 ===")
+
+
+def _process_batch(executor, archive, batch, version, dry_run):
+    items = []
+    clip_stats = {}
+    failed = 0
+    for doc in batch:
+        ref = doc["html_archive"]
+        try:
+            items.append((doc["_id"], doc["url"], archive.get_bytes(ref), ref["codec"]))
+            clip_stats[doc["_id"]] = (doc.get("clipper_metadata") or {}).get(
+                "clip_stats"
+            )
+        except Exception as e:
+            failed += 1
+            print(f"[读取归档失败] {doc['url']}: {e}")
+
+    operations = []
+    for article_id, result, error in executor.map(_reextract_job, items, chunksize=8):
+        if error:
+            failed += 1
+            print(f"[重新提取失败] {article_id}: {error}")
+            continue
+        operations.append(
+            UpdateOne(
+                {"_id": article_id},
+                {
+                    "$set": {
+                        "full_content": result["content"],
+                        "full_markdown": result["full_markdown"],
+                        # 保留原始剪藏时记录的各阶段耗时
+                        "clipper_metadata": {
+                            **result["metadata"],
+                            "clip_stats": clip_stats.get(article_id),
+                        },
+                        "reextracted_at": datetime.now(),
+                        "reextract_template_version": version,
+                    }
+                },
+            )
+        )
+
+    if operations and not dry_run:
+        articles_collection.bulk_write(operations, ordered=False)
+    return len(operations), failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从原始 HTML 归档离线重新提取正文")
+    parser.add_argument("--limit", type=int, default=0, help="最多处理的文章数")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="只提取不写回")
+    args = parser.parse_args()
+
+    try:
+        reextract_loop(args.limit, args.workers, args.dry_run)
+    except KeyboardInterrupt:
+        print("手动停止")
+    except Exception:
+        traceback.print_exc()
@@ -0,0 +1,180 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import bson  # 随 pymongo 安装
+except ImportError:
+    pass
+
+from services.url_canon import canonicalize_url
+
+# 剪藏结果缓存配置
+CLIP_CACHE_TTL = 6 * 3600  # 新鲜期（秒），过期后优先用 ETag/Last-Modified 重新验证
+CLIP_CACHE_STALE_TTL = 7 * 24 * 3600  # 过期条目保留多久以便重新验证
+CLIP_CACHE_MAX_ENTRIES = 512  # 内存 LRU 上限
+CLIP_CACHE_MAX_DOC_BYTES = 15 * 1024 * 1024  # Mongo 单文档上限 16MB，留出余量
+
+
+class ClipCache:
+    """剪藏结果两级缓存：进程内 LRU + 可选的 Mongo 集合，并合并同一 URL 的并发请求"""
+
+    def __init__(
+        self,
+        collection=None,
+        max_entries: int = CLIP_CACHE_MAX_ENTRIES,
+        ttl: int = CLIP_CACHE_TTL,
+        stale_ttl: int = CLIP_CACHE_STALE_TTL,
+    ):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "coalesced": 0,
+            "leader_cancelled": 0,
+            "stores": 0,
+            "oversized": 0,
+        }
+
+        if self.collection is not None:
+            try:
+                # purge_at 到期后由 Mongo 自动删除
+                self.collection.create_index("purge_at", expireAfterSeconds=0)
+            except Exception as e:
+                print(f"创建剪藏缓存索引失败: {e}")
+
+    def key(self, url: str, template_version: str) -> str:
+        # 与任务 1 去重共用规范化规则，带不同跟踪参数的同一篇文章共享缓存
+        return f"{template_version}:{canonicalize_url(url)}"
+
+    @staticmethod
+    def is_fresh(entry: Dict[str, Any]) -> bool:
+        return entry["expires_at"] > time.time()
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def record_hit(self):
+        self.stats["hits"] += 1
+
+    def record_miss(self):
+        self.stats["misses"] += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+
+        if self.collection is None:
+            return None
+        try:
+            doc = await asyncio.to_thread(self.collection.find_one, {"_id": key})
+        except Exception as e:
+            print(f"读取剪藏缓存失败: {e}")
+            return None
+        if not doc:
+            return None
+
+        entry = {
+            "result": doc["result"],
+            "etag": doc.get("etag"),
+            "last_modified": doc.get("last_modified"),
+            "expires_at": doc["expires_at"],
+        }
+        self._remember(key, entry)
+        return entry
+
+    async def set(self, key: str, url: str, result: Dict[str, Any]):
+        validators = result.get("validators") or {}
+        entry = {
+            "result": copy.deepcopy(result),
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "expires_at": time.time() + self.ttl,
+        }
+        self._remember(key, entry)
+        self.stats["stores"] += 1
+        await self._persist(key, url, entry)
+
+    async def touch(self, key: str, url: str, entry: Dict[str, Any]):
+        # 304 Not Modified：沿用旧结果，刷新新鲜期
+        entry["expires_at"] = time.time() + self.ttl
+        self._remember(key, entry)
+        self.stats["revalidated"] += 1
+        await self._persist(key, url, entry)
+
+    async def _persist(self, key: str, url: str, entry: Dict[str, Any]):
+        if self.collection is None:
+            return
+        doc = {
+            "url": url,
+            "result": entry["result"],
+            "etag": entry["etag"],
+            "last_modified": entry["last_modified"],
+            "expires_at": entry["expires_at"],
+            "purge_at": datetime.now() + timedelta(seconds=self.ttl + self.stale_ttl),
+        }
+        if "bson" in globals():
+            size = len(bson.encode({"_id": key, **doc}))
+            if size > CLIP_CACHE_MAX_DOC_BYTES:
+                # 超大结果只留在内存缓存，写入 Mongo 会被拒绝
+                self.stats["oversized"] += 1
+                print(f"剪藏结果过大 ({size} 字节)，跳过写入缓存集合: {url}")
+                return
+        try:
+            await asyncio.to_thread(
+                self.collection.update_one, {"_id": key}, {"$set": doc}, upsert=True
+            )
+        except Exception as e:
+            print(f"写入剪藏缓存失败: {e}")
+
+    async def coalesce(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """同一个 key 同时只执行一次 factory，其余请求等待同一个结果"""
+        while key in self._inflight:
+            future = self._inflight[key]
+            self.stats["coalesced"] += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                # 只有领头请求被取消（而不是自己被取消）时才重新发起
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                self.stats["leader_cancelled"] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 标记异常已被读取，避免没有等待者时打印警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "inflight": len(self._inflight),
+            "backend": "mongo" if self.collection is not None else "memory",
+        }
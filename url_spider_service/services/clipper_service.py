@@ -1,54 +1,177 @@
-import json
 import re
 import os
 import asyncio
+import copy
+import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+from urllib.parse import quote
 
-from playwright.async_api import async_playwright, Page, TimeoutError
+from playwright.async_api import Page
 from bs4 import BeautifulSoup
 from markdownify import markdownify as md
 from dateutil import parser as date_parser
-import trafilatura
+
+try:
+    import lxml
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+from services.browser_pool import BrowserPool
+from services.clip_cache import ClipCache
+from services.clip_metrics import StageHistograms, clip_stats
+from services.extract_pool import ExtractPool, html_to_markdown
+from services.html_archive import HtmlArchive, create_html_archive
+from services.http_client import USER_AGENT, SharedHttpClient
+from services.proxy_pool import ProxyPool, playwright_proxy
+from services.retry_policy import classify_exception, classify_status, error_result
+from services.resource_blocker import ResourceBlocker, resolve_block_rules
+from services.readiness import ReadinessTracker, resolve_max_wait_ms
+from services.timing import StageTimer
+from services.wechat_extractor import (
+    WECHAT_HOST,
+    extract_wechat_meta,
+    find_content,
+    is_gone_page,
+    rewrite_lazy_images,
+)
+from services.template_compiler import (
+    CompiledFormat,
+    CompiledTemplate,
+    Expression,
+    TemplateRegistry,
+    parse_args,
+)
+
+# 静态抓取配置：先用 HTTP GET 解析，内容不足时再回退到 Playwright
+STATIC_FETCH_ENABLED = os.getenv("STATIC_FETCH_ENABLED", "1") == "1"
+STATIC_MIN_CONTENT_LENGTH = 200  # 正文少于该字符数视为抓取失败
+# 某些站点静态 HTML 中必须存在的正文节点，缺失说明是验证页或需要渲染
+STATIC_REQUIRED_SELECTORS = {
+    "mp.weixin.qq.com": "#js_content",
+}
+
+# 反爬验证页特征：标题命中，或正文很短且包含提示语
+CHALLENGE_TITLE_MARKERS = ["安全验证", "环境异常", "验证码", "人机验证", "captcha"]
+CHALLENGE_CONTENT_MARKERS = [
+    "完成验证后即可继续访问",
+    "请完成安全验证",
+    "访问过于频繁",
+    "请输入验证码",
+    "unusual traffic",
+]
+CHALLENGE_MAX_CONTENT_LENGTH = 500
+# 验证页常以这些状态码返回，先按正文判断是否为验证页，再按状态码分类
+CHALLENGE_STATUS = {403, 429, 503}
+
+# 导航超时（重试由调用方按 RetryPolicy 退避后重新排队）
+NAVIGATION_TIMEOUT_MS = 60000
+
+# 静态抓取直接判定失败的状态码和错误分类，无需再启动浏览器
+STATIC_FAIL_FAST_STATUS = {404, 410}
+STATIC_FAIL_FAST_ERRORS = {"dns", "tls"}
+
+# 抓取方式：模板配置 "fetcher" 优先，否则按站点默认
+# auto 先静态抓取、不可用再走浏览器；wechat 为公众号专用静态提取；browser 直接渲染
+FETCHERS = {"auto", "wechat", "browser"}
+WECHAT_FETCHER_ENABLED = os.getenv("WECHAT_FETCHER_ENABLED", "1") == "1"
+DEFAULT_FETCHERS = {WECHAT_HOST: "wechat"}
+
+# 离线回放：设置后所有抓取都改为请求本地替身服务器 {base}/{quote(url)}，模板仍按原 URL 匹配
+CLIP_REPLAY_BASE = os.getenv("CLIP_REPLAY_BASE", "")
+
+# 快照提取：DOM 只序列化、解析一次，所有表达式都从快照中取值，不再逐个访问浏览器
+SNAPSHOT_EXTRACTION = os.getenv("SNAPSHOT_EXTRACTION", "1") == "1"
+
+
+def parse_html(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+def is_challenge_page(result: Dict[str, Any]) -> bool:
+    title = str(result.get("metadata", {}).get("title", "")).lower()
+    if any(marker.lower() in title for marker in CHALLENGE_TITLE_MARKERS):
+        return True
+    content = result.get("content", "")
+    if len(content.strip()) < CHALLENGE_MAX_CONTENT_LENGTH:
+        lowered = content.lower()
+        return any(marker.lower() in lowered for marker in CHALLENGE_CONTENT_MARKERS)
+    return False
+
+
+def challenge_title(html: str) -> Optional[str]:
+    """按页面标题和正文判断是否为反爬验证页，是则返回标题（可能为空），否则返回 None"""
+    soup = parse_html(html)
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    text = (soup.body or soup).get_text(" ", strip=True)
+    if is_challenge_page({"metadata": {"title": title}, "content": text}):
+        return title
+    return None
+
+
+def challenge_result(title: str, status: Optional[int] = None) -> Dict[str, Any]:
+    result = error_result(f"触发反爬验证页: {title}", "challenge", status)
+    result["challenge"] = True
+    return result
 
 
 class TemplateEngine:
-    def __init__(self, page: Page, soup: BeautifulSoup, url: str):
+    def __init__(
+        self,
+        page: Optional[Page],
+        soup: BeautifulSoup,
+        url: str,
+        html: Optional[str] = None,
+        extract_pool: Optional[ExtractPool] = None,
+    ):
+        # page 为 None 时所有取值都从静态 HTML (soup/html) 中解析
         self.page = page
         self.soup = soup
         self.url = url
+        self.html = html
+        self.extract_pool = extract_pool
+        # 由 render_template 设置，用于记录 markdown 转换的细分耗时
+        self.timer: Optional[StageTimer] = None
 
-    async def extract_value(self, expression: str) -> Any:
-        # Remove {{ and }}
-        content = expression.strip("{}")
-        parts = content.split("|")
+    def _meta_content(self, name: str) -> str:
+        tag = self.soup.find("meta", attrs={"name": name})
+        return tag.get("content", "") if tag else ""
 
-        # The first part is the source
-        source = parts[0].strip()
-        value = await self._get_source_value(source)
+    async def extract_value(self, expression: Union[str, Expression]) -> Any:
+        if isinstance(expression, str):
+            expression = Expression(expression)
 
-        # Apply filters
-        for part in parts[1:]:
-            filter_def = part.strip()
-            if ":" in filter_def:
-                filter_name, filter_args = filter_def.split(":", 1)
-                args = self._parse_args(filter_args)
-            else:
-                filter_name = filter_def
-                args = []
+        value = await self._get_source_value(expression.source)
 
+        # Apply filters
+        for filter_name, args in expression.filters:
             value = self._apply_filter(value, filter_name, args)
 
         return value
 
+    async def render(self, fmt: CompiledFormat, join_lists: bool = False) -> str:
+        result_str = fmt.raw
+        for expression in fmt.expressions:
+            val = await self.extract_value(expression)
+            if join_lists and isinstance(val, list):
+                val = ", ".join(str(v) for v in val)
+            result_str = result_str.replace(expression.raw, str(val))
+        return result_str
+
     async def _get_source_value(self, source: str):
         if source == "url":
             return self.url
         elif source == "date":
             return datetime.now()
         elif source == "title":
+            if self.page is None:
+                return self.soup.title.get_text(strip=True) if self.soup.title else ""
             return await self.page.title()
         elif source == "author":
+            if self.page is None:
+                return self._meta_content("author")
             try:
                 author = await self.page.locator('meta[name="author"]').get_attribute(
                     "content"
@@ -57,69 +180,23 @@ class TemplateEngine:
             except:
                 return ""
         elif source == "content":
-            html = await self.page.content()
-
-            # Pre-process HTML to handle lazy-loaded images (common in WeChat/lazy-load sites)
-            # Replace data-src with src to ensure extractors pick up images
-            html = html.replace('data-src="', 'src="').replace(
-                'data-original-src="', 'src="'
-            )
+            html = self.html if self.html is not None else await self.page.content()
 
-            try:
-                # 微信公众号文章强制使用 markdownify，因为 trafilatura 经常丢失图片
-                # 改进：先定位到正文区域，再转换，避免包含无关内容
-                if "mp.weixin.qq.com" in self.url:
-                    print("检测到微信公众号文章，优先使用 markdownify...")
-                    soup = BeautifulSoup(html, "html.parser")
-
-                    # 微信公众号正文通常在 id="js_content" 或 class="rich_media_content"
-                    content_div = soup.find(id="js_content") or soup.find(
-                        class_="rich_media_content"
-                    )
-
-                    if content_div:
-                        # 移除无关的js脚本和样式
-                        for s in content_div(["script", "style"]):
-                            s.decompose()
-                        from markdownify import markdownify as md
-
-                        return md(str(content_div))
-                    else:
-                        # 如果找不到特定区域，回退到 body
-                        for s in soup(["script", "style"]):
-                            s.decompose()
-                        from markdownify import markdownify as md
-
-                        return md(str(soup))
-
-                # Extract directly to Markdown using trafilatura
-                extracted = trafilatura.extract(
-                    html,
-                    include_links=True,
-                    include_images=True,
-                    include_comments=False,
-                    include_formatting=True,  # 保留格式，包括链接
-                    output_format="markdown",
+            # 微信正文只需要 js_content 子树，直接从已解析的快照中截取，避免整页再解析一次
+            if "mp.weixin.qq.com" in self.url:
+                content_div = self.soup.find(id="js_content") or self.soup.find(
+                    class_="rich_media_content"
                 )
+                if content_div:
+                    html = str(content_div)
 
-                # Fallback to markdownify if trafilatura returns empty or non-markdown (simple check)
-                if not extracted or (len(extracted) < 50 and "<html" in html):
-                    print("Trafilatura extraction weak, falling back to markdownify...")
-                    from markdownify import markdownify as md
-
-                    extracted = md(html)
-
-                return extracted if extracted else ""
-            except Exception as e:
-                print(f"提取内容失败: {e}")
-                # Fallback
-                try:
-                    from markdownify import markdownify as md
-
-                    return md(html)
-                except:
-                    return ""
+            if self.extract_pool is None:
+                return html_to_markdown(html, self.url, self.timer)
+            # trafilatura/markdownify 是 CPU 密集操作，放到进程池中执行
+            return await self.extract_pool.html_to_markdown(html, self.url, self.timer)
         elif source == "description":
+            if self.page is None:
+                return self._meta_content("description")
             try:
                 desc = await self.page.locator(
                     'meta[name="description"]'
@@ -130,6 +207,9 @@ class TemplateEngine:
         elif source.startswith("selector:"):
             selector = source.split(":", 1)[1]
             try:
+                if self.page is None:
+                    element = self.soup.select_one(selector)
+                    return element.get_text(" ", strip=True) if element else ""
                 if await self.page.locator(selector).count() > 0:
                     return await self.page.locator(selector).first.inner_text()
                 return ""
@@ -139,6 +219,9 @@ class TemplateEngine:
         elif source.startswith("selectorHtml:"):
             selector = source.split(":", 1)[1]
             try:
+                if self.page is None:
+                    element = self.soup.select_one(selector)
+                    return element.decode_contents() if element else ""
                 if await self.page.locator(selector).count() > 0:
                     return await self.page.locator(selector).first.inner_html()
                 return ""
@@ -148,31 +231,7 @@ class TemplateEngine:
         return source
 
     def _parse_args(self, args_str: str) -> List[Any]:
-        args = []
-        current = ""
-        in_quote = False
-        quote_char = None
-
-        for char in args_str:
-            if char in ['"', "'"]:
-                if not in_quote:
-                    in_quote = True
-                    quote_char = char
-                elif char == quote_char:
-                    in_quote = False
-                    quote_char = None
-                else:
-                    current += char
-            elif char == "," and not in_quote:
-                args.append(current.strip())
-                current = ""
-            else:
-                current += char
-
-        if current:
-            args.append(current.strip())
-
-        return args
+        return parse_args(args_str)
 
     def _apply_filter(self, value: Any, filter_name: str, args: List[Any]) -> Any:
         try:
@@ -244,78 +303,375 @@ class TemplateEngine:
         return value
 
 
+class WechatEngine(TemplateEngine):
+    """公众号静态页：标题、作者、发布时间从页面元信息和脚本变量中读取"""
+
+    def __init__(self, soup: BeautifulSoup, url: str, html: str, **kwargs):
+        super().__init__(None, soup, url, html=html, **kwargs)
+        self.meta = extract_wechat_meta(soup, html)
+
+    async def _get_source_value(self, source: str):
+        if source in ("title", "author", "published", "description"):
+            return self.meta[source]
+        return await super()._get_source_value(source)
+
+
+def wechat_engine(
+    soup: BeautifulSoup,
+    url: str,
+    html: str,
+    extract_pool: Optional[ExtractPool] = None,
+) -> Optional[WechatEngine]:
+    """公众号页面：改写懒加载图片后按页面结构提取；缺少正文节点时返回 None"""
+    content = find_content(soup)
+    if content is None:
+        return None
+    rewrite_lazy_images(content)
+    return WechatEngine(soup, url, html, extract_pool=extract_pool)
+
+
+def select_fetcher(url: str, template: CompiledTemplate) -> str:
+    if template.fetcher in FETCHERS:
+        return template.fetcher
+    if WECHAT_FETCHER_ENABLED:
+        for host, fetcher in DEFAULT_FETCHERS.items():
+            if host in url:
+                return fetcher
+    return "auto"
+
+
 class ClipperService:
-    def __init__(self, settings_path: str = "obsidian-web-clipper-settings.json"):
-        if os.path.exists(settings_path):
-            with open(settings_path, "r", encoding="utf-8") as f:
-                self.settings = json.load(f)
-        else:
-            self.settings = {}
-        self.templates = self._load_templates()
-
-    def _load_templates(self):
-        templates = {}
-        for t_id in self.settings.get("template_list", []):
-            if f"template_{t_id}" in self.settings:
-                templates[t_id] = self.settings[f"template_{t_id}"]
-        return templates
+    def __init__(
+        self,
+        settings_path: str = "obsidian-web-clipper-settings.json",
+        browser_pool: Optional[BrowserPool] = None,
+        extract_pool: Optional[ExtractPool] = None,
+        clip_cache: Optional[ClipCache] = None,
+        html_archive: Optional[HtmlArchive] = None,
+        replay_base: Optional[str] = None,
+        http_client: Optional[SharedHttpClient] = None,
+        proxy_pool: Optional[ProxyPool] = None,
+    ):
+        # 模板在加载时预编译，配置文件修改后自动热加载
+        self.registry = TemplateRegistry(settings_path)
+        # 浏览器池由服务持有，首次剪藏时才真正启动 Chromium
+        self.browser_pool = browser_pool or BrowserPool()
+        self.extract_pool = extract_pool or ExtractPool()
+        # 默认只有进程内缓存，服务入口可传入带 Mongo 集合的缓存
+        self.clip_cache = clip_cache or ClipCache()
+        # 原始 HTML 归档，模板或提取逻辑变更后可离线重新提取
+        self.html_archive = html_archive or create_html_archive()
+        self.replay_base = (replay_base or CLIP_REPLAY_BASE).rstrip("/") or None
+        # 各阶段耗时直方图，按站点/模板/抓取方式聚合
+        self.metrics = StageHistograms()
+        # 共享 HTTP 连接池由 lifespan 创建和关闭；未传入时自行创建并负责关闭
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or SharedHttpClient()
+        # 代理池：每次抓取分配代理，同站点粘滞，坏代理自动剔除；每个代理一个连接池
+        self.proxy_pool = proxy_pool or ProxyPool.from_env()
+        self._proxy_clients: Dict[str, SharedHttpClient] = {}
+
+    async def close(self):
+        if self._owns_http_client:
+            await self.http_client.aclose()
+        for client in self._proxy_clients.values():
+            await client.aclose()
+        self._proxy_clients = {}
+        await self.browser_pool.close()
+        self.extract_pool.shutdown()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "browser_pool": self.browser_pool.status(),
+            "extract_pool": self.extract_pool.stats(),
+            "clip_cache": self.clip_cache.status(),
+            "html_archive": (self.html_archive.status() if self.html_archive else None),
+            "http_client": self.http_client.status(),
+            "proxy_pool": self.proxy_pool.status(),
+        }
+
+    def _get_http_client(
+        self, proxy: Optional[str] = None
+    ) -> Optional[SharedHttpClient]:
+        client = self.http_client
+        if proxy:
+            client = self._proxy_clients.get(proxy)
+            if client is None:
+                client = self._proxy_clients[proxy] = SharedHttpClient(proxy=proxy)
+        return client if client.available else None
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.registry.settings
+
+    @property
+    def templates(self) -> Dict[str, Dict[str, Any]]:
+        return self.registry.templates
+
+    @property
+    def template_version(self) -> str:
+        return self.registry.version
+
+    def find_compiled_template(self, url: str) -> CompiledTemplate:
+        return self.registry.match(url)
 
     def find_template(self, url: str):
-        # 1. Try to match triggers
-        for t_id, template in self.templates.items():
-            triggers = template.get("triggers", [])
-            for trigger in triggers:
-                # Convert glob to regex
-                pattern = re.escape(trigger).replace(r"\*", ".*")
-                if re.match(f"^{pattern}", url):
-                    return template
-
-        # 2. Fallback to "通用" template
-        for t_id, template in self.templates.items():
-            if template.get("name") == "通用":
-                return template
-
-        # 3. Last resort: Return the first available template or a default structure
-        if self.templates:
-            return list(self.templates.values())[0]
-
-        # 4. Absolute fallback if no templates exist
+        return self.find_compiled_template(url).template
+
+    async def process_url(self, url: str, use_cache: bool = True) -> Dict[str, Any]:
+        if not use_cache:
+            return await self._process_url_uncached(url)
+
+        # 缓存键包含模板版本，模板修改后旧结果自动失效
+        key = self.clip_cache.key(url, self.template_version)
+        entry = await self.clip_cache.get(key)
+        if entry is not None and self.clip_cache.is_fresh(entry):
+            self.clip_cache.record_hit()
+            print(f"剪藏缓存命中: {url}")
+            return self._cached_result(entry, "hit")
+
+        return await self.clip_cache.coalesce(
+            key, lambda: self._refresh_cache(key, url, entry)
+        )
+
+    @staticmethod
+    def _cached_result(entry: Dict[str, Any], status: str) -> Dict[str, Any]:
+        result = copy.deepcopy(entry["result"])
+        result["cache"] = status
+        return result
+
+    async def _refresh_cache(
+        self, key: str, url: str, entry: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if entry is not None and await self._revalidate(url, entry):
+            await self.clip_cache.touch(key, url, entry)
+            print(f"剪藏缓存重新验证通过 (304): {url}")
+            return self._cached_result(entry, "revalidated")
+
+        self.clip_cache.record_miss()
+        result = await self._process_url_uncached(url)
+        if "error" not in result:
+            await self.clip_cache.set(key, url, result)
+        result["cache"] = "miss"
+        return result
+
+    async def _revalidate(self, url: str, entry: Dict[str, Any]) -> bool:
+        """用 ETag/Last-Modified 发起条件请求，返回 304 说明缓存仍然有效"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        client = self._get_http_client()
+        if not headers or client is None:
+            return False
+        try:
+            response = await client.get(url, headers=headers)
+        except Exception as e:
+            print(f"缓存重新验证失败: {url} ({e})")
+            return False
+        return response.status_code == 304
+
+    def _fetch_url(self, url: str) -> str:
+        if self.replay_base is None:
+            return url
+        return f"{self.replay_base}/{quote(url, safe='')}"
+
+    async def _archive(self, html: str) -> Optional[Dict[str, Any]]:
+        if self.html_archive is None:
+            return None
+        # 压缩和写盘放到线程中，不阻塞事件循环
+        return await asyncio.to_thread(self.html_archive.put, html)
+
+    @staticmethod
+    def _validators(headers) -> Dict[str, Optional[str]]:
         return {
-            "name": "Fallback",
-            "properties": [],
-            "noteContentFormat": "{{content}}",
-            "noteNameFormat": "{{title}}",
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
         }
 
-    async def process_url(self, url: str) -> Dict[str, Any]:
-        template = self.find_template(url)
-        if not template:
-            return {"error": f"未找到匹配的模板: {url}"}
-
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True, args=["--disable-blink-features=AutomationControlled"]
+    async def _process_url_uncached(self, url: str) -> Dict[str, Any]:
+        template = self.find_compiled_template(url)
+        fetcher = select_fetcher(url, template)
+
+        result = None
+        if STATIC_FETCH_ENABLED and fetcher != "browser":
+            result = await self._process_static(url, template, fetcher)
+        if result is None:
+            result = await self._process_browser(url, template)
+
+        # 验证页不能当作正文保存，交给调度器冷却该站点
+        if "error" not in result and is_challenge_page(result):
+            title = result.get("metadata", {}).get("title", "")
+            print(f"检测到反爬验证页: {url} ({title})")
+            self.proxy_pool.report_challenge(url)
+            return challenge_result(title)
+
+        if "error" not in result:
+            result["template"] = template.name
+            self.metrics.observe(clip_stats(url, result))
+            print(
+                f"剪藏耗时 {result['stats'].get('total_ms')}ms: {result['stats']['timings']}"
+            )
+        return result
+
+    async def _process_static(
+        self, url: str, template: CompiledTemplate, fetcher: str = "auto"
+    ) -> Optional[Dict[str, Any]]:
+        """HTTP 直接抓取静态 HTML 并套用模板，结果不可用时返回 None 以回退到浏览器
+
+        fetcher 为 wechat 时按公众号页面结构提取，不依赖模板中的选择器。
+        """
+        proxy = self.proxy_pool.acquire(url)
+        client = self._get_http_client(proxy)
+        if client is None:
+            self.proxy_pool.report(proxy, url, ok=False)
+            return None
+
+        timer = StageTimer()
+        try:
+            with timer.span("fetch"):
+                response = await client.get(self._fetch_url(url))
+        except Exception as e:
+            error_class = classify_exception(e)
+            self.proxy_pool.report(proxy, url, ok=False, error_class=error_class)
+            if error_class in STATIC_FAIL_FAST_ERRORS:
+                print(f"静态抓取失败 ({error_class})，不再尝试浏览器: {url} ({e})")
+                return error_result(str(e), error_class)
+            print(f"静态抓取失败，回退到浏览器: {url} ({e})")
+            return None
+
+        if proxy and response.status_code == 407:
+            self.proxy_pool.report(proxy, url, ok=False, error_class="proxy")
+            print(f"代理认证失败，回退到浏览器: {url}")
+            return None
+        self.proxy_pool.report(proxy, url, ok=True, latency_ms=timer.timings["fetch"])
+
+        if response.status_code in CHALLENGE_STATUS:
+            title = challenge_title(response.text)
+            if title is not None:
+                print(
+                    f"静态抓取返回 {response.status_code}，检测到反爬验证页: {url} ({title})"
+                )
+                self.proxy_pool.report_challenge(url)
+                return challenge_result(title, response.status_code)
+
+        if response.status_code in STATIC_FAIL_FAST_STATUS:
+            print(f"静态抓取返回 {response.status_code}，页面不存在: {url}")
+            return error_result(
+                f"HTTP {response.status_code}",
+                classify_status(response.status_code),
+                response.status_code,
             )
-            # Check for proxy settings from environment variables
-            proxy_settings = None
-            http_proxy = os.environ.get("HTTP_PROXY") or os.environ.get("http_proxy")
-            https_proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
-
-            if http_proxy:
-                print(f"Using HTTP Proxy: {http_proxy}")
-                proxy_settings = {"server": http_proxy}
-            elif https_proxy:
-                print(f"Using HTTPS Proxy: {https_proxy}")
-                proxy_settings = {"server": https_proxy}
-
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                viewport={"width": 1920, "height": 1080},
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                proxy=proxy_settings,
+
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or "html" not in content_type:
+            print(
+                f"静态抓取不可用 (状态码 {response.status_code}, {content_type})，回退到浏览器: {url}"
             )
+            return None
+
+        with timer.span("snapshot"):
+            html = response.text
+            soup = parse_html(html)
+
+        engine = None
+        if fetcher == "wechat":
+            engine = wechat_engine(soup, url, html, self.extract_pool)
+            if engine is None:
+                if is_gone_page(html):
+                    print(f"公众号文章已删除或不可见: {url}")
+                    return error_result("公众号文章已删除或不可见", "http_4xx", 410)
+                print(f"公众号静态页缺少正文节点，回退到浏览器: {url}")
+                return None
+
+        required = [
+            selector
+            for host, selector in STATIC_REQUIRED_SELECTORS.items()
+            if host in url
+        ]
+        missing = [
+            selector
+            for selector in required + template.selectors
+            if soup.select_one(selector) is None
+        ]
+        if missing:
+            print(f"静态 HTML 缺少选择器 {missing}，回退到浏览器: {url}")
+            return None
+
+        engine = engine or TemplateEngine(
+            None, soup, url, html=html, extract_pool=self.extract_pool
+        )
+        result = await render_template(engine, template, timer)
+
+        if len(result["content"].strip()) < STATIC_MIN_CONTENT_LENGTH:
+            print(f"静态 HTML 正文过短，回退到浏览器: {url}")
+            return None
+
+        fetch_mode = "wechat" if fetcher == "wechat" else "static"
+        print(f"静态抓取成功 ({fetch_mode}): {url}")
+        result["fetch_mode"] = fetch_mode
+        result["validators"] = self._validators(response.headers)
+        with timer.span("archive"):
+            result["html_ref"] = await self._archive(html)
+        result["stats"] = {"timings": timer.timings, "total_ms": timer.total_ms}
+        return result
+
+    async def _process_browser(self, url: str, template: CompiledTemplate):
+        # 每个 context 从代理池分配代理，结果回报给代理池打分
+        proxy = self.proxy_pool.acquire(url)
+        result = None
+        timer = StageTimer()
+        try:
+            result = await self._render_in_browser(url, template, proxy, timer)
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            result = error_result(str(e), classify_exception(e))
+        finally:
+            if result is None or "error" in result:
+                self.proxy_pool.report(
+                    proxy,
+                    url,
+                    ok=False,
+                    error_class=(result or {}).get("error_class", "unknown"),
+                )
+            else:
+                self.proxy_pool.report(
+                    proxy, url, ok=True, latency_ms=timer.timings.get("goto")
+                )
+        return result
+
+    async def _render_in_browser(
+        self,
+        url: str,
+        template: CompiledTemplate,
+        proxy: Optional[str],
+        timer: StageTimer,
+    ) -> Dict[str, Any]:
+        # launch 包含首次启动 Chromium、创建上下文和页面的时间
+        launch_start = time.perf_counter()
+        async with self.browser_pool.new_context(
+            user_agent=USER_AGENT,
+            viewport={"width": 1920, "height": 1080},
+            locale="zh-CN",
+            timezone_id="Asia/Shanghai",
+            proxy=playwright_proxy(proxy),
+        ) as context:
             page = await context.new_page()
+            timer.add("launch", (time.perf_counter() - launch_start) * 1000)
+
+            # 拦截图片/字体/媒体和统计脚本，只保留提取所需的 DOM
+            blocker = ResourceBlocker(
+                resolve_block_rules(template.template),
+                allow_prefix=self.replay_base,
+            )
+            await blocker.attach(page)
+
+            # 就绪检测需要在导航前注入 MutationObserver
+            tracker = ReadinessTracker(page)
+            await tracker.install()
 
             await page.add_init_script(
                 """
@@ -325,111 +681,149 @@ class ClipperService:
             """
             )
 
-            try:
-                # 增加重试机制 (3次)
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        timeout_ms = 60000 + (attempt * 30000)  # 60s, 90s, 120s
-                        print(
-                            f"正在访问: {url} (尝试 {attempt + 1}/{max_retries}, 超时: {timeout_ms}ms)..."
-                        )
-                        await page.goto(
-                            url, wait_until="domcontentloaded", timeout=timeout_ms
-                        )
-                        break  # 成功则跳出重试循环
-                    except TimeoutError:
-                        print(f"警告: 访问超时 ({timeout_ms}ms)")
-                        if attempt == max_retries - 1:
-                            raise  # 最后一次重试失败，抛出异常
-                        print("正在重试...")
-                    except Exception as e:
-                        # 忽略特定的网络错误以便重试
-                        if "net::" in str(e) or "Timeout" in str(e):
-                            print(f"警告: 网络错误: {e}")
-                            if attempt == max_retries - 1:
-                                raise
-                            print("正在重试...")
-                        else:
-                            raise e  # 其他错误直接抛出
-
-                wait_selector = None
-                for prop in template.get("properties", []):
-                    val = prop.get("value", "")
-                    if "selector:" in val:
-                        match = re.search(r"selector:([^|}]*)", val)
-                        if match:
-                            wait_selector = match.group(1).strip()
-                            break
-                    elif "selectorHtml:" in val:
-                        match = re.search(r"selectorHtml:([^|}]*)", val)
-                        if match:
-                            wait_selector = match.group(1).strip()
-                            break
-
-                if wait_selector:
-                    try:
-                        await page.wait_for_selector(wait_selector, timeout=10000)
-                    except Exception as e:
-                        print(f"警告: 等待选择器超时 {wait_selector}, 继续执行...")
-
-                await page.wait_for_timeout(3000)
-
-                content = await page.content()
-                soup = BeautifulSoup(content, "html.parser")
-
-                engine = TemplateEngine(page, soup, url)
-
-                # 1. Extract Properties
-                properties = {}
-                for prop in template.get("properties", []):
-                    name = prop["name"]
-                    value_expr = prop.get("value", "")
-                    if value_expr:
-                        matches = re.findall(r"\{\{.*?\}\}", value_expr)
-                        result_str = value_expr
-
-                        for match in matches:
-                            val = await engine.extract_value(match)
-                            if isinstance(val, list):
-                                val = ", ".join(str(v) for v in val)
-                            result_str = result_str.replace(match, str(val))
-
-                        properties[name] = result_str
-                    else:
-                        properties[name] = ""
-
-                # 2. Extract Content
-                content_fmt = template.get("noteContentFormat", "{{content}}")
-                matches = re.findall(r"\{\{.*?\}\}", content_fmt)
-                final_content = content_fmt
-
-                for match in matches:
-                    val = await engine.extract_value(match)
-                    final_content = final_content.replace(match, str(val))
-
-                # 3. Construct File Content (Frontmatter + Content)
-                file_output = "---\n"
-                for k, v in properties.items():
-                    if "\n" in str(v):
-                        file_output += (
-                            f"{k}: |\n  {str(v).replace(chr(10), chr(10)+'  ')}\n"
-                        )
-                    else:
-                        file_output += f"{k}: {v}\n"
-                file_output += "---\n\n"
-                file_output += final_content
-
-                return {
-                    "metadata": properties,
-                    "content": final_content,
-                    "full_markdown": file_output,
-                }
-
-            except Exception as e:
-                import traceback
+            result = await self._clip_page(page, url, template, tracker, timer)
+            if "error" in result:
+                return result
+            result["stats"]["timings"] = timer.timings
+            result["stats"]["total_ms"] = timer.total_ms
+            result["stats"]["resources"] = blocker.stats
+            print(
+                f"资源拦截: 放行 {blocker.stats['allowed']} 个请求，拦截 {blocker.stats['blocked']} 个 {blocker.stats['blocked_by_type']}"
+            )
+            return result
+
+    def _content_selector(self, template: CompiledTemplate, url: str) -> str:
+        # 正文节点：优先取模板正文里的选择器，其次是站点必需节点，最后是 body
+        if template.content_selector:
+            return template.content_selector
+        for host, selector in STATIC_REQUIRED_SELECTORS.items():
+            if host in url:
+                return selector
+        return "body"
+
+    async def _clip_page(
+        self,
+        page: Page,
+        url: str,
+        template: CompiledTemplate,
+        tracker: ReadinessTracker,
+        timer: StageTimer,
+    ):
+        # 只导航一次，失败后由 RetryPolicy 分类并决定是否退避重试，不在这里占着并发
+        print(f"正在访问: {url} (超时: {NAVIGATION_TIMEOUT_MS}ms)...")
+        with timer.span("goto"):
+            response = await page.goto(
+                self._fetch_url(url),
+                wait_until="domcontentloaded",
+                timeout=NAVIGATION_TIMEOUT_MS,
+            )
+        if response is not None and response.status >= 400:
+            # 403/429/503 可能是验证页，按验证页处理才会冷却站点、更换代理
+            if response.status in CHALLENGE_STATUS:
+                title = challenge_title(await page.content())
+                if title is not None:
+                    print(
+                        f"页面返回 HTTP {response.status}，检测到反爬验证页: {url} ({title})"
+                    )
+                    return challenge_result(title, response.status)
+            print(f"页面返回 HTTP {response.status}: {url}")
+            return error_result(
+                f"HTTP {response.status}",
+                classify_status(response.status),
+                response.status,
+            )
 
-                traceback.print_exc()
-                return {"error": str(e)}
-            finally:
-                await browser.close()
+        # 多信号就绪检测，替代固定的 3 秒等待
+        with timer.span("wait"):
+            readiness = await tracker.wait(
+                wait_selector=template.wait_selector,
+                content_selector=self._content_selector(template, url),
+                max_wait_ms=resolve_max_wait_ms(template.template),
+            )
+        print(
+            f"页面就绪检测: {readiness['elapsed_ms']}ms, 信号: {readiness['signals']}"
+        )
+
+        # 整页只序列化一次，后续所有表达式共用这份快照
+        with timer.span("snapshot"):
+            html = await page.content()
+            soup = parse_html(html)
+
+        engine = TemplateEngine(
+            None if SNAPSHOT_EXTRACTION else page,
+            soup,
+            url,
+            html=html,
+            extract_pool=self.extract_pool,
+        )
+        result = await render_template(engine, template, timer)
+        result["fetch_mode"] = "browser"
+        result["validators"] = self._validators(response.headers if response else {})
+        result["stats"] = {"readiness": readiness}
+        with timer.span("archive"):
+            result["html_ref"] = await self._archive(html)
+        return result
+
+
+async def render_template(
+    engine: TemplateEngine,
+    template: CompiledTemplate,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    timer = timer or StageTimer()
+    engine.timer = timer
+
+    # 1. Extract Properties
+    properties = {}
+    with timer.span("extract"):
+        for name, fmt in template.properties:
+            if fmt:
+                properties[name] = await engine.render(fmt, join_lists=True)
+            else:
+                properties[name] = ""
+
+    # 2. Extract Content
+    with timer.span("markdown"):
+        final_content = await engine.render(template.content)
+
+    # 3. Construct File Content (Frontmatter + Content)
+    with timer.span("render"):
+        # 分段收集后一次性拼接，避免大正文反复复制
+        parts = ["---\n"]
+        for k, v in properties.items():
+            if "\n" in str(v):
+                parts.append(f"{k}: |\n  {str(v).replace(chr(10), chr(10)+'  ')}\n")
+            else:
+                parts.append(f"{k}: {v}\n")
+        parts.append("---\n\n")
+        parts.append(final_content)
+        file_output = "".join(parts)
+
+    return {
+        "metadata": properties,
+        "content": final_content,
+        "full_markdown": file_output,
+    }
+
+
+async def render_snapshot(
+    url: str,
+    html: str,
+    template: CompiledTemplate,
+    extract_pool: Optional[ExtractPool] = None,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    """离线从已保存的 HTML 重新套用模板，不访问网络和浏览器
+
+    与在线抓取选择同样的提取方式：公众号页面走 WechatEngine 并改写懒加载图片。
+    """
+    timer = timer or StageTimer()
+    with timer.span("snapshot"):
+        soup = parse_html(html)
+    engine = None
+    if select_fetcher(url, template) == "wechat":
+        engine = wechat_engine(soup, url, html, extract_pool)
+    engine = engine or TemplateEngine(
+        None, soup, url, html=html, extract_pool=extract_pool
+    )
+    return await render_template(engine, template, timer)
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+# 默认每个站点的限速：每秒令牌数、桶容量、同时进行中的请求数
+DEFAULT_HOST_LIMITS = {"rate": 1.0, "burst": 3, "max_inflight": 2}
+
+# 按域名后缀覆盖，容易触发反爬的站点放慢
+HOST_LIMITS = {
+    "mp.weixin.qq.com": {"rate": 0.5, "burst": 2, "max_inflight": 2},
+    "zhihu.com": {"rate": 0.2, "burst": 1, "max_inflight": 1},
+}
+
+CHALLENGE_COOLDOWN = 300  # 遇到验证页后暂停该站点的秒数，连续触发时翻倍
+MAX_CHALLENGE_COOLDOWN = 3600
+
+
+class _HostState:
+    def __init__(self, limits: Dict[str, Any]):
+        self.rate = float(limits["rate"])
+        self.burst = float(limits["burst"])
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.semaphore = asyncio.Semaphore(int(limits["max_inflight"]))
+        self.inflight = 0
+        self.waiting = 0
+        self.cooldown_until = 0.0
+        self.consecutive_challenges = 0
+        self.completed = 0
+        self.challenges = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def reserve(self) -> float:
+        """取一个令牌，返回还需等待的秒数（令牌可以透支，保证先到先得）"""
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class DomainScheduler:
+    """按站点限速的剪藏调度器：每站点令牌桶 + 最大并发，验证页触发后自动冷却，其他站点不受影响"""
+
+    def __init__(
+        self,
+        global_concurrency: int,
+        host_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.global_semaphore = asyncio.Semaphore(global_concurrency)
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self._hosts: Dict[str, _HostState] = {}
+
+    def host_key(self, url: str) -> str:
+        host = (urlparse(url).hostname or "").lower()
+        for suffix in self.host_limits:
+            if host == suffix or host.endswith("." + suffix):
+                return suffix
+        return host
+
+    def _state(self, key: str) -> _HostState:
+        state = self._hosts.get(key)
+        if state is None:
+            limits = {**DEFAULT_HOST_LIMITS, **self.host_limits.get(key, {})}
+            state = _HostState(limits)
+            self._hosts[key] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        key = self.host_key(url)
+        state = self._state(key)
+
+        state.waiting += 1
+        try:
+            # 1. 站点并发上限
+            await state.semaphore.acquire()
+        finally:
+            state.waiting -= 1
+
+        try:
+            # 2. 站点冷却期内等待，再按令牌桶限速（都不占用全局并发）
+            while True:
+                remaining = state.cooldown_until - time.monotonic()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+
+            delay = state.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # 3. 最后才占用全局并发，被限速的站点不会拖慢其他站点
+            async with self.global_semaphore:
+                state.inflight += 1
+                try:
+                    yield
+                finally:
+                    state.inflight -= 1
+                    state.completed += 1
+        finally:
+            state.semaphore.release()
+
+    def report(self, url: str, challenged: bool = False):
+        state = self._state(self.host_key(url))
+        if not challenged:
+            state.consecutive_challenges = 0
+            return
+
+        state.challenges += 1
+        state.consecutive_challenges += 1
+        cooldown = min(
+            CHALLENGE_COOLDOWN * (2 ** (state.consecutive_challenges - 1)),
+            MAX_CHALLENGE_COOLDOWN,
+        )
+        state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+        print(f"站点 {self.host_key(url)} 返回验证页，暂停 {cooldown} 秒")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            key: {
+                "inflight": state.inflight,
+                "waiting": state.waiting,
+                "completed": state.completed,
+                "challenges": state.challenges,
+                "cooldown_remaining": max(0, int(state.cooldown_until - now)),
+            }
+            for key, state in self._hosts.items()
+        }
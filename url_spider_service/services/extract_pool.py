@@ -0,0 +1,186 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify as md
+import trafilatura
+
+from services.markdown_stream import convert_node
+from services.timing import StageTimer
+
+# 提取进程池配置，默认按 CPU 核数启动 worker
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 2))
+EXTRACT_MAX_PENDING = EXTRACT_WORKERS * 2  # 同时提交到进程池的任务上限
+# 微信正文使用流式转换器，直接遍历已解析的 DOM；设为 0 时回退到 md(str(...))
+MARKDOWN_STREAMING = os.getenv("MARKDOWN_STREAMING", "1") != "0"
+
+
+def _node_to_markdown(node, timer: StageTimer) -> str:
+    if MARKDOWN_STREAMING:
+        with timer.span("markdown.stream"):
+            return convert_node(node)
+    with timer.span("markdown.markdownify"):
+        return md(str(node))
+
+
+def html_to_markdown(html: str, url: str, timer: Optional[StageTimer] = None) -> str:
+    timer = timer or StageTimer()
+    # Pre-process HTML to handle lazy-loaded images (common in WeChat/lazy-load sites)
+    # Replace data-src with src to ensure extractors pick up images
+    html = html.replace('data-src="', 'src="').replace('data-original-src="', 'src="')
+
+    try:
+        # 微信公众号文章强制使用 markdownify，因为 trafilatura 经常丢失图片
+        # 改进：先定位到正文区域，再转换，避免包含无关内容
+        if "mp.weixin.qq.com" in url:
+            print("检测到微信公众号文章，优先使用 markdownify...")
+            with timer.span("markdown.parse"):
+                soup = BeautifulSoup(html, "html.parser")
+
+            # 微信公众号正文通常在 id="js_content" 或 class="rich_media_content"
+            content_div = soup.find(id="js_content") or soup.find(
+                class_="rich_media_content"
+            )
+
+            if content_div:
+                # 移除无关的js脚本和样式
+                for s in content_div(["script", "style"]):
+                    s.decompose()
+                return _node_to_markdown(content_div, timer)
+            else:
+                # 如果找不到特定区域，回退到 body
+                for s in soup(["script", "style"]):
+                    s.decompose()
+                return _node_to_markdown(soup, timer)
+
+        # Extract directly to Markdown using trafilatura
+        with timer.span("markdown.trafilatura"):
+            extracted = trafilatura.extract(
+                html,
+                include_links=True,
+                include_images=True,
+                include_comments=False,
+                include_formatting=True,  # 保留格式，包括链接
+                output_format="markdown",
+            )
+
+        # Fallback to markdownify if trafilatura returns empty or non-markdown (simple check)
+        if not extracted or (len(extracted) < 50 and "<html" in html):
+            print("Trafilatura extraction weak, falling back to markdownify...")
+            with timer.span("markdown.markdownify"):
+                extracted = md(html)
+
+        return extracted if extracted else ""
+    except Exception as e:
+        print(f"提取内容失败: {e}")
+        # Fallback
+        try:
+            return md(html)
+        except:
+            return ""
+
+
+def _convert_job(html: str, url: str) -> Tuple[str, float, Dict[str, float]]:
+    # 在 worker 进程中执行，同时返回本次转换消耗的 CPU 时间和各步骤耗时
+    cpu_start = time.process_time()
+    timer = StageTimer()
+    markdown = html_to_markdown(html, url, timer)
+    return markdown, time.process_time() - cpu_start, timer.timings
+
+
+class ExtractPool:
+    """HTML→Markdown 转换进程池，避免 CPU 密集的解析阻塞事件循环"""
+
+    def __init__(
+        self,
+        max_workers: int = EXTRACT_WORKERS,
+        max_pending: int = EXTRACT_MAX_PENDING,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._waiting = 0
+        self._in_flight = 0
+        self.jobs = 0
+        self.cpu_seconds_total = 0.0
+        self.cpu_seconds_max = 0.0
+        self.last_cpu_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn 避免 fork 继承事件循环和 Playwright 的线程状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def html_to_markdown(
+        self, html: str, url: str, timer: Optional[StageTimer] = None
+    ) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+
+        timer = timer or StageTimer()
+        self._waiting += 1
+        try:
+            with timer.span("markdown.queue"):
+                await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                markdown, cpu_seconds, timings = await loop.run_in_executor(
+                    self._get_executor(), _convert_job, html, url
+                )
+            except BrokenProcessPool:
+                print("提取进程池异常，重建后在线程中完成本次转换")
+                self._executor = None
+                markdown, cpu_seconds, timings = await asyncio.to_thread(
+                    _convert_job, html, url
+                )
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        for name, ms in timings.items():
+            timer.add(name, ms)
+        self.jobs += 1
+        self.cpu_seconds_total += cpu_seconds
+        self.cpu_seconds_max = max(self.cpu_seconds_max, cpu_seconds)
+        self.last_cpu_seconds = cpu_seconds
+        return markdown
+
+    @property
+    def queue_depth(self) -> int:
+        # 等待信号量的任务 + 已提交但还没有空闲 worker 的任务
+        return self._waiting + max(0, self._in_flight - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "jobs": self.jobs,
+            "cpu_seconds_total": round(self.cpu_seconds_total, 3),
+            "cpu_seconds_avg": (
+                round(self.cpu_seconds_total / self.jobs, 4) if self.jobs else 0.0
+            ),
+            "cpu_seconds_max": round(self.cpu_seconds_max, 4),
+            "last_cpu_seconds": round(self.last_cpu_seconds, 4),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,238 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+# LLM 并发自适应（AIMD）：延迟正常时每轮加 1，遇到 429/过载时减半
+LLM_INITIAL_CONCURRENCY = float(os.getenv("LLM_INITIAL_CONCURRENCY", "5"))
+LLM_MIN_CONCURRENCY = float(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = float(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_DECREASE_FACTOR = 0.5
+# 单位 token 延迟超过基线（最低值）的倍数视为拥塞，不再增加并发
+LLM_LATENCY_TOLERANCE = float(os.getenv("LLM_LATENCY_TOLERANCE", "3"))
+# 延迟按 (token 数 + 固定开销) 归一化，长提示词本身耗时更久不算拥塞
+LLM_LATENCY_TOKEN_OFFSET = 500
+LLM_LATENCY_ALPHA = 0.2  # 延迟指数移动平均系数
+LLM_BASELINE_DRIFT = 0.01  # 基线（最低延迟）缓慢上移，适应提示词变长等长期变化
+LLM_MAX_RETRY_AFTER = 3600  # retry-after 超过该秒数按该值处理
+
+# 过载类状态码：429 限流、503 服务不可用、529 Anthropic 过载
+OVERLOAD_STATUS = {429, 503, 529}
+OVERLOAD_MARKERS = ["rate_limit", "RateLimit", "overloaded", "Too Many Requests"]
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """从 SDK 异常的响应头读取 retry-after / retry-after-ms，没有时返回 None"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return min(float(value) / 1000, LLM_MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        # HTTP 日期格式
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), LLM_MAX_RETRY_AFTER)
+
+
+def is_overload(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status in OVERLOAD_STATUS:
+        return True
+    message = f"{type(exc).__name__}: {exc}"
+    return "429" in message or any(marker in message for marker in OVERLOAD_MARKERS)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """连接失败、超时和 5xx：退避后重试，但不算作过载"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class _Slot:
+    def __init__(self, limiter: "AdaptiveLimiter"):
+        self.limiter = limiter
+        self.started = time.monotonic()
+
+    def success(self, tokens: int = 0):
+        """tokens 为本次请求的输入加输出 token 数，用于归一化延迟"""
+        latency = time.monotonic() - self.started
+        self.limiter._on_success(
+            self.started, latency / (tokens + LLM_LATENCY_TOKEN_OFFSET) * 1000
+        )
+
+    def overload(self, retry_after: Optional[float] = None):
+        self.limiter._on_overload(self.started, retry_after)
+
+    def error(self):
+        self.limiter.stats["errors"] += 1
+
+
+class AdaptiveLimiter:
+    """按 AIMD 调整的 LLM 并发上限，同一进程里访问同一服务商的调用共享
+
+    - 成功且每千 token 延迟不超过基线的 LLM_LATENCY_TOLERANCE 倍时，每完成约 limit 个请求上限加 1
+      （只在上限确实成为瓶颈时增加，避免空闲时虚高）
+    - 429/过载时上限乘以 LLM_DECREASE_FACTOR；同一批已发出的请求只触发一次减半
+    - 带 retry-after 时在此期间暂停发出新请求
+    """
+
+    def __init__(
+        self,
+        initial: float = LLM_INITIAL_CONCURRENCY,
+        min_limit: float = LLM_MIN_CONCURRENCY,
+        max_limit: float = LLM_MAX_CONCURRENCY,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.inflight = 0
+        self.waiting = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.peak_limit = self.limit
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "overloads": 0,
+            "errors": 0,
+            "increases": 0,
+            "decreases": 0,
+            "pauses": 0,
+        }
+
+    def _get_condition(self) -> asyncio.Condition:
+        # 条件变量绑定事件循环，脚本多次 asyncio.run 时重新创建；
+        # 旧循环里的请求已随循环结束，计数一并清零
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.inflight = 0
+            self.waiting = 0
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self):
+        condition = self._get_condition()
+        async with condition:
+            self.waiting += 1
+            try:
+                while True:
+                    remaining = self.paused_until - time.monotonic()
+                    if remaining > 0:
+                        try:
+                            await asyncio.wait_for(condition.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    if self.inflight < math.floor(self.limit):
+                        break
+                    await condition.wait()
+            finally:
+                self.waiting -= 1
+            self.inflight += 1
+            self.stats["requests"] += 1
+
+        slot = _Slot(self)
+        try:
+            yield slot
+        finally:
+            async with condition:
+                # 期间换了事件循环时计数已清零，不再扣减
+                if condition is self._condition:
+                    self.inflight -= 1
+                condition.notify_all()
+
+    def _on_success(self, started: float, latency: float):
+        self.stats["successes"] += 1
+        self.latency = (
+            latency
+            if self.latency is None
+            else LLM_LATENCY_ALPHA * latency + (1 - LLM_LATENCY_ALPHA) * self.latency
+        )
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * LLM_BASELINE_DRIFT
+
+        congested = self.latency > self.baseline * LLM_LATENCY_TOLERANCE
+        # 上限是瓶颈（有请求在排队或已用满）时才加性增加
+        saturated = self.waiting > 0 or self.inflight >= math.floor(self.limit)
+        if not congested and saturated and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self.stats["increases"] += 1
+
+    def _on_overload(self, started: float, retry_after: Optional[float]):
+        self.stats["overloads"] += 1
+        now = time.monotonic()
+        # 在上次减半之前发出的请求，其过载已经反映在那次减半里
+        if started >= self.last_decrease:
+            self.limit = max(self.min_limit, self.limit * LLM_DECREASE_FACTOR)
+            self.last_decrease = now
+            self.stats["decreases"] += 1
+            print(f"LLM 限流/过载，并发上限降至 {self.limit:.1f}")
+        if retry_after:
+            if now + retry_after > self.paused_until:
+                self.stats["pauses"] += 1
+                print(f"LLM 服务要求 {retry_after:.1f} 秒后重试，暂停发出新请求")
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def pause_remaining(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def suggested_parallelism(self) -> int:
+        """调用方一次提交的请求数：比当前上限多 1 个，让上限有机会继续增长"""
+        return math.floor(self.limit) + 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "peak_limit": round(self.peak_limit, 2),
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            # 每千 token 的延迟（秒）
+            "latency_s_per_1k": (
+                round(self.latency, 3) if self.latency is not None else None
+            ),
+            "baseline_s_per_1k": (
+                round(self.baseline, 3) if self.baseline is not None else None
+            ),
+            "paused_s": round(self.pause_remaining(), 1),
+            **self.stats,
+        }
+
+
+_shared: Dict[Any, AdaptiveLimiter] = {}
+
+
+def shared_limiter(*key: Any) -> AdaptiveLimiter:
+    """同一进程内按 (服务商地址, 模型) 共享一个限流器，任务、接口和回填脚本互相可见"""
+    limiter = _shared.get(key)
+    if limiter is None:
+        limiter = _shared[key] = AdaptiveLimiter()
+    return limiter
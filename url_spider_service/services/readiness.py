@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+# 就绪检测配置
+# 等待选择器单独计时，与原先一致为 10s；之后的稳定检测上限与原先固定等待 3000ms 一致，
+# 慢站点用模板 "readinessTimeout" 或环境变量放宽
+SELECTOR_WAIT_MS = int(os.getenv("READINESS_SELECTOR_WAIT_MS", 10000))
+READINESS_MAX_WAIT_MS = int(os.getenv("READINESS_MAX_WAIT_MS", 3000))
+DOM_QUIET_MS = 500  # DOM 无变更持续多久视为稳定
+NETWORK_IDLE_MS = 500  # 无进行中请求持续多久视为网络空闲
+POLL_INTERVAL_MS = 100
+TEXT_PLATEAU_SAMPLES = 3  # 正文长度连续多少次采样不变视为稳定
+
+# 在页面脚本执行前注入，记录最后一次 DOM 变更时间
+MUTATION_SCRIPT = """
+(() => {
+    window.__clipLastMutation = performance.now();
+    new MutationObserver(() => {
+        window.__clipLastMutation = performance.now();
+    }).observe(document, {childList: true, subtree: true, characterData: true});
+})();
+"""
+
+SAMPLE_SCRIPT = """
+(selector) => {
+    const node = document.querySelector(selector) || document.body;
+    return {
+        sinceMutation: performance.now() - (window.__clipLastMutation || 0),
+        textLength: node ? node.textContent.length : 0,
+    };
+}
+"""
+
+
+def resolve_max_wait_ms(template: Optional[Dict[str, Any]]) -> int:
+    if template and template.get("readinessTimeout"):
+        return int(template["readinessTimeout"])
+    return READINESS_MAX_WAIT_MS
+
+
+class ReadinessTracker:
+    """组合等待选择器、DOM 静默、网络空闲和正文长度稳定多个信号，尽早判定页面就绪"""
+
+    def __init__(self, page):
+        self.page = page
+        self.inflight = 0
+        self.last_network_activity = time.monotonic()
+        page.on("request", self._on_request_start)
+        page.on("requestfinished", self._on_request_end)
+        page.on("requestfailed", self._on_request_end)
+
+    async def install(self):
+        # 必须在 goto 之前调用
+        await self.page.add_init_script(MUTATION_SCRIPT)
+
+    def _on_request_start(self, request):
+        self.inflight += 1
+        self.last_network_activity = time.monotonic()
+
+    def _on_request_end(self, request):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_network_activity = time.monotonic()
+
+    def _network_idle(self) -> bool:
+        idle_ms = (time.monotonic() - self.last_network_activity) * 1000
+        return self.inflight == 0 and idle_ms >= NETWORK_IDLE_MS
+
+    async def wait(
+        self,
+        wait_selector: Optional[str] = None,
+        content_selector: str = "body",
+        max_wait_ms: int = READINESS_MAX_WAIT_MS,
+        selector_wait_ms: int = SELECTOR_WAIT_MS,
+    ) -> Dict[str, Any]:
+        start = time.monotonic()
+        signals = {"selector": wait_selector is None}
+
+        if wait_selector:
+            try:
+                await self.page.wait_for_selector(
+                    wait_selector, timeout=selector_wait_ms
+                )
+                signals["selector"] = True
+            except Exception:
+                print(f"警告: 等待选择器超时 {wait_selector}, 继续执行...")
+
+        # 稳定检测从选择器出现后开始计时，max_wait_ms 只限制这一阶段
+        deadline = time.monotonic() + max_wait_ms / 1000
+        last_length = -1
+        stable_samples = 0
+        ready = False
+        while time.monotonic() < deadline:
+            try:
+                sample = await self.page.evaluate(SAMPLE_SCRIPT, content_selector)
+            except Exception:
+                # 页面跳转中，上下文被销毁，稍后重试
+                await asyncio.sleep(POLL_INTERVAL_MS / 1000)
+                continue
+
+            length = sample["textLength"]
+            stable_samples = stable_samples + 1 if length == last_length else 0
+            last_length = length
+
+            signals["dom_quiet"] = sample["sinceMutation"] >= DOM_QUIET_MS
+            signals["network_idle"] = self._network_idle()
+            signals["text_plateau"] = length > 0 and (
+                stable_samples >= TEXT_PLATEAU_SAMPLES
+            )
+
+            if (
+                signals["dom_quiet"]
+                and signals["network_idle"]
+                and signals["text_plateau"]
+            ):
+                ready = True
+                break
+            await asyncio.sleep(POLL_INTERVAL_MS / 1000)
+
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        if not ready:
+            print(f"警告: 页面在 {max_wait_ms}ms 内未完全就绪 {signals}, 继续执行...")
+        return {"ready": ready, "elapsed_ms": elapsed_ms, "signals": signals}
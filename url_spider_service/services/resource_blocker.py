@@ -0,0 +1,89 @@
+import fnmatch
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+# 默认拦截规则：正文提取只需要 DOM，图片地址从 data-src 读取，无需真正下载
+DEFAULT_BLOCK_RULES = {
+    "block_resource_types": ["image", "media", "font"],
+    "allow_resource_types": [],
+    "block_domains": [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "hm.baidu.com",
+        "cnzz.com",
+        "umeng.com",
+        "zhihu-web-analytics.zhihu.com",
+        "datarangers.com.cn",
+        "mta.qq.com",
+    ],
+    "allow_domains": [],
+}
+
+# 按模板名覆盖默认规则，模板 JSON 中的 "resourceBlocking" 字段优先级更高
+TEMPLATE_BLOCK_RULES: Dict[str, Dict[str, List[str]]] = {}
+
+
+def _host_matches(host: str, patterns: List[str]) -> bool:
+    for pattern in patterns:
+        if "*" in pattern:
+            if fnmatch.fnmatch(host, pattern):
+                return True
+        elif host == pattern or host.endswith("." + pattern):
+            return True
+    return False
+
+
+def resolve_block_rules(template: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    rules = {key: list(value) for key, value in DEFAULT_BLOCK_RULES.items()}
+    if not template:
+        return rules
+    overrides = [
+        TEMPLATE_BLOCK_RULES.get(template.get("name", ""), {}),
+        template.get("resourceBlocking") or {},
+    ]
+    for override in overrides:
+        for key, value in override.items():
+            if key in rules:
+                rules[key] = list(value)
+    return rules
+
+
+class ResourceBlocker:
+    """基于 page.route 的请求拦截，按资源类型和域名的允许/拒绝列表过滤"""
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, List[str]]] = None,
+        allow_prefix: Optional[str] = None,
+    ):
+        self.rules = rules or resolve_block_rules(None)
+        # 离线回放时只放行指向替身服务器的请求
+        self.allow_prefix = allow_prefix
+        self.stats = {"allowed": 0, "blocked": 0, "blocked_by_type": {}}
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if self.allow_prefix and not url.startswith(self.allow_prefix):
+            return True
+        host = (urlparse(url).hostname or "").lower()
+        if host and _host_matches(host, self.rules.get("allow_domains", [])):
+            return False
+        if host and _host_matches(host, self.rules.get("block_domains", [])):
+            return True
+        if resource_type in self.rules.get("allow_resource_types", []):
+            return False
+        return resource_type in self.rules.get("block_resource_types", [])
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.stats["blocked"] += 1
+            by_type = self.stats["blocked_by_type"]
+            by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+            await route.abort()
+        else:
+            self.stats["allowed"] += 1
+            await route.continue_()
+
+    async def attach(self, page):
+        await page.route("**/*", self._handle_route)
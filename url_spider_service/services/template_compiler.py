@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+EXPRESSION_PATTERN = re.compile(r"\{\{.*?\}\}")
+SELECTOR_PATTERN = re.compile(r"selector(?:Html)?:([^|}]*)")
+
+FALLBACK_TEMPLATE = {
+    "name": "Fallback",
+    "properties": [],
+    "noteContentFormat": "{{content}}",
+    "noteNameFormat": "{{title}}",
+}
+
+
+def parse_args(args_str: str) -> List[Any]:
+    args = []
+    current = ""
+    in_quote = False
+    quote_char = None
+
+    for char in args_str:
+        if char in ['"', "'"]:
+            if not in_quote:
+                in_quote = True
+                quote_char = char
+            elif char == quote_char:
+                in_quote = False
+                quote_char = None
+            else:
+                current += char
+        elif char == "," and not in_quote:
+            args.append(current.strip())
+            current = ""
+        else:
+            current += char
+
+    if current:
+        args.append(current.strip())
+
+    return args
+
+
+class Expression:
+    """编译后的 {{source|filter:args|...}} 表达式"""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        # Remove {{ and }}
+        parts = raw.strip("{}").split("|")
+
+        # The first part is the source
+        self.source = parts[0].strip()
+        self.filters: List[Tuple[str, List[Any]]] = []
+        for part in parts[1:]:
+            filter_def = part.strip()
+            if ":" in filter_def:
+                filter_name, filter_args = filter_def.split(":", 1)
+                self.filters.append((filter_name, parse_args(filter_args)))
+            else:
+                self.filters.append((filter_def, []))
+
+
+class CompiledFormat:
+    """模板字符串及其中出现的表达式（按出现顺序去重）"""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.expressions: List[Expression] = []
+        seen = set()
+        for match in EXPRESSION_PATTERN.findall(raw):
+            if match not in seen:
+                seen.add(match)
+                self.expressions.append(Expression(match))
+
+
+class CompiledTemplate:
+    def __init__(self, template: Dict[str, Any]):
+        self.template = template
+        self.name = template.get("name", "")
+        self.properties: List[Tuple[str, Optional[CompiledFormat]]] = []
+        for prop in template.get("properties", []):
+            value_expr = prop.get("value", "")
+            self.properties.append(
+                (prop["name"], CompiledFormat(value_expr) if value_expr else None)
+            )
+        self.content = CompiledFormat(template.get("noteContentFormat", "{{content}}"))
+        # 抓取方式（auto/wechat/browser），未配置时由剪藏服务按站点选择
+        self.fetcher: Optional[str] = template.get("fetcher")
+
+        # 模板中所有 selector:/selectorHtml: 目标，用于静态抓取校验
+        expressions = [prop.get("value", "") for prop in template.get("properties", [])]
+        expressions.append(template.get("noteContentFormat", ""))
+        self.selectors: List[str] = []
+        for expr in expressions:
+            for match in SELECTOR_PATTERN.finditer(expr):
+                selector = match.group(1).strip()
+                if selector and selector not in self.selectors:
+                    self.selectors.append(selector)
+
+        # 第一个属性选择器作为等待目标
+        self.wait_selector = None
+        for prop in template.get("properties", []):
+            val = prop.get("value", "")
+            if "selector:" in val:
+                match = re.search(r"selector:([^|}]*)", val)
+            elif "selectorHtml:" in val:
+                match = re.search(r"selectorHtml:([^|}]*)", val)
+            else:
+                continue
+            if match:
+                self.wait_selector = match.group(1).strip()
+                break
+
+        # 正文节点选择器
+        match = SELECTOR_PATTERN.search(template.get("noteContentFormat", ""))
+        self.content_selector = (
+            match.group(1).strip() if match and match.group(1).strip() else None
+        )
+
+
+class TriggerMatcher:
+    """把所有模板的 trigger 合并成一个正则，按模板顺序取第一个命中"""
+
+    def __init__(self, templates: List[CompiledTemplate]):
+        self._by_group: Dict[str, CompiledTemplate] = {}
+        alternatives = []
+        for compiled in templates:
+            for trigger in compiled.template.get("triggers", []):
+                group = f"t{len(alternatives)}"
+                # Convert glob to regex
+                pattern = re.escape(trigger).replace(r"\*", ".*")
+                alternatives.append(f"(?P<{group}>{pattern})")
+                self._by_group[group] = compiled
+        self._regex = (
+            re.compile("^(?:" + "|".join(alternatives) + ")") if alternatives else None
+        )
+
+    def match(self, url: str) -> Optional[CompiledTemplate]:
+        if self._regex is None:
+            return None
+        m = self._regex.match(url)
+        if not m:
+            return None
+        return self._by_group[m.lastgroup]
+
+
+class TemplateRegistry:
+    """加载并预编译 obsidian-web-clipper-settings.json 中的模板，文件修改后自动重新加载"""
+
+    def __init__(self, settings_path: str):
+        self.settings_path = settings_path
+        self.settings: Dict[str, Any] = {}
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        self.version = "empty"
+        self._mtime: Optional[float] = None
+        self._failed_mtime: Optional[float] = None
+        self._compiled: List[CompiledTemplate] = []
+        self._matcher = TriggerMatcher([])
+        self._default: CompiledTemplate = CompiledTemplate(FALLBACK_TEMPLATE)
+        self.reload()
+
+    def reload(self):
+        # 先在局部变量里解析和编译，全部成功后再一起替换，失败时旧版本保持完整
+        if os.path.exists(self.settings_path):
+            mtime = os.path.getmtime(self.settings_path)
+            with open(self.settings_path, "rb") as f:
+                raw = f.read()
+            settings = json.loads(raw.decode("utf-8"))
+            version = hashlib.sha1(raw).hexdigest()[:12]
+        else:
+            mtime = None
+            settings = {}
+            version = "empty"
+
+        templates = {}
+        for t_id in settings.get("template_list", []):
+            if f"template_{t_id}" in settings:
+                templates[t_id] = settings[f"template_{t_id}"]
+
+        compiled = [CompiledTemplate(t) for t in templates.values()]
+        matcher = TriggerMatcher(compiled)
+
+        # Fallback to "通用" template, then the first one, then a default structure
+        default = next(
+            (c for c in compiled if c.name == "通用"),
+            compiled[0] if compiled else CompiledTemplate(FALLBACK_TEMPLATE),
+        )
+
+        self.settings = settings
+        self.version = version
+        self.templates = templates
+        self._compiled = compiled
+        self._matcher = matcher
+        self._default = default
+        self._mtime = mtime
+
+    def maybe_reload(self):
+        try:
+            mtime = os.path.getmtime(self.settings_path)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            # 同一版本文件解析失败后静默重试，只在首次失败时打印
+            retry = mtime == self._failed_mtime
+            if not retry:
+                print(f"模板配置已变更，重新加载: {self.settings_path}")
+            try:
+                self.reload()
+            except Exception as e:
+                # 文件写到一半时可能解析失败，保留旧模板；_mtime 不变，下次检查时重试
+                if not retry:
+                    print(f"重新加载模板失败，继续使用旧版本: {e}")
+                self._failed_mtime = mtime
+
+    def match(self, url: str) -> CompiledTemplate:
+        self.maybe_reload()
+        return self._matcher.match(url) or self._default
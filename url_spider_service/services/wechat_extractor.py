@@ -0,0 +1,94 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+WECHAT_HOST = "mp.weixin.qq.com"
+
+# 文章已删除/违规时静态页只有提示语，没有 js_content，浏览器渲染也拿不到正文
+WECHAT_GONE_MARKERS = [
+    "该内容已被发布者删除",
+    "此内容因违规无法查看",
+    "此内容被多人投诉",
+    "该公众号已迁移",
+]
+
+# 页面脚本中的变量，服务端直出，不需要执行 JS
+SCRIPT_PATTERNS = {
+    "ct": re.compile(r"""\bvar\s+ct\s*=\s*["'](\d{9,11})["']"""),
+    "create_time": re.compile(r"""\bcreate_time\s*[:=]\s*["']?(\d{9,11})"""),
+    "msg_title": re.compile(r"""\bvar\s+msg_title\s*=\s*["'](.*?)["']"""),
+    "nickname": re.compile(
+        r"""\bvar\s+nickname\s*=\s*(?:htmlDecode\()?["'](.*?)["']"""
+    ),
+    "msg_desc": re.compile(
+        r"""\bvar\s+msg_desc\s*=\s*(?:htmlDecode\()?["'](.*?)["']"""
+    ),
+    "msg_cdn_url": re.compile(r"""\bvar\s+msg_cdn_url\s*=\s*["'](.*?)["']"""),
+}
+
+CHINA_TZ = timezone(timedelta(hours=8))
+
+
+def is_gone_page(html: str) -> bool:
+    return any(marker in html for marker in WECHAT_GONE_MARKERS)
+
+
+def find_content(soup: BeautifulSoup) -> Optional[Tag]:
+    return soup.find(id="js_content") or soup.find(class_="rich_media_content")
+
+
+def rewrite_lazy_images(root: Tag) -> int:
+    """微信图片懒加载，真实地址在 data-src 中"""
+    count = 0
+    for img in root.find_all("img"):
+        src = img.get("data-src") or img.get("data-original-src")
+        if src:
+            img["src"] = src
+            count += 1
+    return count
+
+
+def _script_value(html: str, name: str) -> str:
+    match = SCRIPT_PATTERNS[name].search(html)
+    return match.group(1).strip() if match else ""
+
+
+def _meta(soup: BeautifulSoup, **attrs) -> str:
+    tag = soup.find("meta", attrs=attrs)
+    return tag.get("content", "").strip() if tag else ""
+
+
+def _text(soup: BeautifulSoup, **attrs) -> str:
+    tag = soup.find(attrs=attrs)
+    return tag.get_text(strip=True) if tag else ""
+
+
+def _published(soup: BeautifulSoup, html: str) -> str:
+    # 页面上的 #publish_time 由 JS 填充，静态 HTML 中优先取脚本里的时间戳
+    timestamp = _script_value(html, "ct") or _script_value(html, "create_time")
+    if timestamp:
+        return datetime.fromtimestamp(int(timestamp), CHINA_TZ).isoformat()
+    return _meta(soup, property="article:published_time") or _text(
+        soup, id="publish_time"
+    )
+
+
+def extract_wechat_meta(soup: BeautifulSoup, html: str) -> Dict[str, Any]:
+    """从静态 HTML 中提取标题、作者、发布时间等，与浏览器渲染后读到的值保持一致"""
+    return {
+        "title": _meta(soup, property="og:title")
+        or _text(soup, id="activity-name")
+        or _script_value(html, "msg_title")
+        or (soup.title.get_text(strip=True) if soup.title else ""),
+        "author": _meta(soup, name="author")
+        or _text(soup, id="js_name")
+        or _script_value(html, "nickname"),
+        "account": _text(soup, id="js_name") or _script_value(html, "nickname"),
+        "published": _published(soup, html),
+        "description": _meta(soup, name="description")
+        or _meta(soup, property="og:description")
+        or _script_value(html, "msg_desc"),
+        "cover": _meta(soup, property="og:image") or _script_value(html, "msg_cdn_url"),
+    }
@@ -9,11 +9,13 @@ import traceback
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database import get_mysql_db, articles_collection
+from database import get_mysql_db, articles_collection, mongo_db
+from services.llm_cache import create_llm_cache
 from services.llm_service import LLMService
+from services.seen_urls import SeenUrls
+from services.url_canon import canonicalize_url
 
-CONCURRENCY = 5
-LLM_BATCH_SIZE = 50
+LLM_BATCH_SIZE = 50  # 拉取分组大小，每次 LLM 调用的篇数由 LLMService 按 token 预算决定
 TIMEOUT_HOURS = 1
 TIMEOUT_MINUTES = 45
 
@@ -23,7 +25,23 @@ def timeout_handler(signum, frame):
     sys.exit(0)
 
 
-async def process_batch(batch_data, llm_service, batch_num):
+def fill_source(collection, existing, canonical_url, mp_name):
+    """已入库的文章不再评估；缺 source 的旧记录补写 source 和 canonical_url"""
+    if existing.get("source") or not mp_name:
+        return
+    collection.update_one(
+        {"_id": existing["_id"]},
+        {
+            "$set": {
+                "source": mp_name,
+                "canonical_url": canonical_url,
+                "updated_at": datetime.now(),
+            }
+        },
+    )
+
+
+async def process_batch(batch_data, llm_service, batch_num, seen_urls):
     batch_to_process = batch_data["items"]
 
     if not batch_to_process:
@@ -35,18 +53,21 @@ async def process_batch(batch_data, llm_service, batch_num):
     ]
 
     print(f"[批次{batch_num}] LLM调用 {len(llm_input)} 篇...")
+    # LLMService 按 token 预算分批、按编号对回结果，与输入一一对应，评估失败的为 None
     evaluation_result = await llm_service.evaluate_articles(llm_input)
 
     evaluated_articles = evaluation_result.get("articles", [])
 
     saved_count = 0
     for i, eval_item in enumerate(evaluated_articles):
-        if i < len(batch_to_process):
+        # 评估失败的文章不入库，下次运行重新评估
+        if eval_item is not None and i < len(batch_to_process):
             original = batch_to_process[i]
 
             doc = {
                 "url": original["url"],
-                "title": eval_item.get("title", original["title"]),
+                "canonical_url": original["canonical_url"],
+                "title": original["title"],
                 "description": original["description"],
                 "source": original.get("source", ""),  # 添加 source 字段
                 "mp_id": original.get("mp_id", ""),  # 添加 mp_id 字段
@@ -60,25 +81,37 @@ async def process_batch(batch_data, llm_service, batch_num):
                 "updated_at": datetime.now(),
             }
 
+            # 按规范化 URL 入库，同一文章带不同跟踪参数的链接合并为一条
             articles_collection.update_one(
-                {"url": original["url"]}, {"$set": doc}, upsert=True
+                {"canonical_url": original["canonical_url"]}, {"$set": doc}, upsert=True
             )
+            seen_urls.add(original["canonical_url"])
             saved_count += 1
 
-    print(f"[批次{batch_num}] 完成 {saved_count} 篇评估")
+    failed = evaluation_result.get("failed", 0)
+    print(
+        f"[批次{batch_num}] 完成 {saved_count} 篇评估"
+        + (f"，{failed} 篇评估失败待下次重试" if failed else "")
+    )
     return saved_count
 
 
-async def task_fetch_and_evaluate():
+async def task_fetch_and_evaluate(seen_urls=None):
     print(f"[{datetime.now()}] 开始任务 1: 获取并评估文章 (并发模式)")
     print(
-        f"配置: CONCURRENCY={CONCURRENCY}, LLM_BATCH_SIZE={LLM_BATCH_SIZE}, TIMEOUT={TIMEOUT_HOURS}h{TIMEOUT_MINUTES}m"
+        f"配置: LLM_BATCH_SIZE={LLM_BATCH_SIZE}, TIMEOUT={TIMEOUT_HOURS}h{TIMEOUT_MINUTES}m"
     )
 
     start_time = time.time()
 
     try:
-        llm_service = LLMService()
+        llm_service = LLMService(cache=create_llm_cache(mongo_db))
+        # 服务进程内复用 lifespan 中预热的过滤器，单独运行时从文件加载
+        if seen_urls is None:
+            seen_urls = SeenUrls(articles_collection)
+        await asyncio.to_thread(seen_urls.warm)
+        queued = set()
+        duplicate_urls = 0
 
         db_gen = get_mysql_db()
         mysql_db = next(db_gen)
@@ -90,13 +123,15 @@ async def task_fetch_and_evaluate():
         offset = 0
         total_processed = 0
         empty_round_count = 0
+        round_num = 0
 
         try:
             while True:
-                # 1. 准备 CONCURRENCY 个批次
+                # 1. 准备批次，批次数跟随 LLM 并发控制器的当前上限
                 batches_to_submit = []
+                concurrency = llm_service.limiter.suggested_parallelism()
 
-                for batch_idx in range(CONCURRENCY):
+                for batch_idx in range(concurrency):
                     current_batch = []
 
                     # 每个批次内部：循环拉取直到凑满 50 条
@@ -117,6 +152,17 @@ async def task_fetch_and_evaluate():
                         if not rows:
                             break
 
+                        canonical_urls = {
+                            row[0]: canonicalize_url(row[0]) for row in rows
+                        }
+                        # 过滤器未命中的一定是新文章；命中可能是误判，整页一次回查 Mongo 确认
+                        existing_docs = seen_urls.confirm(
+                            [
+                                (url, canonical_url)
+                                for url, canonical_url in canonical_urls.items()
+                                if seen_urls.seen(canonical_url)
+                            ]
+                        )
                         for row in rows:
                             url = row[0]
                             title = row[1]
@@ -131,30 +177,27 @@ async def task_fetch_and_evaluate():
                                 row[5] if row[5] else ""
                             )  # 从 articles 表关联来的 publish_time
 
-                            existing = articles_collection.find_one({"url": url})
-                            # 如果已存在记录，需要更新 source 字段（即使已有评分也要更新）
-                            if existing:
-                                # 检查是否需要更新 source 字段
-                                if existing.get("source"):
-                                    continue  # 已有 source 字段，跳过
-                                # 没有 source 字段，更新它
-                                articles_collection.update_one(
-                                    {"url": url},
-                                    {
-                                        "$set": {
-                                            "source": mp_name,
-                                            "updated_at": datetime.now(),
-                                        }
-                                    },
-                                    upsert=True,
+                            canonical_url = canonical_urls[url]
+                            if canonical_url in queued:
+                                duplicate_urls += 1  # 本轮已排队的同一文章
+                                continue
+                            existing = existing_docs.get(canonical_url)
+                            if existing is not None:
+                                fill_source(
+                                    articles_collection,
+                                    existing,
+                                    canonical_url,
+                                    mp_name,
                                 )
                                 continue
 
+                            queued.add(canonical_url)
                             current_batch.append(
                                 {
                                     "title": title or "无标题",
                                     "description": (description or ""),
                                     "url": url,
+                                    "canonical_url": canonical_url,
                                     "source": mp_name,  # 添加 source 字段
                                     "mp_id": mp_id,  # 添加 mp_id 字段
                                     "publish_time": publish_time,
@@ -187,19 +230,18 @@ async def task_fetch_and_evaluate():
 
                 empty_round_count = 0
 
-                # 2. 并发提交所有批次到 LLM
+                # 2. 合并本轮文章一次提交，由 LLMService 按 token 预算重新分批并发评估
+                round_items = [
+                    item for batch in batches_to_submit for item in batch["items"]
+                ]
+                round_num += 1
                 print(
-                    f"[并发] 同时提交 {len(batches_to_submit)} 个批次，每个 {LLM_BATCH_SIZE} 条"
+                    f"[并发] 本轮 {len(round_items)} 篇，"
+                    f"LLM 并发上限 {llm_service.limiter.limit:.1f}"
+                )
+                batch_total = await process_batch(
+                    {"items": round_items}, llm_service, round_num, seen_urls
                 )
-                tasks = [
-                    process_batch(
-                        {"items": batch["items"]}, llm_service, batch["batch_num"]
-                    )
-                    for batch in batches_to_submit
-                ]
-                results = await asyncio.gather(*tasks)
-
-                batch_total = sum(results)
                 total_processed += batch_total
 
                 print(f"[进度] 本轮完成 {batch_total} 篇，累计 {total_processed} 条\n")
@@ -215,6 +257,11 @@ async def task_fetch_and_evaluate():
 
         finally:
             mysql_db.close()
+            seen_urls.save()
+            print(
+                f"任务 1: 合并重复链接 {duplicate_urls} 条，URL 过滤器 {seen_urls.status()}"
+            )
+            print(f"任务 1: LLM 缓存 {llm_service.status()['cache']}")
 
     except Exception as e:
         print(f"任务 1 错误: {e}")
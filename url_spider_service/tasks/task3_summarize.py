@@ -10,14 +10,16 @@ import traceback
 # Ensure we can import from parent directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database import articles_collection
-from services.llm_service import LLMService
+from database import articles_collection, mongo_db
+from services.content_dedup import ContentDedup, fingerprint
+from services.llm_cache import create_llm_cache
+from services.llm_service import LLMService, estimate_tokens
 
 # 配置
-CONCURRENCY_SUMMARIZE = 5  # 总结并发数
 TIMEOUT_HOURS = 1
 TIMEOUT_MINUTES = 45
-MAX_LENGTH = 10000
+# 长文由 LLMService 分块总结，只有异常超长的内容（多为抓取出错）才截断
+MAX_LENGTH = 200000
 
 
 def timeout_handler(signum, frame):
@@ -58,7 +60,22 @@ def preprocess_markdown(content):
     return content
 
 
-async def process_article(article, llm_service, sem):
+def find_summary_source(article, fp, dedup, summary_fields):
+    """查找正文相同（或近似）且已经总结过的文章，返回 (来源 _id, 总结字段, exact/near)"""
+    found = dedup.find_duplicate(
+        fp,
+        exclude_id=article["_id"],
+        extra_filter={"llm_summary_processed": True},
+        projection={field: 1 for field in summary_fields},
+    )
+    if not found:
+        return None
+    doc, kind, _ = found
+    summary = {field: doc[field] for field in summary_fields if field in doc}
+    return (doc["_id"], summary, kind) if summary else None
+
+
+async def process_article(article, llm_service, dedup, inflight, stats):
     url = article["url"]
     title = article.get("title", "无标题")
     score = article.get("pre_value_score", 0)
@@ -66,36 +83,87 @@ async def process_article(article, llm_service, sem):
     try:
         print(f"任务 3: 正在总结 (评分: {score}) {title} ({url})")
 
-        async with sem:
-            full_markdown = article.get("full_markdown", "")
-            if not full_markdown:
-                full_markdown = article.get("full_content", "")
-
-            if not full_markdown:
-                print(f"任务 3: 跳过 {url} (无内容)")
-                return
-
-            # 预处理 markdown 内容，去除图片、链接和元数据
-            processed_content = preprocess_markdown(full_markdown)
-
-            # 限制内容长度，进一步节约 token
-            max_length = MAX_LENGTH  # 可根据实际情况调整
-            if len(processed_content) > max_length:
-                processed_content = (
-                    processed_content[:max_length] + "..."
-                )  # 截断并添加省略号
-                print(f"任务 3: 内容过长，已截断至 {max_length} 字符")
-
+        full_markdown = article.get("full_markdown", "")
+        if not full_markdown:
+            full_markdown = article.get("full_content", "")
+
+        if not full_markdown:
+            print(f"任务 3: 跳过 {url} (无内容)")
+            return
+
+        # 预处理 markdown 内容，去除图片、链接和元数据
+        processed_content = preprocess_markdown(full_markdown)
+
+        # 限制异常超长内容的长度
+        max_length = MAX_LENGTH  # 可根据实际情况调整
+        if len(processed_content) > max_length:
+            processed_content = (
+                processed_content[:max_length] + "..."
+            )  # 截断并添加省略号
+            print(f"任务 3: 内容过长，已截断至 {max_length} 字符")
+
+        # 转载到不同 URL 的同一篇文章直接复用已有总结，不再调用 LLM
+        # 指纹计算和 Mongo 查询放到线程里，不阻塞事件循环
+        fp = article.get("content_fingerprint") or await asyncio.to_thread(
+            fingerprint, full_markdown
+        )
+        summary_fields = llm_service.summary_fields()
+        source = await asyncio.to_thread(
+            find_summary_source, article, fp, dedup, summary_fields
+        )
+        if source is None and fp["hash"] in inflight:
+            # 同一批次里的重复文章等待正在进行的总结
+            source = await inflight[fp["hash"]]
+        if source is not None:
+            source_id, summary, kind = source
+            saved_tokens = estimate_tokens(
+                llm_service.construct_summary_prompt(processed_content)
+            )
+            update_data = {
+                **summary,
+                "llm_summary_processed": True,
+                "llm_summary_reused_from": source_id,
+                "llm_summary_dedup": kind,
+                "dedup_saved_tokens": saved_tokens,
+                "content_fingerprint": fp,
+                "updated_at": datetime.now(),
+            }
+            articles_collection.update_one(
+                {"_id": article["_id"]}, {"$set": update_data}, upsert=True
+            )
+            stats["reused"] += 1
+            stats["tokens_saved"] += saved_tokens
+            print(f"任务 3: 复用重复文章的总结 ({kind}) {title} ({url}) <- {source_id}")
+            return
+
+        pending = None
+        if fp.get("length"):
+            pending = asyncio.get_running_loop().create_future()
+            inflight[fp["hash"]] = pending
+        try:
+            # 并发由 LLMService 内的自适应控制器统一限制
             result = await llm_service.process_content(processed_content)
 
             update_data = result
             update_data["llm_summary_processed"] = True
+            update_data["content_fingerprint"] = fp
             update_data["updated_at"] = datetime.now()
 
             articles_collection.update_one(
                 {"_id": article["_id"]}, {"$set": update_data}, upsert=True
             )
+            stats["summarized"] += 1
             print(f"任务 3: 已更新 (评分: {score}) {title} ({url})")
+            if pending is not None:
+                summary = {f: result[f] for f in summary_fields if f in result}
+                pending.set_result(
+                    (article["_id"], summary, "exact") if summary else None
+                )
+        finally:
+            if pending is not None:
+                if not pending.done():
+                    pending.set_result(None)
+                inflight.pop(fp["hash"], None)
 
     except Exception as e:
         print(f"任务 3 处理 {url} 时出错: {e}")
@@ -103,21 +171,21 @@ async def process_article(article, llm_service, sem):
 
 async def task_summarize_content():
     print(f"[{datetime.now()}] 开始任务 3: 总结内容 (最近2天)")
-    print(
-        f"配置: CONCURRENCY_SUMMARIZE={CONCURRENCY_SUMMARIZE}, TIMEOUT={TIMEOUT_HOURS}h{TIMEOUT_MINUTES}m"
-    )
+    print(f"配置: TIMEOUT={TIMEOUT_HOURS}h{TIMEOUT_MINUTES}m")
 
     start_time = time.time()
 
     try:
         # Initialize LLM Service
-        llm_service = LLMService()
+        llm_service = LLMService(cache=create_llm_cache(mongo_db))
 
         # Calculate date 2 days ago
         two_days_ago = datetime.now() - timedelta(days=2)
 
-        # 信号量控制并发
-        sem = asyncio.Semaphore(CONCURRENCY_SUMMARIZE)
+        # 正文去重：复用重复文章的总结，同批次重复文章只调用一次 LLM
+        dedup = ContentDedup(articles_collection)
+        inflight = {}
+        stats = {"summarized": 0, "reused": 0, "tokens_saved": 0}
 
         # 按评分从高到低处理 (10 到 3)
         for score in range(10, 2, -1):
@@ -141,20 +209,35 @@ async def task_summarize_content():
 
             print(f"任务 3: 正在总结 {len(articles)} 篇评分 {score} 的文章...")
 
-            # 创建任务列表
-            tasks = []
+            # 有界并发：同时处理的文章数跟随 LLM 并发上限，避免一次性创建整层任务
+            pending = set()
             for article in articles:
-                tasks.append(process_article(article, llm_service, sem))
-
-            # 并发执行
-            await asyncio.gather(*tasks)
+                while len(pending) >= llm_service.limiter.suggested_parallelism():
+                    _, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                pending.add(
+                    asyncio.create_task(
+                        process_article(article, llm_service, dedup, inflight, stats)
+                    )
+                )
+            if pending:
+                await asyncio.wait(pending)
 
             # 检查超时
             elapsed = time.time() - start_time
             timeout_seconds = TIMEOUT_HOURS * 3600 + TIMEOUT_MINUTES * 60
             if elapsed > timeout_seconds:
                 print(f"[超时] 已运行 {elapsed/3600:.2f} 小时，终止任务")
-                return
+                break
+
+        print(
+            f"任务 3: 调用 LLM 总结 {stats['summarized']} 篇，去重复用 {stats['reused']} 篇，"
+            f"节省约 {stats['tokens_saved']} tokens"
+        )
+        print(f"任务 3: 近 7 天去重统计 {dedup.report()}")
+        print(f"任务 3: LLM 缓存 {llm_service.status()['cache']}")
+        print(f"任务 3: LLM 并发 {llm_service.limiter.status()}")
 
     except Exception as e:
         print(f"任务 3 错误: {e}")
@@ -87,7 +87,7 @@ async def test_single_batch():
 
         print("=== 评估结果详情 ===")
         for i, item in enumerate(batch_to_process):
-            if i < len(evaluated_articles):
+            if i < len(evaluated_articles) and evaluated_articles[i] is not None:
                 eval_item = evaluated_articles[i]
                 print(f"\n{i+1}. {item['title'][:40]}...")
                 print(f"   评分: {eval_item.get('pre_value_score', 0)}")
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        return FakeContext()
+
+    async def new_browser_cdp_session(self):
+        raise RuntimeError("no CDP")
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    """代替 Chromium：只记录启动次数"""
+
+    def __init__(self):
+        self.chromium = self
+        self.launched = []
+
+    async def launch(self, **options):
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+
+def test_recycled_slot_serves_again():
+    async def concurrent_browsers(pool):
+        # 同时借出两个 context，两个槽位都可用时应分到不同的浏览器
+        async with pool.new_context() as _, pool.new_context() as _:
+            return {id(slot.browser) for slot in pool._slots if slot.active}
+
+    async def run():
+        pool = BrowserPool(size=2, max_pages_per_browser=3)
+        pool._playwright = FakePlaywright()
+        assert len(await concurrent_browsers(pool)) == 2
+
+        # 槽位 0 达到页数上限后回收
+        for _ in range(2):
+            async with pool.new_context():
+                pass
+        assert pool.stats["recycles"] == 1
+        assert len(await concurrent_browsers(pool)) == 2
+
+        # 浏览器崩溃后同样重新启动，而不是只剩一个浏览器工作
+        pool._slots[1].browser.connected = False
+        assert len(await concurrent_browsers(pool)) == 2
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.stats["crash_restarts"] == 1
+    assert not any(slot.retiring for slot in pool._slots if slot.browser is None)
+    print(f"✅ 回收或崩溃的浏览器重新启动，两个槽位都继续分配页面 ({pool.stats})")
+
+
+if __name__ == "__main__":
+    test_recycled_slot_serves_again()
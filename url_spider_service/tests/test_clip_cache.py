@@ -0,0 +1,82 @@
+import os
+import sys
+import asyncio
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.clip_cache import ClipCache
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = update["$set"]
+
+
+def test_leader_cancelled():
+    async def run():
+        cache = ClipCache()
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"markdown": f"call {len(calls)}"}
+
+        leader = asyncio.create_task(cache.coalesce("k", factory))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.coalesce("k", factory))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await waiter
+        return leader.cancelled(), result, len(calls), cache.status()
+
+    leader_cancelled, result, calls, status = asyncio.run(run())
+    # 领头请求被取消后，等待者重新发起而不是跟着被取消
+    assert leader_cancelled
+    assert result == {"markdown": "call 2"}
+    assert calls == 2
+    assert status["leader_cancelled"] == 1
+    assert status["inflight"] == 0
+    print("✅ 领头请求取消后等待者重新发起")
+
+
+def test_oversized_result():
+    async def run():
+        collection = FakeCollection()
+        cache = ClipCache(collection)
+        await cache.set("small", "https://a.test/1", {"markdown": "ok"})
+        big = {"markdown": "x" * (16 * 1024 * 1024)}
+        await cache.set("big", "https://a.test/2", big)
+        return collection.docs, cache
+
+    docs, cache = asyncio.run(run())
+    # 超大结果不写入 Mongo，但仍保留在内存缓存
+    assert list(docs) == ["small"]
+    assert cache.stats["oversized"] == 1
+    assert asyncio.run(cache.get("big")) is not None
+    print("✅ 超大结果跳过 Mongo 写入")
+
+
+def test_cache_key():
+    cache = ClipCache()
+    key = cache.key("https://zhuanlan.zhihu.com/p/123", "v1")
+    # 跟踪参数不同的同一篇文章命中同一条缓存
+    assert (
+        cache.key("https://zhuanlan.zhihu.com/p/123?utm_source=wx&share=1", "v1") == key
+    )
+    assert cache.key("https://zhuanlan.zhihu.com/p/456", "v1") != key
+    assert cache.key("https://zhuanlan.zhihu.com/p/123", "v2") != key
+    print("✅ 缓存键使用规范化 URL")
+
+
+if __name__ == "__main__":
+    test_cache_key()
+    test_leader_cancelled()
+    test_oversized_result()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.content_dedup import (
+    SIMHASH_MAX_DISTANCE,
+    ContentDedup,
+    fingerprint,
+    hamming,
+    normalize_content,
+)
+
+CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+
+
+def make_article(seed, length=3000):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(length // 50):
+        lines.append("".join(rng.choice(CHARS) for _ in range(48)) + "。")
+    return "\n\n".join(lines)
+
+
+def test_normalize():
+    markdown = "---\ntitle: x\n---\n# 标题\n\n![图](https://a.com/1.png)\n\n正文 **加粗** [链接](https://b.com)。"
+    assert normalize_content(markdown) == "标题正文加粗链接"
+    print("✅ 规范化去掉元数据、图片、链接地址和格式符号")
+
+
+def test_fingerprint():
+    body = make_article(1)
+    # 转载：加了页眉页脚、图片和不同的排版
+    repost = (
+        "> 本文转载自某公众号\n\n"
+        + body.replace("\n\n", "\n\n\n")
+        + "\n\n![二维码](https://x.com/qr.png)\n\n长按关注"
+    )
+    other = make_article(2)
+
+    fp, fp_repost, fp_other = fingerprint(body), fingerprint(repost), fingerprint(other)
+    assert fingerprint(body.replace("\n\n", "\n"))["hash"] == fp["hash"]
+    assert fp_repost["hash"] != fp["hash"]
+    distance = hamming(int(fp["simhash"], 16), int(fp_repost["simhash"], 16))
+    assert distance <= SIMHASH_MAX_DISTANCE
+    # 距离不超过阈值时至少有一段完全相同，能被索引召回
+    assert set(fp["bands"]) & set(fp_repost["bands"])
+    assert hamming(int(fp["simhash"], 16), int(fp_other["simhash"], 16)) > 10
+    print(f"✅ 转载文章 SimHash 距离 {distance}，不同文章明显区分")
+
+
+def test_short_content():
+    fp = fingerprint("很短的正文")
+    assert fp["length"] == 5 and "simhash" not in fp
+    assert fingerprint("![图](https://a.com/1.png)")["length"] == 0
+    print("✅ 短正文只做精确匹配，空正文不参与去重")
+
+
+class FakeCollection:
+    def __init__(self, doc):
+        self.doc = doc
+        self.threads = set()
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find_one(self, query, projection=None, sort=None):
+        self.threads.add(threading.current_thread())
+        if query["content_fingerprint.hash"] == self.doc["content_fingerprint"]["hash"]:
+            return self.doc
+        return None
+
+
+def test_clip_fields_off_loop():
+    body = make_article(3, length=50000)
+    collection = FakeCollection({"_id": 1, "content_fingerprint": fingerprint(body)})
+    dedup = ContentDedup(collection)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        fields = await dedup.clip_fields("https://b.com/repost", body)
+        task.cancel()
+        return fields, ticks
+
+    fields, ticks = asyncio.run(run())
+    assert fields["duplicate_of"] == 1 and fields["duplicate_kind"] == "exact"
+    # 指纹计算和 Mongo 查询期间事件循环仍在运行
+    assert ticks > 5
+    assert threading.main_thread() not in collection.threads
+    print(f"✅ 剪藏指纹在线程里计算，期间事件循环调度 {ticks} 次")
+
+
+if __name__ == "__main__":
+    test_normalize()
+    test_fingerprint()
+    test_short_content()
+    test_clip_fields_off_loop()
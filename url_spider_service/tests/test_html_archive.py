@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import html_archive
+from services.html_archive import DiskBlobStore, HtmlArchive
+
+
+def test_dedup_skips_compression():
+    calls = []
+    compress = html_archive.compress
+
+    def counting_compress(data, level):
+        calls.append(len(data))
+        return compress(data, level)
+
+    html_archive.compress = counting_compress
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            archive = HtmlArchive(DiskBlobStore(root))
+            html = "<html><body>" + "正文" * 5000 + "</body></html>"
+            first = archive.put(html)
+            second = archive.put(html)
+            assert archive.get(second) == html
+    finally:
+        html_archive.compress = compress
+
+    # 重复内容只计算摘要，不再压缩
+    assert len(calls) == 1
+    assert first == second
+    assert archive.stats["writes"] == 1 and archive.stats["dedup_hits"] == 1
+    print(f"✅ 重复 HTML 只压缩一次，压缩后 {first['stored_size']} 字节")
+
+
+if __name__ == "__main__":
+    test_dedup_skips_compression()
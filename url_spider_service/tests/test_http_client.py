@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import asyncio
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench")
+)
+
+from fixture_server import FixtureServer
+import httpx
+
+from services.http_client import SharedHttpClient
+
+
+def test_connection_reuse():
+    async def run():
+        with FixtureServer() as server:
+            client = SharedHttpClient(per_host_limit=2)
+            base = server.base_url.replace("127.0.0.1", "localhost")
+            try:
+                responses = await asyncio.gather(
+                    *[client.get(f"{base}/missing") for _ in range(10)]
+                )
+                return [r.status_code for r in responses], client.status()
+            finally:
+                await client.aclose()
+
+    codes, status = asyncio.run(run())
+    assert codes == [404] * 10
+    assert status["requests"] == 10
+    assert status["peak_inflight"] <= 2
+    assert status["connections_opened"] <= 2
+    assert status["reuse_ratio"] >= 0.8
+    assert status["dns_misses"] == 1
+    print("✅ 连接复用与单站点并发上限正确")
+
+
+def test_address_fallback():
+    async def run():
+        with FixtureServer() as server:
+            client = SharedHttpClient()
+            port = int(server.base_url.rsplit(":", 1)[1])
+            expires = time.monotonic() + 60
+            # 第一个地址上没有服务，应回退到第二个地址
+            client._dns._cache[("fixture.test", port)] = (
+                expires,
+                ["127.0.0.2", "127.0.0.1"],
+            )
+            client._dns._cache[("dead.test", port)] = (expires, ["127.0.0.2"])
+            try:
+                response = await client.get(f"http://fixture.test:{port}/missing")
+                try:
+                    await client.get(f"http://dead.test:{port}/missing")
+                    error = None
+                except httpx.ConnectError as e:
+                    error = e
+                return response.status_code, client.status(), error
+            finally:
+                await client.aclose()
+
+    code, status, error = asyncio.run(run())
+    assert code == 404
+    assert status["connections_opened"] == 1
+    # 所有地址都连不上时抛出 httpx 异常，并丢弃该域名的缓存
+    assert isinstance(error, httpx.ConnectError)
+    assert error.request.url.host == "dead.test"
+    assert status["busy_hosts"] == {}
+    assert status["connect_failures"] == 2
+    assert status["dns_cached_hosts"] == 1
+    print("✅ 多地址依次回退正确")
+
+
+if __name__ == "__main__":
+    test_connection_reuse()
+    test_address_fallback()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import sys
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_service import LLMService, LLMTruncatedError
+
+
+def make_service(max_items):
+    """模拟服务商：一次超过 max_items 篇时输出被截断；结果倒序返回，标题含“坏”的文章会被漏掉"""
+    service = LLMService()
+    service.cache = None
+    calls = []
+
+    async def fake_request(prompt):
+        articles = json.loads(prompt.split("输入文章列表：")[1])
+        calls.append(len(articles))
+        if len(articles) > max_items:
+            raise LLMTruncatedError('{"articles": [{"id": 1, "pre_value_score": ')
+        items = [
+            {
+                "id": a["id"],
+                "title": "模型改写的标题",
+                "pre_value_score": len(a["title"]),
+            }
+            for a in reversed(articles)
+            if "坏" not in a["title"]
+        ]
+        return json.dumps({"articles": items}, ensure_ascii=False)
+
+    service._request = fake_request
+    return service, calls
+
+
+def test_plan_by_budget():
+    service, _ = make_service(100)
+    short = [{"title": f"短标题{i}", "description": "简介"} for i in range(60)]
+    long = [{"title": "长标题", "description": "长" * 1000} for _ in range(60)]
+    short_batches = service.plan_evaluation_batches(short)
+    long_batches = service.plan_evaluation_batches(long)
+    assert len(long_batches) > len(short_batches)
+    # 区间首尾相接，覆盖全部文章
+    assert long_batches[0][0] == 0 and long_batches[-1][1] == len(long)
+    assert all(a[1] == b[0] for a, b in zip(long_batches, long_batches[1:]))
+    print(f"✅ 短文章 {len(short_batches)} 批，长文章 {len(long_batches)} 批")
+
+
+def test_split_on_truncation():
+    service, calls = make_service(max_items=7)
+    articles = [{"title": "文" * (i + 1), "description": "简介"} for i in range(30)]
+    articles[13]["title"] = "坏文章"
+    result = asyncio.run(service.evaluate_articles(articles))
+    evaluated = result["articles"]
+    assert len(evaluated) == len(articles) and result["failed"] == 1
+    assert evaluated[13] is None
+    # 乱序返回也按编号对回原文章，标题以输入为准
+    assert all(
+        evaluated[i]["title"] == articles[i]["title"]
+        and evaluated[i]["pre_value_score"] == len(articles[i]["title"])
+        and "id" not in evaluated[i]
+        for i in range(len(articles))
+        if i != 13
+    )
+    stats = service.eval_stats
+    assert stats["truncated"] and stats["splits"]
+    # 漏掉的文章单独重试，同批其他文章不重复调用
+    assert stats["missing_items"] == 1 and stats["rebatched"] == 1
+    print(
+        f"✅ 截断拆分、漏项按编号重试，调用 {len(calls)} 次，仅 1 篇失败并标记为 None"
+    )
+
+
+if __name__ == "__main__":
+    test_plan_by_budget()
+    test_split_on_truncation()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_cache import DiskCacheStore, LLMResponseCache
+from services.llm_service import LLMService
+
+
+def make_service(root):
+    service = LLMService(cache=LLMResponseCache(DiskCacheStore(root)))
+    calls = []
+
+    async def fake_call(prompt):
+        calls.append(prompt)
+        return "not json" if "坏" in prompt else json.dumps({"description": "摘要"})
+
+    # 只替换网络调用，缓存键、解析逻辑走真实代码
+    service._call_llm = fake_call
+    return service, calls
+
+
+def test_repeat_calls_hit_cache():
+    with tempfile.TemporaryDirectory() as root:
+        service, calls = make_service(root)
+        first = asyncio.run(service.process_content("正文"))
+        second = asyncio.run(service.process_content("正文"))
+        assert first == second == {"description": "摘要"}
+        assert len(calls) == 1
+
+        # 新实例（任务重跑）同样命中
+        rerun, rerun_calls = make_service(root)
+        assert asyncio.run(rerun.process_content("正文")) == first
+        assert not rerun_calls and rerun.cache.stats["hits"] == 1
+
+        # 配置变化后不再命中
+        rerun.settings_version = "changed"
+        asyncio.run(rerun.process_content("正文"))
+        assert len(rerun_calls) == 1
+
+        # 解析失败的响应不缓存
+        asyncio.run(service.process_content("坏"))
+        asyncio.run(service.process_content("坏"))
+        assert calls.count(service.construct_summary_prompt("坏")) == 2
+    print("✅ 相同提示词只调用一次 LLM，配置变化或解析失败不复用")
+
+
+def test_disk_eviction():
+    with tempfile.TemporaryDirectory() as root:
+        store = DiskCacheStore(root)
+        for i in range(20):
+            store.put(f"{i:064x}", {"response": "x" * 1000})
+            os.utime(store._path(f"{i:064x}"), (i, i))
+        removed = store.evict(10 * 1024)
+        assert removed > 10
+        assert store.get(f"{19:064x}") is not None
+        assert store.get(f"{0:064x}") is None
+    print(f"✅ 超出大小上限时淘汰最久未使用的 {removed} 条")
+
+
+if __name__ == "__main__":
+    test_repeat_calls_hit_cache()
+    test_disk_eviction()
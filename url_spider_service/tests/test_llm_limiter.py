@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+import time
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import llm_service as llm_module
+from services.llm_limiter import (
+    LLM_LATENCY_TOLERANCE,
+    AdaptiveLimiter,
+    retry_after_seconds,
+)
+from services.llm_service import LLMService
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Error code: 429 - rate_limit_error")
+        self.response = FakeResponse(
+            {"retry-after": retry_after} if retry_after else {}
+        )
+
+
+def make_service(capacity, retry_after=None):
+    """模拟服务商：同时进行的请求超过 capacity 时返回 429"""
+    service = LLMService(limiter=AdaptiveLimiter(initial=2, max_limit=32))
+    state = {"inflight": 0, "peak": 0, "rejected": 0}
+
+    async def fake_request(prompt):
+        state["inflight"] += 1
+        try:
+            if state["inflight"] > capacity:
+                state["rejected"] += 1
+                raise RateLimitError(retry_after)
+            state["peak"] = max(state["peak"], state["inflight"])
+            await asyncio.sleep(0.01)
+            return '{"ok": true}'
+        finally:
+            state["inflight"] -= 1
+
+    service._request = fake_request
+    return service, state
+
+
+def test_aimd_converges():
+    llm_module.LLM_RETRY_BASE_DELAY = 0.01
+    service, state = make_service(capacity=8)
+
+    async def run():
+        results = await asyncio.gather(*[service._call_llm(str(i)) for i in range(400)])
+        assert all(r == '{"ok": true}' for r in results)
+
+    asyncio.run(run())
+    status = service.limiter.status()
+    # 上限从 2 增长到服务商容量附近，超出后减半
+    assert status["peak_limit"] > 8 and status["decreases"] >= 1
+    assert 4 <= status["limit"] <= 12
+    print(f"✅ 并发上限收敛到 {status['limit']}（容量 8），拒绝 {state['rejected']} 次")
+
+
+def test_retry_after():
+    assert retry_after_seconds(RateLimitError("3")) == 3.0
+    assert retry_after_seconds(RateLimitError()) is None
+
+    limiter = AdaptiveLimiter(initial=4)
+
+    async def run():
+        async with limiter.slot() as slot:
+            slot.overload(0.2)
+        start = time.monotonic()
+        async with limiter.slot() as slot:
+            slot.success()
+        return time.monotonic() - start
+
+    waited = asyncio.run(run())
+    assert waited >= 0.18 and limiter.limit == 2
+    print(f"✅ 按 retry-after 暂停 {waited:.2f}s，上限减半为 {limiter.limit}")
+
+
+def test_latency_normalized_by_tokens():
+    limiter = AdaptiveLimiter(initial=1, max_limit=32)
+
+    async def run():
+        # 先来一批短请求确定基线，之后提示词变长、耗时按 token 数线性增加
+        for tokens in [100] * 5 + [8000] * 10:
+            async with limiter.slot() as slot:
+                await asyncio.sleep(0.005 * (tokens + 500) / 1000)
+                slot.success(tokens)
+
+    asyncio.run(run())
+    # 单位 token 延迟没有变化，不应被判为拥塞
+    assert limiter.latency < limiter.baseline * LLM_LATENCY_TOLERANCE
+    print(
+        f"✅ 长提示词不被误判为拥塞 (延迟/基线 {limiter.latency / limiter.baseline:.2f})"
+    )
+
+
+def test_loop_change_resets_inflight():
+    limiter = AdaptiveLimiter(initial=2)
+
+    async def hold():
+        async with limiter.slot():
+            await asyncio.sleep(10)
+
+    async def abandon():
+        # 模拟上一次运行里还没释放的并发槽
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        return task
+
+    async def run():
+        assert limiter.inflight == 1
+        async with limiter.slot():
+            return limiter.inflight
+
+    loop = asyncio.new_event_loop()
+    task = loop.run_until_complete(abandon())
+    inflight = asyncio.run(run())
+    # 旧循环里的槽稍后释放，也不应把计数扣成负数
+    task.cancel()
+    loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+    loop.close()
+    assert inflight == 1 and limiter.inflight == 0
+    print("✅ 换事件循环后并发计数重新开始")
+
+
+if __name__ == "__main__":
+    test_aimd_converges()
+    test_retry_after()
+    test_latency_normalized_by_tokens()
+    test_loop_change_resets_inflight()
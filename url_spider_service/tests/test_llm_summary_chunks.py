@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import re
+import sys
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_service import (
+    SUMMARY_CHUNK_TOKENS,
+    LLMService,
+    estimate_tokens,
+    split_markdown,
+)
+
+
+def make_article(sections):
+    parts = ["# 长文标题"]
+    for i in range(sections):
+        parts.append(f"## 第{i}节")
+        parts.extend(f"第{i}节的段落内容。" * 15 for _ in range(4))
+    return "\n\n".join(parts)
+
+
+def test_split_markdown():
+    content = make_article(12) + "\n\n```\n# 代码里的井号\n\nprint(1)\n```"
+    chunks = split_markdown(content, 800)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 800 for chunk in chunks)
+    # 章节不被拆开，代码块不被切断
+    assert all(chunk.startswith("#") for chunk in chunks)
+    assert sum("```" in chunk for chunk in chunks) == 1
+    # 全部段落都在某一块里
+    assert "".join(chunks).count("段落内容") == content.count("段落内容")
+    print(f"✅ 按标题和段落切成 {len(chunks)} 块，每块不超过预算")
+
+
+def test_map_reduce():
+    service = LLMService()
+    service.cache = None
+    prompts = []
+
+    async def fake_request(prompt):
+        prompts.append(prompt)
+        if "The following is part" in prompt:
+            sections = sorted(set(re.findall(r"## (第\d+节)", prompt)))
+            return json.dumps({"notes": "、".join(sections)}, ensure_ascii=False)
+        covered = set(re.findall(r"第\d+节", prompt))
+        return json.dumps({"description": f"覆盖 {len(covered)} 节", "tags": []})
+
+    service._request = fake_request
+
+    short = asyncio.run(service.process_content("短文"))
+    assert len(prompts) == 1 and short["description"] == "覆盖 0 节"
+
+    content = make_article(40)
+    assert estimate_tokens(content) > SUMMARY_CHUNK_TOKENS
+    result = asyncio.run(service.process_content(content))
+    # 最后一节也进入了最终总结，而不是只看开头
+    assert result["description"] == "覆盖 40 节"
+    stats = service.summary_stats
+    assert stats["single"] == 1 and stats["map_reduce"] == 1
+    assert len(prompts) == 1 + stats["chunks"] + 1
+    print(f"✅ 长文分 {stats['chunks']} 块并发总结后合并，覆盖全部章节")
+
+
+if __name__ == "__main__":
+    test_split_markdown()
+    test_map_reduce()
@@ -0,0 +1,101 @@
+import os
+import random
+import sys
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify as md
+
+from services.markdown_stream import convert_node, normalize_markdown
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "bench",
+    "fixtures",
+    "wechat_article.html",
+)
+
+CASES = [
+    "<div><section> <span> hi </span><strong> bold </strong> tail</section>"
+    '<p>a<br>b<br></p><h1>Title  x</h1><h3>Sub <img src="x.png" alt="alt"></h3>'
+    '<ul><li>one</li><li>two <a href="http://x">link</a></li></ul></div>',
+    "<div><blockquote><section>deep<section>er</section></section></blockquote>"
+    "<pre><code>a = 1\nb = 2</code></pre><p>under_score * star</p>"
+    "<section><section><p></p></section></section>"
+    "<table><tr><th>h</th></tr><tr><td>c</td></tr></table></div>",
+    "<div>\n  <section>\n <p>one</p>\n  <p>two</p>\n</section>\n text <em> e </em>!"
+    '<p>x<a href="u">u</a></p><p><a href="http://y"><img src="i.png"></a></p>'
+    "<!-- c --><span>x</span> <em>y</em>y<br/><br/>z</div>",
+]
+
+
+def _content_div(html):
+    soup = BeautifulSoup(html, "html.parser")
+    div = soup.find(id="js_content") or soup.div
+    for s in div(["script", "style"]):
+        s.decompose()
+    return div
+
+
+def test_parity_with_markdownify():
+    for html in CASES:
+        div = _content_div(html)
+        assert convert_node(div) == md(str(div))
+    print("✅ 流式转换与 markdownify 输出一致")
+
+
+def test_wechat_fixture():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        div = _content_div(f.read())
+    expected = md(str(div))
+    assert expected and convert_node(div) == expected
+    print("✅ 微信样例输出一致")
+
+
+FUZZ_TAGS = ["p", "div", "section", "span", "strong", "em", "a", "br", "img"]
+FUZZ_TAGS += ["h2", "ul", "blockquote", "code", "pre", "table"]
+FUZZ_TEXTS = ["hi", " x ", "\n", "  ", "a_b", "中文", " ", "*s*"]
+
+
+def random_html(rng, depth):
+    out = []
+    for _ in range(rng.randint(0, 4)):
+        if depth <= 0 or rng.random() < 0.35:
+            out.append(rng.choice(FUZZ_TEXTS))
+            continue
+        tag = rng.choice(FUZZ_TAGS)
+        if tag == "br":
+            out.append("<br>")
+        elif tag == "img":
+            out.append('<img src="i.png">')
+        elif tag == "ul":
+            items = [random_html(rng, depth - 2) for _ in range(rng.randint(1, 3))]
+            out.append("<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>")
+        elif tag == "table":
+            out.append(f"<table><tr><td>{random_html(rng, 0)}</td></tr></table>")
+        elif tag == "a":
+            out.append(f'<a href="u">{random_html(rng, depth - 1)}</a>')
+        else:
+            out.append(f"<{tag}>{random_html(rng, depth - 1)}</{tag}>")
+    return "".join(out)
+
+
+def test_randomized_parity():
+    # 随机嵌套下不保证逐字节一致，只要求渲染等价：去掉行首尾空白和多余空行后相同
+    rng = random.Random(20260218)
+    exact = 0
+    for _ in range(2000):
+        div = _content_div(f"<div>{random_html(rng, 4)}</div>")
+        expected = md(str(div))
+        actual = convert_node(div)
+        exact += actual == expected
+        assert normalize_markdown(actual) == normalize_markdown(expected), str(div)
+    print(f"✅ 2000 个随机文档渲染等价，其中 {exact} 个逐字节一致")
+
+
+if __name__ == "__main__":
+    test_parity_with_markdownify()
+    test_wechat_fixture()
+    test_randomized_parity()
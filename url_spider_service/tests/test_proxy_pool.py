@@ -0,0 +1,79 @@
+import os
+import sys
+import asyncio
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench")
+)
+os.environ.setdefault("HTML_ARCHIVE_BACKEND", "off")
+
+from fixture_server import FixtureServer
+from stand_in_proxy import StandInProxy
+from services.clipper_service import ClipperService
+from services.proxy_pool import ProxyPool, playwright_proxy
+
+URL = "https://mp.weixin.qq.com/s/bench-wechat-article"
+
+
+def test_scoring_and_eviction():
+    pool = ProxyPool(["http://a:1", "http://b:1"])
+    first = pool.acquire(URL)
+    pool.report(first, URL, ok=True, latency_ms=50)
+    # 同一站点粘滞
+    assert pool.acquire(URL) == first
+    pool.report(first, URL, ok=False, error_class="http_4xx")
+    assert pool.status()["proxies"][0]["failures"] == 0
+
+    for _ in range(3):
+        proxy = pool.acquire(URL)
+        pool.report(proxy, URL, ok=False, error_class="network")
+    assert pool.stats["evictions"] == 1
+    assert pool.acquire(URL) != first
+
+    other = pool.acquire("https://zhuanlan.zhihu.com/p/1")
+    pool.report_challenge("https://zhuanlan.zhihu.com/p/1")
+    assert "zhuanlan.zhihu.com" not in pool._sticky
+    assert playwright_proxy("http://u:p@h:8080") == {
+        "server": "http://h:8080",
+        "username": "u",
+        "password": "p",
+    }
+    assert other and ProxyPool([]).acquire(URL) is None
+    print("✅ 代理打分、粘滞与剔除正确")
+
+
+def test_survives_degraded_proxy():
+    async def run(proxies, slow_ms):
+        with FixtureServer() as server:
+            service = ClipperService(
+                replay_base=server.base_url,
+                proxy_pool=ProxyPool([p.url for p in proxies], slow_ms=slow_ms),
+            )
+            template = service.find_compiled_template(URL)
+            try:
+                results = []
+                for _ in range(8):
+                    results.append(
+                        await service._process_static(URL, template, "wechat")
+                    )
+                return results, service.proxy_pool.status()
+            finally:
+                await service.close()
+
+    with StandInProxy(mode="down") as down, StandInProxy() as good:
+        results, status = asyncio.run(run([down, good], 5000))
+    assert [r is not None for r in results] == [False] * 3 + [True] * 5
+    assert status["evictions"] == 1 and good.requests == 5
+
+    with StandInProxy(latency_ms=300) as slow, StandInProxy() as good:
+        results, status = asyncio.run(run([slow, good], 200))
+    assert all(r is not None for r in results)
+    assert slow.requests == 1 and good.requests == 7
+    print("✅ 坏代理被剔除、慢代理被绕开，剪藏不受影响")
+
+
+if __name__ == "__main__":
+    test_scoring_and_eviction()
+    test_survives_degraded_proxy()
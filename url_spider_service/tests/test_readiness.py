@@ -0,0 +1,46 @@
+import os
+import sys
+import asyncio
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import readiness
+from services.readiness import ReadinessTracker
+
+
+class FakePage:
+    """选择器在 selector_delay 秒后出现，正文长度和 DOM 一直稳定"""
+
+    def __init__(self, selector_delay):
+        self.selector_delay = selector_delay
+
+    def on(self, event, handler):
+        pass
+
+    async def wait_for_selector(self, selector, timeout):
+        if timeout / 1000 < self.selector_delay:
+            await asyncio.sleep(timeout / 1000)
+            raise TimeoutError(selector)
+        await asyncio.sleep(self.selector_delay)
+
+    async def evaluate(self, script, selector):
+        return {"sinceMutation": 10000, "textLength": 100}
+
+
+def test_selector_budget():
+    saved = readiness.NETWORK_IDLE_MS, readiness.POLL_INTERVAL_MS
+    readiness.NETWORK_IDLE_MS, readiness.POLL_INTERVAL_MS = 0, 10
+    try:
+        tracker = ReadinessTracker(FakePage(selector_delay=0.3))
+        # 稳定检测上限 200ms 比选择器出现的时间短，选择器仍按自己的预算等待
+        result = asyncio.run(tracker.wait(wait_selector=".RichText", max_wait_ms=200))
+    finally:
+        readiness.NETWORK_IDLE_MS, readiness.POLL_INTERVAL_MS = saved
+    assert result["signals"]["selector"] and result["ready"]
+    assert 300 <= result["elapsed_ms"] < 500
+    print(f"✅ 选择器单独计时，{result['elapsed_ms']}ms 后就绪")
+
+
+if __name__ == "__main__":
+    test_selector_budget()
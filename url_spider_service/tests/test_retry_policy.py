@@ -0,0 +1,106 @@
+import os
+import sys
+import asyncio
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HTML_ARCHIVE_BACKEND", "off")
+
+from services.clipper_service import ClipperService
+
+from services.timing import StageTimer
+from services.retry_policy import (
+    RetryPolicy,
+    classify_exception,
+    error_result,
+    failure_update,
+)
+
+
+def test_classify():
+    assert classify_exception(Exception("net::ERR_NAME_NOT_RESOLVED at x")) == "dns"
+    assert classify_exception(Exception("net::ERR_CERT_DATE_INVALID")) == "tls"
+    assert classify_exception(Exception("Timeout 60000ms exceeded.")) == "timeout"
+    assert classify_exception(Exception("net::ERR_CONNECTION_RESET")) == "network"
+    assert not error_result("HTTP 404", "http_4xx", 404)["retryable"]
+    assert error_result("HTTP 429", "http_4xx", 429)["retryable"]
+    assert error_result("HTTP 503", "http_5xx", 503)["retryable"]
+    print("✅ 错误分类正确")
+
+
+def test_retry_run():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            return error_result("HTTP 502", "http_5xx", 502)
+        return {"content": "ok"}
+
+    async def dead():
+        calls.append(1)
+        return error_result("net::ERR_NAME_NOT_RESOLVED", "dns")
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+    result = asyncio.run(policy.run("https://example.com", flaky))
+    assert result["attempts"] == 3 and result["failures"] == {"http_5xx": 2}
+    assert failure_update(result)["$inc"] == {"clip_failures.http_5xx": 2}
+
+    calls.clear()
+    result = asyncio.run(policy.run("https://example.com", dead))
+    assert len(calls) == 1 and result["attempts"] == 1
+    assert failure_update(result)["$set"]["clip_error"]["error_class"] == "dns"
+    print("✅ 暂时性错误退避重试，永久性错误立即失败")
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.headers = {}
+
+
+class FakePage:
+    """只返回固定状态码和页面内容，不启动浏览器"""
+
+    def __init__(self, status, html):
+        self.status = status
+        self.html = html
+
+    async def goto(self, url, **kwargs):
+        return FakeResponse(self.status)
+
+    async def content(self):
+        return self.html
+
+
+def test_challenge_status():
+    url = "https://zhuanlan.zhihu.com/p/1"
+    challenge = (
+        "<html><head><title>安全验证</title></head><body>请完成安全验证</body></html>"
+    )
+    forbidden = (
+        "<html><head><title>403 Forbidden</title></head><body>nginx</body></html>"
+    )
+
+    async def clip(status, html):
+        service = ClipperService()
+        try:
+            template = service.find_compiled_template(url)
+            page = FakePage(status, html)
+            return await service._clip_page(page, url, template, None, StageTimer())
+        finally:
+            await service.close()
+
+    for status in (403, 429, 503):
+        result = asyncio.run(clip(status, challenge))
+        assert result["error_class"] == "challenge" and result["challenge"]
+        assert result["status"] == status
+    result = asyncio.run(clip(403, forbidden))
+    assert result["error_class"] == "http_4xx" and not result.get("challenge")
+    print("✅ 403/429/503 验证页按 challenge 分类，普通 403 仍按状态码分类")
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_retry_run()
+    test_challenge_status()
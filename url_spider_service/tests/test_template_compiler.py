@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.template_compiler import Expression, TemplateRegistry
+
+SETTINGS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "obsidian-web-clipper-settings.json",
+)
+
+
+def test_expression_compile():
+    expr = Expression('{{selectorHtml:.RichText|first|replace:"a","b"|markdown}}')
+    assert expr.source == "selectorHtml:.RichText"
+    assert expr.filters == [("first", []), ("replace", ["a", "b"]), ("markdown", [])]
+    print("✅ 表达式编译正确")
+
+
+def test_trigger_matching():
+    registry = TemplateRegistry(SETTINGS_PATH)
+    assert registry.match("https://zhuanlan.zhihu.com/p/123").name == "知乎专栏"
+    assert (
+        registry.match("https://www.zhihu.com/question/1/answer/2").name == "知乎回答"
+    )
+    assert registry.match("https://mp.weixin.qq.com/s/abc").name == "通用"
+    print("✅ 模板触发规则匹配正确")
+
+
+def test_hot_reload():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, "settings.json")
+        shutil.copy(SETTINGS_PATH, path)
+        registry = TemplateRegistry(path)
+        old_version = registry.version
+
+        with open(path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        for t_id in settings["template_list"]:
+            template = settings[f"template_{t_id}"]
+            if template["name"] == "通用":
+                template["triggers"] = ["https://example.com/"]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False)
+        os.utime(path, (0, os.path.getmtime(path) + 10))
+
+        assert registry.match("https://example.com/post").name == "通用"
+        assert registry.version != old_version
+        print("✅ 配置文件修改后自动重新加载")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_failed_reload():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, "settings.json")
+        shutil.copy(SETTINGS_PATH, path)
+        registry = TemplateRegistry(path)
+        old_version = registry.version
+        mtime = os.path.getmtime(path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        broken = dict(settings, template_list=settings["template_list"] + ["bad"])
+        broken["template_bad"] = "not a template"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(broken, f, ensure_ascii=False)
+        os.utime(path, (0, mtime + 10))
+
+        # 编译失败时元数据和模板都保持旧版本
+        assert registry.match("https://zhuanlan.zhihu.com/p/1").name == "知乎专栏"
+        assert registry.version == old_version
+        assert registry._mtime == mtime
+
+        # 修好的内容即使 mtime 相同也会在下次检查时重新加载
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=1)
+        os.utime(path, (0, mtime + 10))
+        registry.match("https://zhuanlan.zhihu.com/p/1")
+        assert registry.version != old_version
+        assert registry._mtime == mtime + 10
+        print("✅ 模板重新加载失败时保留旧版本并继续重试")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    test_expression_compile()
+    test_trigger_matching()
+    test_hot_reload()
+    test_failed_reload()
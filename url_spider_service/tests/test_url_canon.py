@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.seen_urls import BloomFilter, SeenUrls
+from services.url_canon import canonicalize_url, url_query
+from tasks.task1_fetch import fill_source
+
+
+class FakeCollection:
+    """只实现过滤器预热和任务 1 回查路径用到的 find / update_one"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def _match(self, doc, query):
+        for clause in query["$or"]:
+            if "canonical_url" in clause:
+                if doc.get("canonical_url") == clause["canonical_url"]:
+                    return True
+            elif doc.get("url") in clause["url"]["$in"]:
+                return True
+        return False
+
+    def find(self, query, projection=None):
+        if "$or" not in query:
+            return FakeCursor(self.docs)
+        return [doc for doc in self.docs if self._match(doc, query)]
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    def update_one(self, query, update):
+        for doc in self.docs:
+            if doc["_id"] == query["_id"]:
+                doc.update(update["$set"])
+
+
+class FakeCursor(list):
+    def sort(self, *args):
+        return self
+
+
+WECHAT = "https://mp.weixin.qq.com/s?__biz=MzA3MzI4MjgzMw%3D%3D&mid=2650912345&idx=1&sn=abcdef123"
+
+
+def test_wechat():
+    variants = [
+        "http://mp.weixin.qq.com/s?__biz=MzA3MzI4MjgzMw==&amp;mid=2650912345&amp;idx=1&amp;sn=ABCdef123&amp;chksm=84e1&amp;scene=21#wechat_redirect",
+        "https://mp.weixin.qq.com/s?sn=abcdef123&__biz=MzA3MzI4MjgzMw%3D%3D&mid=2650912345&sessionid=1771545600&idx=1",
+        "https://mp.weixin.qq.com/mp/appmsg/show?__biz=MzA3MzI4MjgzMw==&appmsgid=2650912345&itemidx=1&sn=abcdef123",
+    ]
+    assert {canonicalize_url(u) for u in variants} == {WECHAT}
+    assert (
+        canonicalize_url("https://mp.weixin.qq.com/s/AbCdEf123?scene=1")
+        == "https://mp.weixin.qq.com/s/AbCdEf123"
+    )
+    print("✅ 微信链接去掉 chksm/scene/sessionid，只保留 __biz/mid/idx/sn")
+
+
+def test_generic():
+    assert (
+        canonicalize_url("https://Example.COM:443/a?b=2&utm_source=x&a=1#frag")
+        == "https://example.com/a?a=1&b=2"
+    )
+    assert (
+        canonicalize_url("https://zhuanlan.zhihu.com/p/123?utm_id=1&share=2")
+        == "https://zhuanlan.zhihu.com/p/123"
+    )
+    assert canonicalize_url("mailto:x@y") == "mailto:x@y"
+    assert url_query(WECHAT)["$or"][1] == {"url": {"$in": [WECHAT]}}
+    print("✅ 通用规则：域名小写、去默认端口和锚点、去跟踪参数、参数排序")
+
+
+def test_bloom():
+    bloom = BloomFilter(10000, 0.001)
+    for i in range(10000):
+        bloom.add(f"https://a.com/{i}")
+    assert all(f"https://a.com/{i}" in bloom for i in range(10000))
+    false_positives = sum(f"https://b.com/{i}" in bloom for i in range(20000))
+    assert false_positives < 20000 * 0.003
+    print(f"✅ 布隆过滤器无漏判，误判 {false_positives}/20000")
+
+
+def test_task1_lookup():
+    old_url = "https://example.com/old?utm_source=rss"
+    collection = FakeCollection(
+        [
+            {"_id": 1, "url": WECHAT, "canonical_url": WECHAT, "source": "公众号"},
+            {"_id": 2, "url": old_url},  # 没有 canonical_url 和 source 的旧文章
+        ]
+    )
+    with tempfile.TemporaryDirectory() as root:
+        seen_urls = SeenUrls(collection, path=os.path.join(root, "bloom.bin"))
+        seen_urls.warm()
+        wechat_variant = WECHAT.replace("https://", "http://") + "&scene=21"
+        new_url = "https://example.com/new"
+        rows = {
+            wechat_variant: canonicalize_url(wechat_variant),
+            old_url: canonicalize_url(old_url),
+            new_url: new_url,
+        }
+        # 缺 source 的旧文章也在过滤器里，未命中的新文章不查 Mongo
+        hits = [(u, c) for u, c in rows.items() if seen_urls.seen(c)]
+        assert [u for u, _ in hits] == [wechat_variant, old_url]
+        existing = seen_urls.confirm(hits)
+        assert set(existing) == {WECHAT, "https://example.com/old"}
+        assert seen_urls.status()["in_process_ratio"] == round(1 / 3, 3)
+
+        fill_source(collection, existing[WECHAT], WECHAT, "新来源")
+        fill_source(
+            collection,
+            existing["https://example.com/old"],
+            "https://example.com/old",
+            "新来源",
+        )
+        assert collection.docs[0]["source"] == "公众号"
+        assert collection.docs[1]["source"] == "新来源"
+        assert collection.docs[1]["canonical_url"] == "https://example.com/old"
+
+        # 过滤器命中但 Mongo 里没有（误判）的不跳过
+        seen_urls.add(new_url)
+        existing = seen_urls.confirm([(WECHAT, WECHAT), (new_url, new_url)])
+        assert set(existing) == {WECHAT}
+        assert seen_urls.stats["false_positives"] == 1
+    print(
+        "✅ 任务 1 回查：未命中直接判新，命中的批量确认并补写 source，误判的仍进入评估"
+    )
+
+
+if __name__ == "__main__":
+    test_wechat()
+    test_generic()
+    test_bloom()
+    test_task1_lookup()
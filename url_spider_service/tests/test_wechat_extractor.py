@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+
+# Ensure we can import from parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench")
+)
+os.environ.setdefault("HTML_ARCHIVE_BACKEND", "off")
+
+from bs4 import BeautifulSoup
+
+from fixture_server import FixtureServer
+from services.clipper_service import ClipperService, render_snapshot
+from services.wechat_extractor import (
+    extract_wechat_meta,
+    find_content,
+    is_gone_page,
+    rewrite_lazy_images,
+)
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "bench",
+    "fixtures",
+    "wechat_article.html",
+)
+
+
+def test_extract_meta():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        html = f.read()
+    soup = BeautifulSoup(html, "html.parser")
+    meta = extract_wechat_meta(soup, html)
+    assert meta["title"] == "大模型推理优化实践"
+    assert meta["author"] == "AI 工程实践"
+    assert meta["published"] == "2026-02-20T08:00:00+08:00"
+    assert meta["description"].startswith("从显存带宽")
+
+    content = find_content(soup)
+    assert content is not None
+    assert rewrite_lazy_images(content) > 0
+    assert all(img.get("src") for img in content.find_all("img"))
+    print("✅ 公众号元信息提取正确")
+
+
+def test_script_fallbacks():
+    html = (
+        "<html><head><title></title></head><body>"
+        '<script>var nickname = htmlDecode("某公众号");'
+        "var msg_title = '脚本标题'.html(false);"
+        'var ct = "1700000000";</script></body></html>'
+    )
+    meta = extract_wechat_meta(BeautifulSoup(html, "html.parser"), html)
+    assert meta["title"] == "脚本标题"
+    assert meta["author"] == "某公众号"
+    assert meta["published"] == "2023-11-15T06:13:20+08:00"
+    assert is_gone_page("<p>该内容已被发布者删除</p>")
+    assert not is_gone_page(html)
+    print("✅ 脚本变量回退正确")
+
+
+def test_reextract_parity():
+    url = "https://mp.weixin.qq.com/s/bench-wechat-article"
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    async def run():
+        with FixtureServer() as server:
+            service = ClipperService(replay_base=server.base_url)
+            template = service.find_compiled_template(url)
+            try:
+                live = await service._process_static(url, template, "wechat")
+            finally:
+                await service.close()
+        # 归档里保存的是原始 HTML，重新提取必须得到与在线抓取相同的结果
+        return live, await render_snapshot(url, html, template)
+
+    live, snapshot = asyncio.run(run())
+    assert live["metadata"]["title"] == "大模型推理优化实践"
+    # created 是剪藏时间，每次都不同
+    live["metadata"].pop("created", None)
+    snapshot["metadata"].pop("created", None)
+    assert snapshot["metadata"] == live["metadata"]
+    assert snapshot["content"] == live["content"]
+    print("✅ 从归档重新提取公众号文章与在线抓取结果一致")
+
+
+if __name__ == "__main__":
+    test_extract_meta()
+    test_script_fallbacks()
+    test_reextract_parity()